@@ -0,0 +1,51 @@
+"""Unique inventory row per product and location
+
+Revision ID: 3f9c2b7d41a8
+Revises: eb37a6aecf50
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2b7d41a8'
+down_revision: Union[str, None] = 'eb37a6aecf50'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('inventory', schema='pos'):
+        return
+
+    # Fusiona filas duplicadas en la más antigua antes de crear la restricción
+    op.execute("""
+        WITH ranked AS (
+            SELECT id,
+                   SUM(quantity) OVER (PARTITION BY product_id, location_id) AS total,
+                   ROW_NUMBER() OVER (PARTITION BY product_id, location_id ORDER BY created_at, id) AS rn
+            FROM pos.inventory
+        )
+        UPDATE pos.inventory i SET quantity = ranked.total
+        FROM ranked WHERE i.id = ranked.id AND ranked.rn = 1;
+    """)
+    op.execute("""
+        DELETE FROM pos.inventory i
+        USING (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY product_id, location_id ORDER BY created_at, id) AS rn
+            FROM pos.inventory
+        ) ranked
+        WHERE i.id = ranked.id AND ranked.rn > 1;
+    """)
+    op.create_unique_constraint(
+        'uq_inventory_product_location', 'inventory', ['product_id', 'location_id'], schema='pos'
+    )
+
+
+def downgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('inventory', schema='pos'):
+        return
+    op.drop_constraint('uq_inventory_product_location', 'inventory', type_='unique', schema='pos')
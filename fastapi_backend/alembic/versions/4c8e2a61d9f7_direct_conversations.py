@@ -0,0 +1,44 @@
+"""Direct conversation key and unique index on conversations
+
+Revision ID: 4c8e2a61d9f7
+Revises: e9b04c7d2f13
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '4c8e2a61d9f7'
+down_revision: Union[str, None] = 'e9b04c7d2f13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('conversations', schema='pos'):
+        return
+    op.add_column('conversations', sa.Column('direct_user_low', postgresql.UUID(as_uuid=True), nullable=True), schema='pos')
+    op.add_column('conversations', sa.Column('direct_user_high', postgresql.UUID(as_uuid=True), nullable=True), schema='pos')
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_conversations_direct', 'conversations',
+            ['type', 'appointment_id', 'direct_user_low', 'direct_user_high'], schema='pos', unique=True,
+            postgresql_nulls_not_distinct=True, postgresql_where=sa.text('direct_user_low IS NOT NULL'),
+            if_not_exists=True, postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('conversations', schema='pos'):
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'uq_conversations_direct', table_name='conversations', schema='pos', if_exists=True,
+            postgresql_concurrently=True,
+        )
+    op.drop_column('conversations', 'direct_user_high', schema='pos')
+    op.drop_column('conversations', 'direct_user_low', schema='pos')
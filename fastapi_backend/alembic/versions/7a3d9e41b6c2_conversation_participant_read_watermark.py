@@ -0,0 +1,43 @@
+"""Per-participant last read watermark on conversation_participants
+
+Revision ID: 7a3d9e41b6c2
+Revises: d5a18c6e9f20
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3d9e41b6c2'
+down_revision: Union[str, None] = 'd5a18c6e9f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('conversation_participants', schema='pos'):
+        return
+    op.add_column(
+        'conversation_participants',
+        sa.Column('last_read_at', sa.DateTime(timezone=True), nullable=True),
+        schema='pos',
+    )
+    # La marca inicial es el último mensaje ajeno que ya estaba marcado como leído
+    op.execute("""
+        UPDATE pos.conversation_participants cp
+        SET last_read_at = (
+            SELECT max(m.created_at) FROM pos.messages m
+            WHERE m.conversation_id = cp.conversation_id
+              AND m.sender_id != cp.user_id
+              AND m.read_at IS NOT NULL
+        )
+    """)
+
+
+def downgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('conversation_participants', schema='pos'):
+        return
+    op.drop_column('conversation_participants', 'last_read_at', schema='pos')
@@ -0,0 +1,47 @@
+"""Composite (created_at, id) indexes for cursor pagination
+
+Revision ID: 8c41d0e2a7b5
+Revises: 3f9c2b7d41a8
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41d0e2a7b5'
+down_revision: Union[str, None] = '3f9c2b7d41a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_patients_created_at_id', 'patients', ['created_at', 'id']),
+    ('ix_customers_created_at_id', 'customers', ['created_at', 'id']),
+    ('ix_products_business_id_created_at_id', 'products', ['business_id', 'created_at', 'id']),
+    ('ix_inventory_created_at_id', 'inventory', ['created_at', 'id']),
+    ('ix_stock_transfers_created_at_id', 'stock_transfers', ['created_at', 'id']),
+    ('ix_subscription_products_created_at_id', 'subscription_products', ['created_at', 'id']),
+    ('ix_prices_created_at_id', 'prices', ['created_at', 'id']),
+    ('ix_subscriptions_user_id_created_at_id', 'subscriptions', ['user_id', 'created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    # CONCURRENTLY para no bloquear escrituras en tablas grandes
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            if inspector.has_table(table, schema='pos'):
+                op.create_index(
+                    name, table, columns, schema='pos', if_not_exists=True, postgresql_concurrently=True
+                )
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            if inspector.has_table(table, schema='pos'):
+                op.drop_index(name, table_name=table, schema='pos', if_exists=True, postgresql_concurrently=True)
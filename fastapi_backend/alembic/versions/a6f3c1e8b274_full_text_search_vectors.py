@@ -0,0 +1,52 @@
+"""Generated tsvector columns and GIN indexes for full-text search
+
+Revision ID: a6f3c1e8b274
+Revises: 4c8e2a61d9f7
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6f3c1e8b274'
+down_revision: Union[str, None] = '4c8e2a61d9f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Debe coincidir con app.db.search.TEXT_SEARCH_CONFIG
+TEXT_SEARCH_CONFIG = 'spanish'
+TABLES = ('messages', 'appointment_documents')
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = [table for table in TABLES if inspector.has_table(table, schema='pos')]
+    # Columna generada STORED: reescribe la tabla una vez; después Postgres la mantiene en cada escritura
+    for table in tables:
+        op.add_column(table, sa.Column(
+            'search_vector', postgresql.TSVECTOR(),
+            sa.Computed(f"to_tsvector('{TEXT_SEARCH_CONFIG}'::regconfig, coalesce(content, ''))", persisted=True),
+        ), schema='pos')
+    with op.get_context().autocommit_block():
+        for table in tables:
+            op.create_index(
+                f'ix_{table}_search_vector', table, ['search_vector'], schema='pos', postgresql_using='gin',
+                if_not_exists=True, postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = [table for table in TABLES if inspector.has_table(table, schema='pos')]
+    with op.get_context().autocommit_block():
+        for table in tables:
+            op.drop_index(
+                f'ix_{table}_search_vector', table_name=table, schema='pos', if_exists=True,
+                postgresql_concurrently=True,
+            )
+    for table in tables:
+        op.drop_column(table, 'search_vector', schema='pos')
@@ -0,0 +1,37 @@
+"""Index messages by (conversation_id, created_at, id) for paginated history
+
+Revision ID: b27e5f93c0d4
+Revises: 8c41d0e2a7b5
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b27e5f93c0d4'
+down_revision: Union[str, None] = '8c41d0e2a7b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('messages', schema='pos'):
+        return
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_messages_conversation_id_created_at_id', 'messages', ['conversation_id', 'created_at', 'id'],
+            schema='pos', if_not_exists=True, postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('messages', schema='pos'):
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_messages_conversation_id_created_at_id', table_name='messages',
+            schema='pos', if_exists=True, postgresql_concurrently=True,
+        )
@@ -0,0 +1,46 @@
+"""product_imports table for bulk catalog imports
+
+Revision ID: c3a8e5d20b47
+Revises: f1d7b3a95c60
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a8e5d20b47'
+down_revision: Union[str, None] = 'f1d7b3a95c60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table('product_imports', schema='pos'):
+        return
+    op.create_table('product_imports',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('business_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('rows_processed', sa.Integer(), nullable=False),
+        sa.Column('created_count', sa.Integer(), nullable=False),
+        sa.Column('updated_count', sa.Integer(), nullable=False),
+        sa.Column('error_count', sa.Integer(), nullable=False),
+        sa.Column('errors', sa.JSON(), nullable=False),
+        sa.Column('detail', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['business_id'], ['pos.businesses.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['pos.users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        schema='pos'
+    )
+
+
+def downgrade() -> None:
+    op.execute('DROP TABLE IF EXISTS pos.product_imports')
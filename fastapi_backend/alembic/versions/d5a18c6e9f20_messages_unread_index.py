@@ -0,0 +1,36 @@
+"""Partial index on unread messages for the chat inbox
+
+Revision ID: d5a18c6e9f20
+Revises: b27e5f93c0d4
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a18c6e9f20'
+down_revision: Union[str, None] = 'b27e5f93c0d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('messages', schema='pos'):
+        return
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_messages_unread', 'messages', ['conversation_id'], schema='pos',
+            postgresql_where=sa.text('read_at IS NULL'), if_not_exists=True, postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('messages', schema='pos'):
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_messages_unread', table_name='messages', schema='pos', if_exists=True, postgresql_concurrently=True,
+        )
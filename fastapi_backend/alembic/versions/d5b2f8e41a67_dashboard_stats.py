@@ -0,0 +1,62 @@
+"""dashboard stats rollups and appointment amount/paid_at
+
+Revision ID: d5b2f8e41a67
+Revises: c3a8e5d20b47
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5b2f8e41a67'
+down_revision: Union[str, None] = 'c3a8e5d20b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTERS = (
+    'patient_count', 'appointments_pending_payment', 'appointments_scheduled',
+    'appointments_active', 'appointments_completed', 'appointments_cancelled',
+)
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table('appointments', schema='pos'):
+        # Sin reescritura de la tabla: columnas nulables sin valor por defecto
+        op.execute('ALTER TABLE pos.appointments ADD COLUMN IF NOT EXISTS notes TEXT')
+        op.execute('ALTER TABLE pos.appointments ADD COLUMN IF NOT EXISTS amount NUMERIC(10, 2)')
+        op.execute('ALTER TABLE pos.appointments ADD COLUMN IF NOT EXISTS paid_at TIMESTAMP WITH TIME ZONE')
+
+    if not inspector.has_table('dashboard_user_stats', schema='pos'):
+        op.create_table('dashboard_user_stats',
+            sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+            *[sa.Column(name, sa.Integer(), server_default=sa.text('0'), nullable=False) for name in COUNTERS],
+            sa.Column('revenue_total', sa.Numeric(14, 2), server_default=sa.text('0'), nullable=False),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+            sa.PrimaryKeyConstraint('user_id'),
+            schema='pos'
+        )
+    if not inspector.has_table('dashboard_daily_stats', schema='pos'):
+        op.create_table('dashboard_daily_stats',
+            sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('patients_added', sa.Integer(), server_default=sa.text('0'), nullable=False),
+            sa.Column('appointments_created', sa.Integer(), server_default=sa.text('0'), nullable=False),
+            sa.Column('appointment_revenue', sa.Numeric(14, 2), server_default=sa.text('0'), nullable=False),
+            sa.Column('subscription_revenue', sa.Numeric(14, 2), server_default=sa.text('0'), nullable=False),
+            sa.PrimaryKeyConstraint('user_id', 'day'),
+            schema='pos'
+        )
+    # Las filas se rellenan con `python -m app.refresh_dashboard_stats` tras migrar
+
+
+def downgrade() -> None:
+    op.execute('DROP TABLE IF EXISTS pos.dashboard_daily_stats')
+    op.execute('DROP TABLE IF EXISTS pos.dashboard_user_stats')
+    op.execute('ALTER TABLE pos.appointments DROP COLUMN IF EXISTS paid_at')
+    op.execute('ALTER TABLE pos.appointments DROP COLUMN IF EXISTS amount')
+    op.execute('ALTER TABLE pos.appointments DROP COLUMN IF EXISTS notes')
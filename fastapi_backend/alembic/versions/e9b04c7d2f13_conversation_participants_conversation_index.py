@@ -0,0 +1,37 @@
+"""Index conversation_participants by conversation_id
+
+Revision ID: e9b04c7d2f13
+Revises: 7a3d9e41b6c2
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9b04c7d2f13'
+down_revision: Union[str, None] = '7a3d9e41b6c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('conversation_participants', schema='pos'):
+        return
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_conversation_participants_conversation_id', 'conversation_participants', ['conversation_id'],
+            schema='pos', if_not_exists=True, postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('conversation_participants', schema='pos'):
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_conversation_participants_conversation_id', table_name='conversation_participants', schema='pos',
+            if_exists=True, postgresql_concurrently=True,
+        )
@@ -0,0 +1,43 @@
+"""pgvector embedding column and HNSW index on appointment_documents
+
+Revision ID: f1d7b3a95c60
+Revises: a6f3c1e8b274
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1d7b3a95c60'
+down_revision: Union[str, None] = 'a6f3c1e8b274'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Debe coincidir con settings.EMBEDDING_DIM
+EMBEDDING_DIM = 384
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # Sin la extensión instalada en el servidor no hay nada que hacer: EMBEDDING_BACKEND=numpy no la necesita
+    available = bind.scalar(sa.text("SELECT count(*) FROM pg_available_extensions WHERE name = 'vector'"))
+    if not available or not sa.inspect(bind).has_table('appointment_documents', schema='pos'):
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS vector')
+    op.execute(f'ALTER TABLE pos.appointment_documents ADD COLUMN IF NOT EXISTS embedding vector({EMBEDDING_DIM})')
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_appointment_documents_embedding '
+            'ON pos.appointment_documents USING hnsw (embedding vector_cosine_ops)'
+        )
+
+
+def downgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('appointment_documents', schema='pos'):
+        return
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS pos.ix_appointment_documents_embedding')
+    op.execute('ALTER TABLE pos.appointment_documents DROP COLUMN IF EXISTS embedding')
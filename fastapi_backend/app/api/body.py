@@ -0,0 +1,72 @@
+from typing import Any, Awaitable, Callable, Optional, Type, TypeVar
+
+from fastapi import HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+
+from app.core.config import settings
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+FORM_CONTENT_TYPES = ("application/x-www-form-urlencoded", "multipart/form-data")
+MSGPACK_CONTENT_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+async def read_body(request: Request, limit: Optional[int] = None) -> bytes:
+    """Body completo, cortando con 413 en cuanto supera `limit` (MAX_BODY_BYTES por defecto)."""
+    limit = settings.MAX_BODY_BYTES if limit is None else limit
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > limit:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Body larger than {limit} bytes")
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Body larger than {limit} bytes")
+        chunks.append(chunk)
+    # Igual que Request.body(): request.form() vuelve a leer de aquí
+    request._body = b"".join(chunks)
+    return request._body
+
+
+async def parse_body(request: Request, model_class: Type[ModelT]) -> ModelT:
+    """
+    Valida el body contra `model_class` según el content-type: JSON (por defecto,
+    validado por pydantic directamente desde los bytes), form-urlencoded/multipart
+    o msgpack. Los errores se devuelven como 422, igual que los de FastAPI.
+    """
+    ct = (request.headers.get("content-type") or "").lower()
+    body = await read_body(request)
+    try:
+        if ct.startswith(FORM_CONTENT_TYPES):
+            form = await request.form()
+            return model_class.model_validate({key: value for key, value in form.items()})
+        if ct.startswith(MSGPACK_CONTENT_TYPES):
+            return model_class.model_validate(_unpack_msgpack(body))
+        return model_class.model_validate_json(body)
+    except ValidationError as exc:
+        raise RequestValidationError([_body_error(err) for err in exc.errors(include_url=False)])
+
+
+def _body_error(err: dict) -> dict:
+    # Con JSON inválido el input es el body en bytes: no se devuelve (FastAPI pone {})
+    value = {} if isinstance(err["input"], bytes) else err["input"]
+    return {"type": err["type"], "loc": ("body", *err["loc"]), "msg": err["msg"], "input": value}
+
+
+def _unpack_msgpack(body: bytes) -> Any:
+    try:
+        import msgpack
+    except ImportError:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="msgpack bodies are not supported")
+    try:
+        return msgpack.unpackb(body, raw=False)
+    except (ValueError, msgpack.UnpackException):
+        raise HTTPException(status_code=400, detail="Invalid msgpack body")
+
+
+def request_body(model_class: Type[ModelT]) -> Callable[[Request], Awaitable[ModelT]]:
+    """Dependencia que parsea y valida el body: `item_in: ItemCreate = Depends(request_body(ItemCreate))`."""
+    async def dependency(request: Request) -> ModelT:
+        return await parse_body(request, model_class)
+    return dependency
@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+from typing import Any, AsyncIterator, Dict, List, Literal, Tuple, Type
+
+from fastapi import HTTPException, Request, status
+
+from app.api.body import read_body
+from app.core.bulk import parse_line
+from app.core.config import settings
+from app.schemas.bulk import ModelT, validate_rows
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+CSV_CONTENT_TYPES = ("text/csv", "application/csv")
+
+# A single bulk row is a few hundred bytes; anything this big is not a real row
+MAX_LINE_BYTES = 64 * 1024
+
+
+async def iter_bulk_rows(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Yield (index, row) from a JSON array body or an NDJSON stream, 413 past
+    BULK_MAX_BYTES. NDJSON is consumed line by line as it arrives (413 for a line
+    over MAX_LINE_BYTES); a line that is not valid JSON yields a ValueError
+    instead of a row so the caller can report it and go on.
+    """
+    limit = settings.BULK_MAX_BYTES
+    ct = (request.headers.get("content-type") or "").lower()
+    if not ct.startswith(NDJSON_CONTENT_TYPES):
+        body = await read_body(request, limit)
+        try:
+            rows = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        for index, row in enumerate(rows):
+            yield index, row
+        return
+
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > limit:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Body larger than {limit} bytes")
+    index, size, pending = 0, 0, bytearray()
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Body larger than {limit} bytes")
+        pending += chunk
+        end = pending.rfind(b"\n")
+        if end >= 0:
+            # Only the complete lines are split; the unfinished tail stays in the buffer
+            for line in pending[:end].split(b"\n"):
+                if line.strip():
+                    yield index, _parse_ndjson_line(line)
+                    index += 1
+            del pending[:end + 1]
+        if len(pending) > MAX_LINE_BYTES:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"NDJSON line larger than {MAX_LINE_BYTES} bytes")
+    if pending.strip():
+        yield index, _parse_ndjson_line(pending)
+
+
+def _parse_ndjson_line(line: bytes) -> Any:
+    if len(line) > MAX_LINE_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"NDJSON line larger than {MAX_LINE_BYTES} bytes")
+    return parse_line(line)
+
+
+async def read_bulk_rows(
+    request: Request, model_class: Type[ModelT]
+) -> Tuple[Dict[int, ModelT], Dict[int, List[Dict[str, Any]]]]:
+    """Validate every row against `model_class`; returns (valid rows, errors), both keyed by row index."""
+    rows = []
+    async for index, row in iter_bulk_rows(request):
+        if index >= settings.BULK_MAX_ROWS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"At most {settings.BULK_MAX_ROWS} rows per request",
+            )
+        rows.append((index, row))
+    return validate_rows(rows, model_class)
+
+
+def import_format(request: Request) -> Literal["csv", "ndjson"]:
+    ct = (request.headers.get("content-type") or "").lower()
+    if ct.startswith(CSV_CONTENT_TYPES):
+        return "csv"
+    if ct.startswith(NDJSON_CONTENT_TYPES):
+        return "ndjson"
+    raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Send text/csv or application/x-ndjson")
+
+
+async def spool_body(request: Request, max_bytes: int) -> str:
+    """
+    Copy the body to a temporary file as it arrives (never fully in memory) and
+    return its path; the caller deletes it. 413 past `max_bytes`.
+    """
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > max_bytes:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Body larger than {max_bytes} bytes")
+    fd, path = tempfile.mkstemp(prefix="upload-")
+    try:
+        size = 0
+        with os.fdopen(fd, "wb") as spool:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Body larger than {max_bytes} bytes")
+                spool.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
@@ -1,12 +1,12 @@
-from typing import Generator
+from typing import AsyncGenerator
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core import security
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.db.session import AsyncSessionLocal
 from app.models.user import User as DBUser, UserRole
 from app.schemas.user import User
 from app.services.user_service import user_service # Import the already instantiated service
@@ -15,15 +15,12 @@ reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
 )
 
-def get_db() -> Generator:
-    try:
-        db = SessionLocal()
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
+async def get_current_user(
+    db: AsyncSession = Depends(get_db), token: str = Depends(reusable_oauth2)
 ) -> DBUser:
     try:
         payload = jwt.decode(
@@ -36,20 +33,20 @@ def get_current_user(
             detail="Could not validate credentials",
         )
 
-    user = user_service.get(db, id=token_data["sub"])
+    user = await user_service.get_cached(db, id=token_data["sub"])
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
-def get_current_active_user(
+async def get_current_active_user(
     current_user: DBUser = Depends(get_current_user),
 ) -> DBUser:
     if not user_service.is_active(current_user):
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-def get_current_active_admin(
+async def get_current_active_admin(
     current_user: DBUser = Depends(get_current_active_user),
 ) -> DBUser:
     if current_user.role != UserRole.ADMIN:
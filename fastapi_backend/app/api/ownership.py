@@ -0,0 +1,97 @@
+"""
+Autorización de recursos de un negocio: el usuario debe ser el dueño del negocio
+(o admin). La propiedad de negocios y ubicaciones sale de la caché de
+BusinessService, así que comprobarla cuesta como mucho una consulta.
+"""
+from uuid import UUID
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.dependencies import CurrentIdentity, get_current_identity, get_db
+from app.models.inventory import Inventory, StockTransfer
+from app.services.business_service import BusinessService, Ownership
+from app.services.inventory_service import InventoryService
+
+
+def check_owner(ownership: Ownership, current_user: CurrentIdentity) -> Ownership:
+    if str(ownership.owner_id) != str(current_user.id) and current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this business")
+    return ownership
+
+
+async def authorize_business(db: AsyncSession, business_id: UUID, current_user: CurrentIdentity) -> Ownership:
+    ownership = await BusinessService(db).get_business_ownership(business_id)
+    if ownership is None:
+        raise HTTPException(status_code=404, detail="Business not found")
+    return check_owner(ownership, current_user)
+
+
+async def authorize_location(db: AsyncSession, location_id: UUID, current_user: CurrentIdentity) -> Ownership:
+    ownership = await BusinessService(db).get_location_ownership(location_id)
+    if ownership is None:
+        raise HTTPException(status_code=404, detail="Business location not found")
+    return check_owner(ownership, current_user)
+
+
+async def business_access(
+    business_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity),
+) -> Ownership:
+    """Dependency for endpoints with a `business_id` path or query parameter."""
+    return await authorize_business(db, business_id, current_user)
+
+
+async def location_access(
+    location_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity),
+) -> Ownership:
+    """Dependency for endpoints with a `location_id` path or query parameter."""
+    return await authorize_location(db, location_id, current_user)
+
+
+async def inventory_item_access(
+    item_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity),
+) -> Inventory:
+    """The inventory item `item_id`, once the user is authorized on its location."""
+    item = await InventoryService(db).get_inventory_item(item_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Inventory item not found")
+    await authorize_location(db, item.location_id, current_user)
+    return item
+
+
+async def authorize_stock_transfer_locations(
+    db: AsyncSession, business_id: UUID, from_location_id: UUID, to_location_id: UUID, current_user: CurrentIdentity
+) -> Ownership:
+    """Both ends of a transfer must be locations the user owns inside `business_id`."""
+    ownership = await authorize_business(db, business_id, current_user)
+    for location_id in (from_location_id, to_location_id):
+        location = await authorize_location(db, location_id, current_user)
+        if location.business_id != business_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Location {location_id} does not belong to business {business_id}",
+            )
+    return ownership
+
+
+async def authorize_stock_transfer(db: AsyncSession, transfer_id: UUID, current_user: CurrentIdentity) -> StockTransfer:
+    transfer = await InventoryService(db).get_stock_transfer(transfer_id)
+    if transfer is None:
+        raise HTTPException(status_code=404, detail="Stock transfer not found")
+    await authorize_business(db, transfer.business_id, current_user)
+    return transfer
+
+
+async def stock_transfer_access(
+    transfer_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity),
+) -> StockTransfer:
+    """The stock transfer `transfer_id`, once the user is authorized on its business."""
+    return await authorize_stock_transfer(db, transfer_id, current_user)
@@ -2,7 +2,7 @@ from fastapi import APIRouter
 
 from .endpoints import (
     auth, users, businesses, customers, product, inventory,
-    stock_transfer, subscription, patients, appointments, chat, dashboard
+    stock_transfer, subscription, patients, appointments, chat, dashboard, search
 )
 
 api_router = APIRouter()
@@ -11,9 +11,11 @@ api_router.include_router(users.router, prefix="/users")
 api_router.include_router(businesses.router, prefix="/businesses")
 api_router.include_router(subscription.router, prefix="/subscriptions")
 api_router.include_router(product.router, prefix="/products")
+api_router.include_router(stock_transfer.router, prefix="/inventory")
 api_router.include_router(inventory.router, prefix="/inventory")
 api_router.include_router(customers.router, prefix="/customers")
 api_router.include_router(patients.router, prefix="/patients")
 api_router.include_router(appointments.router, prefix="/appointments", tags=["appointments"])
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
 api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
+api_router.include_router(search.router, prefix="/search", tags=["search"])
@@ -1,14 +1,15 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from typing import List, Any, Optional
 
-from app.dependencies import get_db, get_current_active_user
+from app.dependencies import get_db, get_current_active_user, get_current_identity, CurrentIdentity
+from app.api.body import request_body
 from app.schemas.appointment import (
     Appointment, AppointmentCreate, AppointmentUpdate,
     AppointmentDocument, AppointmentDocumentCreate, AppointmentDocumentUpdate,
-    AppointmentCreateInternal
+    AppointmentCreateInternal, SimilarDocument
 )
 from app.services.appointment_service import AppointmentService
 from app.models.user import User as DBUser, UserRole
@@ -18,61 +19,43 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-# Función helper para parsear datos de JSON o form-urlencoded
-async def parse_request_data(request: Request, model_class):
-    """Parse data from JSON or form-urlencoded request"""
-    ct = (request.headers.get("content-type") or "").lower()
-    
-    if ct.startswith("application/x-www-form-urlencoded") or ct.startswith("multipart/form-data"):
-        form = await request.form()
-        # Convert form data to dict
-        data = {}
-        for key, value in form.items():
-            data[key] = value
-        return model_class(**data)
-    else:
-        # Default to JSON
-        data = await request.json()
-        return model_class(**data)
-
 # Appointments
 @router.post("/", response_model=Appointment, status_code=status.HTTP_201_CREATED)
 async def create_appointment(
-    request: Request,
-    db: Session = Depends(get_db),
+    appointment_in: AppointmentCreate = Depends(request_body(AppointmentCreate)),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ) -> Any:
     """
     Create a new appointment for the current user (doctor).
     Accepts JSON or form-urlencoded data.
     """
-    appointment_in = await parse_request_data(request, AppointmentCreate)
     service = AppointmentService(db)
     appointment_internal = AppointmentCreateInternal(
         **appointment_in.model_dump(),
         doctor_id=current_user.id
     )
-    return service.create_appointment(appointment_in=appointment_internal)
+    return await service.create_appointment(appointment_in=appointment_internal)
 
 @router.get("/", response_model=List[Appointment])
-def read_appointments(
-    db: Session = Depends(get_db),
-    current_user: DBUser = Depends(get_current_active_user)
+async def read_appointments(
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity)
 ) -> Any:
     """
     Retrieve appointments for the current user.
     """
     service = AppointmentService(db)
-    return service.get_appointments_by_user(user_id=current_user.id)
+    return await service.get_appointments_by_user(user_id=current_user.id)
 
 @router.get("/{appointment_id}", response_model=Appointment)
-def read_appointment(
+async def read_appointment(
     appointment_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: DBUser = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity)
 ):
     service = AppointmentService(db)
-    appointment = service.get_appointment(appointment_id)
+    appointment = await service.get_appointment(appointment_id)
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
     if str(current_user.id) not in [str(appointment.patient_id), str(appointment.doctor_id)] and current_user.role != UserRole.ADMIN:
@@ -82,115 +65,128 @@ def read_appointment(
 @router.put("/{appointment_id}", response_model=Appointment)
 async def update_appointment(
     appointment_id: UUID,
-    request: Request,
-    db: Session = Depends(get_db),
+    appointment_in: AppointmentUpdate = Depends(request_body(AppointmentUpdate)),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     """
     Update an appointment.
     Accepts JSON or form-urlencoded data.
     """
-    appointment_in = await parse_request_data(request, AppointmentUpdate)
     service = AppointmentService(db)
-    appointment = service.get_appointment(appointment_id)
+    appointment = await service.get_appointment(appointment_id)
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
     if str(current_user.id) != str(appointment.doctor_id) and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Forbidden")
-    return service.update_appointment(appointment_id=appointment_id, appointment_in=appointment_in)
+    return await service.update_appointment(appointment_id=appointment_id, appointment_in=appointment_in)
 
 @router.delete("/{appointment_id}")
-def delete_appointment(
+async def delete_appointment(
     appointment_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     service = AppointmentService(db)
-    appointment = service.get_appointment(appointment_id)
+    appointment = await service.get_appointment(appointment_id)
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
     if str(current_user.id) != str(appointment.doctor_id) and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Forbidden")
-    service.delete_appointment(appointment_id=appointment_id)
+    await service.delete_appointment(appointment_id=appointment_id)
     return {"message": "Appointment deleted successfully"}
 
 @router.post("/{appointment_id}/confirm", response_model=Appointment)
-def confirm_appointment(
+async def confirm_appointment(
     appointment_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     service = AppointmentService(db)
-    appointment = service.get_appointment(appointment_id)
+    appointment = await service.get_appointment(appointment_id)
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
     if str(current_user.id) != str(appointment.doctor_id) and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Forbidden")
-    return service.confirm_appointment(appointment_id=appointment_id)
+    return await service.confirm_appointment(appointment_id=appointment_id)
 
 @router.post("/{appointment_id}/cancel", response_model=Appointment)
-def cancel_appointment(
+async def cancel_appointment(
     appointment_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     service = AppointmentService(db)
-    appointment = service.get_appointment(appointment_id)
+    appointment = await service.get_appointment(appointment_id)
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
     if str(current_user.id) not in [str(appointment.patient_id), str(appointment.doctor_id)] and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Forbidden")
-    return service.cancel_appointment(appointment_id=appointment_id)
+    return await service.cancel_appointment(appointment_id=appointment_id)
 
 @router.post("/{appointment_id}/reschedule", response_model=Appointment)
 async def reschedule_appointment(
     appointment_id: UUID,
-    request: Request,
-    db: Session = Depends(get_db),
+    appointment_in: AppointmentUpdate = Depends(request_body(AppointmentUpdate)),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     """
     Reschedule an appointment.
     Accepts JSON or form-urlencoded data.
     """
-    appointment_in = await parse_request_data(request, AppointmentUpdate)
     service = AppointmentService(db)
-    appointment = service.get_appointment(appointment_id)
+    appointment = await service.get_appointment(appointment_id)
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
     if str(current_user.id) not in [str(appointment.patient_id), str(appointment.doctor_id)] and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Forbidden")
-    return service.reschedule_appointment(appointment_id=appointment_id, appointment_in=appointment_in)
+    return await service.reschedule_appointment(appointment_id=appointment_id, appointment_in=appointment_in)
 
 # Appointment Documents
 @router.post("/documents/", response_model=AppointmentDocument, status_code=status.HTTP_201_CREATED)
 async def create_appointment_document(
-    request: Request,
-    db: Session = Depends(get_db),
+    doc_in: AppointmentDocumentCreate = Depends(request_body(AppointmentDocumentCreate)),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     """
     Create an appointment document.
     Accepts JSON or form-urlencoded data.
     """
-    doc_in = await parse_request_data(request, AppointmentDocumentCreate)
     service = AppointmentService(db)
     # Check if user is part of the appointment
-    appointment = service.get_appointment(doc_in.appointment_id)
+    appointment = await service.get_appointment(doc_in.appointment_id)
     if not appointment or (str(current_user.id) not in [str(appointment.patient_id), str(appointment.doctor_id)] and current_user.role != UserRole.ADMIN):
         raise HTTPException(status_code=403, detail="Forbidden")
-    return service.create_appointment_document(doc_in=doc_in)
+    return await service.create_appointment_document(doc_in=doc_in)
+
+@router.get("/documents/similar", response_model=List[SimilarDocument])
+async def read_similar_documents(
+    q: str = Query(..., min_length=2, max_length=2000),
+    k: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity)
+):
+    """
+    Semantic search: the `k` documents of the current user's appointments closest
+    to `q` (all documents for admins), most similar first.
+    """
+    service = AppointmentService(db)
+    return await service.similar_documents(
+        user_id=current_user.id, q=q, k=k, all_appointments=current_user.role == UserRole.ADMIN
+    )
 
 @router.get("/{appointment_id}/documents/", response_model=List[AppointmentDocument])
-def read_appointment_documents(
+async def read_appointment_documents(
     appointment_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: DBUser = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity)
 ):
     service = AppointmentService(db)
-    appointment = service.get_appointment(appointment_id)
+    appointment = await service.get_appointment(appointment_id)
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
     if str(current_user.id) not in [str(appointment.patient_id), str(appointment.doctor_id)] and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Forbidden")
-    return service.get_appointment_documents(appointment_id=appointment_id)
+    return await service.get_appointment_documents(appointment_id=appointment_id)
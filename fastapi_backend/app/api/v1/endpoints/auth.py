@@ -1,27 +1,26 @@
 from datetime import timedelta
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.dependencies import get_db, get_current_user
 from app.schemas.user import UserCreate, User as UserResponse, UserUpdate
 from app.schemas.auth import AuthOut
-from app.services.user_service import UserService
-from app.core.security import verify_password, ACCESS_TOKEN_EXPIRE_MINUTES
-from app.core.auth import create_access_token
+from app.services.user_service import user_service
+from app.core.security import ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.auth import create_access_token, identity_claims
 
 router = APIRouter(tags=["Auth"], responses={401: {"description": "Unauthorized"}})
 
 @router.post("/register", response_model=AuthOut, status_code=status.HTTP_201_CREATED)
-def register_user(*, db: Session = Depends(get_db), user_in: UserCreate):
-    svc = UserService(db)
-    if svc.get_by_email(db, email=user_in.email):
+async def register_user(*, db: AsyncSession = Depends(get_db), user_in: UserCreate):
+    if await user_service.get_by_email(db, email=user_in.email):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    user = svc.create(db, obj_in=user_in)
+    user = await user_service.create(db, obj_in=user_in)
 
     access_token = create_access_token(
-        data={"sub": str(user.id)},
+        data=identity_claims(user),
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
     )
     return {"token": access_token, "token_type": "bearer", "user": user}
@@ -30,7 +29,7 @@ def register_user(*, db: Session = Depends(get_db), user_in: UserCreate):
 async def login_for_access_token(
     response: Response,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     # Acepta JSON {email|username,password} o form-urlencoded username/password
     ct = (request.headers.get("content-type") or "").lower()
@@ -49,13 +48,12 @@ async def login_for_access_token(
     if not username or not password:
         raise HTTPException(status_code=422, detail="username/email y password son requeridos")
 
-    svc = UserService(db)
-    user = svc.get_by_email(db, email=username)
-    if not user or not verify_password(password, user.hashed_password):
+    user = await user_service.authenticate(db, email=username, password=password)
+    if not user:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
 
     access_token = create_access_token(
-        data={"sub": str(user.id)},
+        data=identity_claims(user),
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
     )
 
@@ -76,7 +74,7 @@ async def login_for_access_token(
 async def refresh_token(current_user: UserResponse = Depends(get_current_user)):
     # Reemite un token (si el actual sigue siendo válido)
     token = create_access_token(
-        data={"sub": str(current_user.id)},
+        data=identity_claims(current_user),
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
     )
     return {"token": token, "token_type": "bearer", "user": current_user}
@@ -90,11 +88,10 @@ async def read_users_me(current_user: UserResponse = Depends(get_current_user)):
 async def update_profile(
     user_update: UserUpdate,
     current_user: UserResponse = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Actualizar perfil del usuario autenticado"""
-    svc = UserService(db)
-    updated_user = svc.update(db, db_obj=current_user, obj_in=user_update)
+    updated_user = await user_service.update(db, db_obj=current_user, obj_in=user_update)
     return {"user": updated_user}
 
 @router.post("/logout")
@@ -1,11 +1,23 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Response, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from typing import List
+from typing import List, Optional
 
-from app.dependencies import get_db, get_current_active_user
-from app.schemas.chat import Conversation, ConversationCreate, Message, MessageCreate, MessageCreateInternal
+from app.core.broker import Subscription, get_broker
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.dependencies import get_db, get_current_active_user, get_current_identity, get_websocket_identity, CurrentIdentity
+from app.api.body import request_body
+from app.schemas.chat import (
+    ClientEvent, Conversation, ConversationCreate, DirectConversationCreate, InboxEntry, Message, MessageCreate,
+    MessageCreateInternal, MessageEvent, ReadEvent, TypingEvent,
+)
 from app.services.chat_service import ChatService
 from app.models.user import User as DBUser
 
@@ -14,27 +26,13 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-# Función helper para parsear datos de JSON o form-urlencoded
-async def parse_request_data(request: Request, model_class):
-    """Parse data from JSON or form-urlencoded request"""
-    ct = (request.headers.get("content-type") or "").lower()
-    
-    if ct.startswith("application/x-www-form-urlencoded") or ct.startswith("multipart/form-data"):
-        form = await request.form()
-        # Convert form data to dict
-        data = {}
-        for key, value in form.items():
-            data[key] = value
-        return model_class(**data)
-    else:
-        # Default to JSON
-        data = await request.json()
-        return model_class(**data)
+# Conversaciones autorizadas que recuerda cada WebSocket
+PARTICIPANTS_CACHE_SIZE = 256
 
 @router.post("/conversations/", response_model=Conversation, status_code=status.HTTP_201_CREATED)
 async def create_conversation(
-    request: Request,
-    db: Session = Depends(get_db),
+    conversation_in: ConversationCreate = Depends(request_body(ConversationCreate)),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     """
@@ -42,59 +40,98 @@ async def create_conversation(
     Accepts JSON or form-urlencoded data.
     """
     try:
-        conversation_in = await parse_request_data(request, ConversationCreate)
         service = ChatService(db)
-        return service.create_conversation(conversation_in, current_user.id)
+        return await service.create_conversation(conversation_in, current_user.id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/conversations/", response_model=List[Conversation])
-def get_user_conversations(
-    db: Session = Depends(get_db),
+@router.post("/conversations/direct", response_model=Conversation, status_code=status.HTTP_201_CREATED)
+async def get_or_create_direct_conversation(
+    response: Response,
+    conversation_in: DirectConversationCreate = Depends(request_body(DirectConversationCreate)),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
+):
+    """
+    Get or create the direct conversation between the current user and `user_id`
+    for the given type and appointment. Safe to retry: returns 201 when it was
+    created and 200 with the existing conversation otherwise.
+    """
+    try:
+        service = ChatService(db)
+        conversation, created = await service.get_or_create_direct_conversation(conversation_in, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not created:
+        response.status_code = status.HTTP_200_OK
+    return conversation
+
+@router.get("/conversations/", response_model=List[Conversation])
+async def get_user_conversations(
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity)
 ):
     """
     Get all conversations for the current user.
     """
     service = ChatService(db)
-    return service.get_user_conversations(user_id=current_user.id)
+    return await service.get_user_conversations(user_id=current_user.id)
+
+@router.get("/inbox", response_model=List[InboxEntry])
+async def get_inbox(
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity)
+):
+    """
+    Conversations of the current user, most recent activity first, each with its
+    participants, a preview of the last message and the unread count.
+    """
+    service = ChatService(db)
+    return await service.get_inbox(user_id=current_user.id, skip=skip, limit=limit)
 
 @router.get("/conversations/{conversation_id}", response_model=Conversation)
-def get_conversation(
+async def get_conversation(
     conversation_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: DBUser = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity)
 ):
     """
     Get a specific conversation.
     """
     service = ChatService(db)
-    conversation = service.get_conversation(conversation_id)
-    if not conversation or current_user not in conversation.participants:
+    if not await service.is_participant(conversation_id, current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized to view this conversation")
-    return conversation
+    return await service.get_conversation(conversation_id)
 
 @router.get("/conversations/{conversation_id}/messages/", response_model=List[Message])
-def get_messages(
+async def get_messages(
     conversation_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: DBUser = Depends(get_current_active_user)
+    before: Optional[UUID] = Query(None, description="Id de mensaje: devuelve los anteriores a él"),
+    after: Optional[UUID] = Query(None, description="Id de mensaje: devuelve los posteriores a él"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity)
 ):
     """
-    Get all messages for a specific conversation.
+    Get a page of messages for a specific conversation, oldest first.
+    Without cursors returns the latest `limit` messages; pass the id of the first
+    message as `before` to load older history, or of the last one as `after` to poll.
     """
     service = ChatService(db)
     # Check if user is a participant
-    conversation = service.get_conversation(conversation_id)
-    if not conversation or current_user not in conversation.participants:
+    if not await service.is_participant(conversation_id, current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized to view these messages")
-    return service.get_messages_for_conversation(conversation_id=conversation_id)
+    return await service.get_messages_for_conversation(
+        conversation_id=conversation_id, before=before, after=after, limit=limit
+    )
 
 @router.post("/conversations/{conversation_id}/messages/", response_model=Message, status_code=status.HTTP_201_CREATED)
 async def send_message(
     conversation_id: UUID,
-    request: Request,
-    db: Session = Depends(get_db),
+    message_in: MessageCreate = Depends(request_body(MessageCreate)),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     """
@@ -104,51 +141,134 @@ async def send_message(
     service = ChatService(db)
     
     # Check if user is a participant before creating the message
-    conversation = service.get_conversation(conversation_id)
-    if not conversation or not any(p.id == current_user.id for p in conversation.participants):
+    if not await service.is_participant(conversation_id, current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized to send messages in this conversation")
-
-    message_in = await parse_request_data(request, MessageCreate)
     
     # Create the internal message schema with the sender_id from the authenticated user
     message_internal = MessageCreateInternal(
-        **message_in.model_dump(),
+        **message_in.model_dump(exclude={"conversation_id"}),
         conversation_id=conversation_id,
         sender_id=current_user.id
     )
     
-    return service.create_message(message_in=message_internal)
+    message = await service.create_message(message_in=message_internal)
+    await get_broker().publish(
+        await service.get_participant_ids(conversation_id), MessageEvent.model_validate(message).model_dump(mode="json")
+    )
+    return message
 
 @router.post("/conversations/{conversation_id}/read")
-def mark_conversation_as_read(
+async def mark_conversation_as_read(
     conversation_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     """
     Mark all messages in a conversation as read for the current user.
     """
     service = ChatService(db)
-    conversation = service.get_conversation(conversation_id)
-    if not conversation or current_user not in conversation.participants:
+    if not await service.is_participant(conversation_id, current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized to access this conversation")
     
-    service.mark_conversation_as_read(conversation_id=conversation_id, user_id=current_user.id)
+    last_read_at = await service.mark_conversation_as_read(conversation_id=conversation_id, user_id=current_user.id)
+    await get_broker().publish(
+        await service.get_participant_ids(conversation_id),
+        ReadEvent(conversation_id=conversation_id, user_id=current_user.id, last_read_at=last_read_at).model_dump(mode="json"),
+    )
     return {"message": "Conversation marked as read"}
 
 @router.delete("/conversations/{conversation_id}")
-def delete_conversation(
+async def delete_conversation(
     conversation_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     """
     Delete a conversation (only for participants).
     """
     service = ChatService(db)
-    conversation = service.get_conversation(conversation_id)
-    if not conversation or current_user not in conversation.participants:
+    if not await service.is_participant(conversation_id, current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized to delete this conversation")
     
-    service.delete_conversation(conversation_id=conversation_id)
+    await service.delete_conversation(conversation_id=conversation_id)
     return {"message": "Conversation deleted successfully"}
+
+# ================== WebSocket ==================
+async def _forward_events(websocket: WebSocket, subscription: Subscription):
+    """Único escritor del socket: envía los eventos de la cola del broker."""
+    try:
+        while True:
+            payload = await subscription.get()
+            if subscription.overflowed:
+                # Cliente lento: que reconecte y se ponga al día con el cursor `after`
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+            await websocket.send_text(payload)
+    except WebSocketDisconnect:
+        pass
+
+async def _receive_client_events(websocket: WebSocket, subscription: Subscription, user_id: UUID):
+    broker = get_broker()
+    # Participantes de las conversaciones ya autorizadas en esta conexión; caducan con
+    # el mismo TTL que membership_cache para que una baja o un borrado no valga para
+    # toda la vida del socket
+    participants = TTLCache(maxsize=PARTICIPANTS_CACHE_SIZE, ttl=settings.MEMBERSHIP_CACHE_TTL)
+    try:
+        while True:
+            try:
+                event = ClientEvent.model_validate_json(await websocket.receive_text())
+            except ValidationError as e:
+                subscription.deliver(json.dumps({"type": "error", "detail": e.errors(include_url=False, include_context=False)}))
+                continue
+
+            recipients = participants.get(event.conversation_id)
+            if recipients is None:
+                # Sesión corta: la conexión puede quedar abierta horas sin retener el pool
+                async with AsyncSessionLocal() as db:
+                    recipients = await ChatService(db).get_participant_ids(event.conversation_id)
+                if user_id not in recipients:
+                    subscription.deliver(json.dumps({"type": "error", "detail": "Not authorized to access this conversation"}))
+                    continue
+                participants.set(event.conversation_id, recipients)
+
+            if event.type == "typing":
+                await broker.publish(
+                    [p for p in recipients if p != user_id],
+                    TypingEvent(conversation_id=event.conversation_id, user_id=user_id).model_dump(mode="json"),
+                )
+            else:
+                async with AsyncSessionLocal() as db:
+                    last_read_at = await ChatService(db).mark_conversation_as_read(event.conversation_id, user_id)
+                await broker.publish(
+                    recipients,
+                    ReadEvent(conversation_id=event.conversation_id, user_id=user_id, last_read_at=last_read_at).model_dump(mode="json"),
+                )
+    except WebSocketDisconnect:
+        pass
+
+@router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket):
+    """
+    Real-time events for all conversations of the current user: new messages,
+    read receipts and typing notifications. Authenticates like the REST endpoints
+    (`access_token` cookie or `Authorization: Bearer`). The client may send
+    `{"type": "typing" | "read", "conversation_id": ...}`.
+    """
+    identity = await get_websocket_identity(websocket)
+    if identity is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+
+    async with get_broker().subscribe(identity.id) as subscription:
+        tasks = [
+            asyncio.create_task(_forward_events(websocket, subscription)),
+            asyncio.create_task(_receive_client_events(websocket, subscription, identity.id)),
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()  # propaga errores inesperados
+        finally:
+            for task in tasks:
+                task.cancel()
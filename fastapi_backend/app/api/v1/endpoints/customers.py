@@ -1,70 +1,66 @@
-from typing import List
+from typing import List, Optional, Union
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.dependencies import get_db, get_current_active_user, get_current_active_admin
+from app.api.body import request_body
 from app.schemas.customer import Customer, CustomerCreate, CustomerUpdate
+from app.schemas.pagination import CursorPage
+from app.crud.pagination import MAX_PAGE_SIZE
+from app.api.export import ExportFormat, export_query, export_response
 from app.services.customer_service import CustomerService
 from app.models.user import User as DBUser # Import DBUser for type hinting
+from app.models.customer import Customer as CustomerModel
 
 router = APIRouter(
     tags=["Customers"],
     responses={404: {"description": "Not found"}},
 )
 
-# Función helper para parsear datos de JSON o form-urlencoded
-async def parse_request_data(request: Request, model_class):
-    """Parse data from JSON or form-urlencoded request"""
-    ct = (request.headers.get("content-type") or "").lower()
-    
-    if ct.startswith("application/x-www-form-urlencoded") or ct.startswith("multipart/form-data"):
-        form = await request.form()
-        # Convert form data to dict
-        data = {}
-        for key, value in form.items():
-            data[key] = value
-        return model_class(**data)
-    else:
-        # Default to JSON
-        data = await request.json()
-        return model_class(**data)
-
 @router.post("/", response_model=Customer, status_code=status.HTTP_201_CREATED)
 async def create_customer(
-    request: Request,
-    db: Session = Depends(get_db),
+    customer: CustomerCreate = Depends(request_body(CustomerCreate)),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_admin) # Only admins can create customers
 ):
     """
     Create a new customer.
     Accepts JSON or form-urlencoded data.
     """
-    customer = await parse_request_data(request, CustomerCreate)
     customer_service = CustomerService(db)
     # The service/db layer will handle creation logic and potential IntegrityErrors
-    return customer_service.create_customer(customer)
+    return await customer_service.create_customer(customer)
 
-@router.get("/", response_model=List[Customer])
-def read_customers(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+@router.get("/", response_model=Union[List[Customer], CursorPage[Customer]])
+async def read_customers(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_admin) # Only admins can view all customers
 ):
     customer_service = CustomerService(db)
-    customers = customer_service.get_customers(skip=skip, limit=limit)
+    customers = await customer_service.get_customers(skip=skip, limit=limit, cursor=cursor)
     return customers
 
+@router.get("/export")
+async def export_customers(
+    format: ExportFormat = "ndjson",
+    current_user: DBUser = Depends(get_current_active_admin)
+):
+    """Todos los clientes en streaming (NDJSON, CSV o Arrow IPC). Solo admins."""
+    return export_response(export_query(CustomerModel, Customer), format, "customers")
+
 @router.get("/{customer_id}", response_model=Customer)
-def read_customer(
+async def read_customer(
     customer_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     customer_service = CustomerService(db)
-    customer = customer_service.get_customer(customer_id)
+    customer = await customer_service.get_customer(customer_id)
     if customer is None:
         raise HTTPException(status_code=404, detail="Customer not found")
     
@@ -77,17 +73,16 @@ def read_customer(
 @router.put("/{customer_id}", response_model=Customer)
 async def update_customer(
     customer_id: UUID,
-    request: Request,
-    db: Session = Depends(get_db),
+    customer: CustomerUpdate = Depends(request_body(CustomerUpdate)),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     """
     Update a customer.
     Accepts JSON or form-urlencoded data.
     """
-    customer = await parse_request_data(request, CustomerUpdate)
     customer_service = CustomerService(db)
-    db_customer = customer_service.get_customer(customer_id)
+    db_customer = await customer_service.get_customer(customer_id)
     if db_customer is None:
         raise HTTPException(status_code=404, detail="Customer not found")
     
@@ -95,17 +90,17 @@ async def update_customer(
     if str(db_customer.id) != str(current_user.id) and current_user.role != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this customer")
     
-    updated_customer = customer_service.update_customer(customer_id, customer)
+    updated_customer = await customer_service.update_customer(customer_id, customer)
     return updated_customer
 
 @router.delete("/{customer_id}", response_model=Customer)
-def delete_customer(
+async def delete_customer(
     customer_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_admin) # Only admins can delete customers
 ):
     customer_service = CustomerService(db)
-    db_customer = customer_service.delete_customer(customer_id)
+    db_customer = await customer_service.delete_customer(customer_id)
     if db_customer is None:
         raise HTTPException(status_code=404, detail="Customer not found")
     return db_customer
@@ -1,19 +1,20 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from ....api import deps
-from ....services.dashboard_service import dashboard_service
+from ....services.dashboard_service import DashboardService
 from ....schemas.dashboard import DashboardStats
-from ....models.user import User
+from ....models.user import User, UserRole
 
 router = APIRouter()
 
 @router.get("/stats", response_model=DashboardStats)
-def get_dashboard_stats(
-    db: Session = Depends(deps.get_db),
+async def get_dashboard_stats(
+    db: AsyncSession = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user),
 ):
     """
     Retrieve dashboard statistics for the current user.
     """
-    stats = dashboard_service.get_dashboard_stats(db=db, user_id=str(current_user.id))
-    return stats
+    return await DashboardService(db).get_dashboard_stats(
+        user_id=current_user.id, include_platform=current_user.role == UserRole.ADMIN
+    )
@@ -1,144 +1,129 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from uuid import UUID
-from typing import List
+import asyncio
+import os
+from itertools import islice
 
-from app.dependencies import get_db, get_current_active_user, get_current_active_admin
-from app.schemas.inventory import Inventory, InventoryCreate, InventoryUpdate
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+from typing import List, Optional, Union
+
+from app.dependencies import get_db, get_current_active_user, get_current_identity, CurrentIdentity, get_current_active_admin
+from app.api.body import request_body
+from app.schemas.inventory import Inventory, InventoryCreate, InventoryUpdate, StockCountResult, StockCountRow, StockVariance
+from app.schemas.bulk import BulkRowError, validate_rows
+from app.schemas.pagination import CursorPage
+from app.crud.pagination import MAX_PAGE_SIZE
+from app.core.responses import trusted_list_response
+from app.api.export import ExportFormat, export_query, export_response
+from app.api.bulk import import_format, spool_body
+from app.core.bulk import iter_file_rows
+from app.api.ownership import authorize_location, inventory_item_access, location_access
+from app.core.config import settings
 from app.services.inventory_service import InventoryService
-from app.services.business_service import BusinessService # Import BusinessService
+from app.services.business_service import Ownership
 from app.models.user import User as DBUser # Import DBUser for type hinting
+from app.models.inventory import Inventory as InventoryModel
 
 router = APIRouter(
     tags=["Inventory"], # Add tag
     responses={404: {"description": "Not found"}},
 )
 
-# Función helper para parsear datos de JSON o form-urlencoded
-async def parse_request_data(request: Request, model_class):
-    """Parse data from JSON or form-urlencoded request"""
-    ct = (request.headers.get("content-type") or "").lower()
-    
-    if ct.startswith("application/x-www-form-urlencoded") or ct.startswith("multipart/form-data"):
-        form = await request.form()
-        # Convert form data to dict
-        data = {}
-        for key, value in form.items():
-            data[key] = value
-        return model_class(**data)
-    else:
-        # Default to JSON
-        data = await request.json()
-        return model_class(**data)
-
-async def get_business_id_from_inventory_item(
-    item_id: UUID, db: Session = Depends(get_db)
-) -> UUID:
-    inventory_service = InventoryService(db)
-    business_service = BusinessService(db)
-    item = inventory_service.get_inventory_item(item_id)
-    if item is None:
-        raise HTTPException(status_code=404, detail="Inventory item not found")
-    
-    location = business_service.get_business_location(item.location_id)
-    if location is None:
-        raise HTTPException(status_code=404, detail="Associated business location not found")
-    
-    return location.business_id
-
 @router.post("/", response_model=Inventory, status_code=status.HTTP_201_CREATED)
 async def create_inventory_item(
-    request: Request,
-    db: Session = Depends(get_db),
+    item_in: InventoryCreate = Depends(request_body(InventoryCreate)),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     """
     Create a new inventory item.
     Accepts JSON or form-urlencoded data.
     """
-    item_in = await parse_request_data(request, InventoryCreate)
     inventory_service = InventoryService(db)
-    business_service = BusinessService(db)
 
     # Check if the user owns the business associated with the location
-    location = business_service.get_business_location(item_in.location_id)
-    if location is None:
-        raise HTTPException(status_code=404, detail="Business location not found")
-    
-    business = business_service.get_business(location.business_id)
-    if business is None:
-        raise HTTPException(status_code=404, detail="Associated business not found")
-
-    if str(business.owner_id) != str(current_user.id) and current_user.role != "admin":
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to create inventory for this business")
-
-    return inventory_service.create_inventory_item(item_in=item_in)
-
-@router.get("/", response_model=List[Inventory])
-def read_inventory_items(
-    db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
-    current_user: DBUser = Depends(get_current_active_admin) # Only admins can view all inventory items
+    await authorize_location(db, item_in.location_id, current_user)
+
+    return await inventory_service.create_inventory_item(item_in=item_in)
+
+@router.post("/stock-count", response_model=StockCountResult)
+async def upload_stock_count(
+    location_id: UUID,
+    request: Request,
+    full_count: bool = False,
+    dry_run: bool = False,
+    db: AsyncSession = Depends(get_db),
+    ownership: Ownership = Depends(location_access)
 ):
-    inventory_service = InventoryService(db)
-    items = inventory_service.get_inventory_items(skip=skip, limit=limit)
-    return items
+    """
+    Physical stock count for a location: CSV or NDJSON rows with `sku` or `product_id`
+    and `quantity`. Counted quantities replace the current levels in one transaction
+    and the response is the variance report. With `full_count` products of the location
+    missing from the upload go to 0. Nothing is applied if any row has an error or with `dry_run`.
+    """
+    format = import_format(request)
+    path = await spool_body(request, settings.IMPORT_MAX_BYTES)
+    try:
+        rows = islice(iter_file_rows(path, format), settings.STOCK_COUNT_MAX_ROWS + 1)
+        counts, errors = await asyncio.to_thread(validate_rows, rows, StockCountRow)
+    finally:
+        os.unlink(path)
+    total = len(counts) + len(errors)
+    if total > settings.STOCK_COUNT_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.STOCK_COUNT_MAX_ROWS} rows per stock count",
+        )
 
-@router.get("/{item_id}", response_model=Inventory)
-def read_inventory_item(
-    item_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: DBUser = Depends(get_current_active_user)
+    variances, row_errors, applied = await InventoryService(db).apply_stock_count(
+        location_id, ownership.business_id, counts, full_count=full_count, apply=not errors and not dry_run,
+    )
+    errors.update(row_errors)
+    return StockCountResult(
+        location_id=location_id,
+        applied=applied,
+        rows=total,
+        adjusted=len(variances),
+        net_variance=sum(v["variance"] for v in variances),
+        variances=[StockVariance(**v) for v in variances],
+        errors=[BulkRowError(index=index, errors=errs) for index, errs in sorted(errors.items())],
+    )
+
+@router.get("/", response_model=Union[List[Inventory], CursorPage[Inventory]])
+async def read_inventory_items(
+    db: AsyncSession = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: DBUser = Depends(get_current_active_admin) # Only admins can view all inventory items
 ):
     inventory_service = InventoryService(db)
-    business_service = BusinessService(db)
+    items = await inventory_service.get_inventory_items(skip=skip, limit=limit, cursor=cursor)
+    return trusted_list_response(Inventory, items)
 
-    item = inventory_service.get_inventory_item(item_id)
-    if item is None:
-        raise HTTPException(status_code=404, detail="Inventory item not found")
-    
-    # --- INICIO DE LA AUTORIZACIÓN ---
-    location = business_service.get_business_location(item.location_id)
-    if not location:
-        raise HTTPException(status_code=404, detail="Associated location not found")
-        
-    business = business_service.get_business(location.business_id)
-    if not business:
-        raise HTTPException(status_code=404, detail="Associated business not found")
-
-    if str(business.owner_id) != str(current_user.id) and current_user.role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, 
-            detail="Not authorized to view this inventory item"
-        )
-    # --- FIN DE LA AUTORIZACIÓN ---
+@router.get("/export")
+async def export_inventory_items(
+    format: ExportFormat = "ndjson",
+    current_user: DBUser = Depends(get_current_active_admin)
+):
+    """Todo el inventario en streaming (NDJSON, CSV o Arrow IPC). Solo admins."""
+    return export_response(export_query(InventoryModel, Inventory), format, "inventory")
 
+@router.get("/{item_id}", response_model=Inventory)
+async def read_inventory_item(
+    item: InventoryModel = Depends(inventory_item_access)
+):
     return item
 
 @router.get("/by_location_product/", response_model=Inventory)
-def read_inventory_item_by_location_and_product(
+async def read_inventory_item_by_location_and_product(
     location_id: UUID,
     product_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: DBUser = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    ownership: Ownership = Depends(location_access)
 ):
     inventory_service = InventoryService(db)
-    business_service = BusinessService(db)
-
-    # Check if the user owns the business associated with the location
-    location = business_service.get_business_location(location_id)
-    if location is None:
-        raise HTTPException(status_code=404, detail="Business location not found")
-    
-    business = business_service.get_business(location.business_id)
-    if business is None:
-        raise HTTPException(status_code=404, detail="Associated business not found")
-
-    if str(business.owner_id) != str(current_user.id) and current_user.role != "admin":
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to view inventory for this business")
-
-    item = inventory_service.get_inventory_item_by_product_and_location(product_id=product_id, location_id=location_id)
+    item = await inventory_service.get_inventory_item_by_product_and_location(product_id=product_id, location_id=location_id)
     if item is None:
         raise HTTPException(status_code=404, detail="Inventory item not found")
     return item
@@ -146,28 +131,22 @@ def read_inventory_item_by_location_and_product(
 @router.put("/{item_id}", response_model=Inventory)
 async def update_inventory_item(
     item_id: UUID,
-    request: Request,
-    db: Session = Depends(get_db),
-    current_user: DBUser = Depends(get_current_active_user),
-    business_id: UUID = Depends(get_business_id_from_inventory_item) # Make it a dependency
+    item_in: InventoryUpdate = Depends(request_body(InventoryUpdate)),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity),
+    item: InventoryModel = Depends(inventory_item_access)
 ):
     """
     Update an inventory item.
     Accepts JSON or form-urlencoded data.
     """
-    item_in = await parse_request_data(request, InventoryUpdate)
     inventory_service = InventoryService(db)
-    business_service = BusinessService(db)
 
-    # Check if the user owns the business associated with the inventory item
-    business = business_service.get_business(business_id) # business_id is now resolved by FastAPI
-    if business is None:
-        raise HTTPException(status_code=404, detail="Associated business not found")
+    # Moving the item to another location requires owning that one too
+    if item_in.location_id is not None and item_in.location_id != item.location_id:
+        await authorize_location(db, item_in.location_id, current_user)
 
-    if str(business.owner_id) != str(current_user.id) and current_user.role != "admin":
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update inventory for this business")
-
-    updated_item = inventory_service.update_inventory_item(item_id=item_id, item_in=item_in)
+    updated_item = await inventory_service.update_inventory_item(item_id=item_id, item_in=item_in)
     if updated_item is None:
         raise HTTPException(status_code=404, detail="Inventory item not found")
     return updated_item
@@ -175,19 +154,12 @@ async def update_inventory_item(
 @router.delete("/{item_id}", response_model=Inventory)
 async def delete_inventory_item(
     item_id: UUID,
-    db: Session = Depends(get_db),
-    current_user: DBUser = Depends(get_current_active_admin), # Only admins can delete inventory items
-    business_id: UUID = Depends(get_business_id_from_inventory_item) # Make it a dependency
+    db: AsyncSession = Depends(get_db),
+    current_user: DBUser = Depends(get_current_active_admin) # Only admins can delete inventory items
 ):
     inventory_service = InventoryService(db)
-    business_service = BusinessService(db)
-
-    # Check if the user owns the business associated with the inventory item (even if admin, for logging/auditing)
-    business = business_service.get_business(business_id) # business_id is now resolved by FastAPI
-    if business is None:
-        raise HTTPException(status_code=404, detail="Associated business not found")
 
-    deleted_item = inventory_service.delete_inventory_item(item_id=item_id)
+    deleted_item = await inventory_service.delete_inventory_item(item_id=item_id)
     if deleted_item is None:
         raise HTTPException(status_code=404, detail="Inventory item not found")
     return deleted_item
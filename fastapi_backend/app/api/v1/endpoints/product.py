@@ -1,78 +1,122 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+import os
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from typing import List
+from typing import List, Optional, Union
 
 from app.dependencies import get_db, get_current_active_user, get_current_active_admin # Corrected import
-from app.schemas.product import Product, ProductCreate, ProductUpdate
+from app.api.body import request_body
+from app.schemas.product import Product, ProductCreate, ProductImport, ProductUpdate
+from app.schemas.pagination import CursorPage
+from app.crud.pagination import MAX_PAGE_SIZE
+from app.core.responses import trusted_list_response
+from app.api.export import ExportFormat, export_query, export_response
+from app.api.bulk import import_format, spool_body
+from app.api.ownership import authorize_business, business_access
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
 from app.services.product_service import ProductService
-from app.services.business_service import BusinessService # Import BusinessService
+from app.services.product_import_service import ProductImportService
+from app.services.business_service import Ownership
 from app.models.user import User as DBUser # Import DBUser for type hinting
+from app.models.product import Product as ProductModel
 
 router = APIRouter(
     tags=["Products"],
     responses={404: {"description": "Not found"}},
 )
 
-# Función helper para parsear datos de JSON o form-urlencoded
-async def parse_request_data(request: Request, model_class):
-    """Parse data from JSON or form-urlencoded request"""
-    ct = (request.headers.get("content-type") or "").lower()
-    
-    if ct.startswith("application/x-www-form-urlencoded") or ct.startswith("multipart/form-data"):
-        form = await request.form()
-        # Convert form data to dict
-        data = {}
-        for key, value in form.items():
-            data[key] = value
-        return model_class(**data)
-    else:
-        # Default to JSON
-        data = await request.json()
-        return model_class(**data)
-
 @router.post("/", response_model=Product, status_code=status.HTTP_201_CREATED)
 async def create_product(
-    request: Request,
-    db: Session = Depends(get_db),
+    product_in: ProductCreate = Depends(request_body(ProductCreate)),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     """
     Create a new product.
     Accepts JSON or form-urlencoded data.
     """
-    product_in = await parse_request_data(request, ProductCreate)
     product_service = ProductService(db)
-    business_service = BusinessService(db)
 
     # Check if the user owns the associated business
-    business = business_service.get_business(product_in.business_id)
-    if business is None:
-        raise HTTPException(status_code=404, detail="Business not found")
-    
-    if str(business.owner_id) != str(current_user.id) and current_user.role != "admin":
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to create product for this business")
+    await authorize_business(db, product_in.business_id, current_user)
 
-    return product_service.create_product(product_in=product_in)
+    return await product_service.create_product(product_in=product_in)
 
-@router.get("/", response_model=List[Product])
-def read_products(
+@router.get("/", response_model=Union[List[Product], CursorPage[Product]])
+async def read_products(
     business_id: UUID,
-    db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
+    db: AsyncSession = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
 ):
     product_service = ProductService(db)
-    products = product_service.get_products_by_business(business_id=business_id, skip=skip, limit=limit)
-    return products
+    products = await product_service.get_products_by_business(business_id=business_id, skip=skip, limit=limit, cursor=cursor)
+    return trusted_list_response(Product, products)
+
+@router.get("/export")
+async def export_products(
+    business_id: UUID,
+    format: ExportFormat = "ndjson",
+    ownership: Ownership = Depends(business_access)
+):
+    """Todos los productos del negocio en streaming (NDJSON, CSV o Arrow IPC)."""
+    query = export_query(ProductModel, Product).where(ProductModel.business_id == business_id)
+    return export_response(query, format, "products")
+
+async def _run_import(import_id: UUID, path: str, format: str):
+    # Sesión propia: la tarea corre después de enviar la respuesta y de cerrar get_db
+    try:
+        async with AsyncSessionLocal() as db:
+            await ProductImportService(db).run_import(import_id, path, format)
+    finally:
+        os.unlink(path)
+
+@router.post("/import", response_model=ProductImport, status_code=status.HTTP_202_ACCEPTED)
+async def import_products(
+    business_id: UUID,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: DBUser = Depends(get_current_active_user)
+):
+    """
+    Import (create or update by SKU) products from a CSV or NDJSON body.
+    The file is processed in the background; poll GET /products/imports/{id} for progress.
+    """
+    await authorize_business(db, business_id, current_user)
+
+    format = import_format(request)
+    path = await spool_body(request, settings.IMPORT_MAX_BYTES)
+    try:
+        job = await ProductImportService(db).create_import(business_id, user_id=current_user.id)
+    except BaseException:
+        os.unlink(path)
+        raise
+    background_tasks.add_task(_run_import, job.id, path, format)
+    return job
+
+@router.get("/imports/{import_id}", response_model=ProductImport)
+async def read_product_import(
+    import_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: DBUser = Depends(get_current_active_user)
+):
+    job = await ProductImportService(db).get_import(import_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    await authorize_business(db, job.business_id, current_user)
+    return job
 
 @router.get("/{product_id}", response_model=Product)
-def read_product(
+async def read_product(
     product_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     product_service = ProductService(db)
-    db_product = product_service.get_product(product_id=product_id)
+    db_product = await product_service.get_product(product_id=product_id)
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
     return db_product
@@ -80,50 +124,37 @@ def read_product(
 @router.put("/{product_id}", response_model=Product)
 async def update_product(
     product_id: UUID,
-    request: Request,
-    db: Session = Depends(get_db),
+    product_in: ProductUpdate = Depends(request_body(ProductUpdate)),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     """
     Update a product.
     Accepts JSON or form-urlencoded data.
     """
-    product_in = await parse_request_data(request, ProductUpdate)
     product_service = ProductService(db)
-    business_service = BusinessService(db)
 
-    db_product = product_service.get_product(product_id=product_id)
+    db_product = await product_service.get_product(product_id=product_id)
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
     
     # Check if the user owns the associated business
-    business = business_service.get_business(db_product.business_id)
-    if business is None:
-        raise HTTPException(status_code=404, detail="Associated business not found")
+    await authorize_business(db, db_product.business_id, current_user)
 
-    if str(business.owner_id) != str(current_user.id) and current_user.role != "admin":
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this product")
-
-    updated_product = product_service.update_product(product_id=product_id, product_in=product_in)
+    updated_product = await product_service.update_product(product_id=product_id, product_in=product_in)
     return updated_product
 
 @router.delete("/{product_id}", response_model=Product)
-def delete_product(
+async def delete_product(
     product_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_admin) # Only admins can delete products
 ):
     product_service = ProductService(db)
-    business_service = BusinessService(db)
 
-    db_product = product_service.get_product(product_id=product_id)
+    db_product = await product_service.get_product(product_id=product_id)
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    
-    # Check if the user owns the associated business (even if admin, for logging/auditing)
-    business = business_service.get_business(db_product.business_id)
-    if business is None:
-        raise HTTPException(status_code=404, detail="Associated business not found")
 
-    deleted_product = product_service.delete_product(product_id=product_id)
+    deleted_product = await product_service.delete_product(product_id=product_id)
     return deleted_product
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal
+
+from app.dependencies import get_db, get_current_identity, CurrentIdentity
+from app.models.user import UserRole
+from app.schemas.search import SearchHit
+from app.services.appointment_service import AppointmentService
+from app.services.chat_service import ChatService
+
+router = APIRouter(
+    tags=["Search"],
+)
+
+@router.get("/", response_model=List[SearchHit])
+async def search(
+    q: str = Query(..., min_length=2, max_length=200, description='Web search syntax: words, "phrases", OR, -excluded'),
+    scope: Literal["all", "messages", "documents"] = "all",
+    skip: int = Query(0, ge=0, le=1000),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity)
+):
+    """
+    Full-text search over the messages of the current user's conversations and
+    the documents of their appointments, most relevant first.
+    """
+    hits = []
+    # Con scope "all" cada fuente aporta sus skip + limit mejores y se mezclan por relevancia
+    window = skip + limit if scope == "all" else limit
+    offset = 0 if scope == "all" else skip
+    if scope in ("all", "messages"):
+        hits += await ChatService(db).search_messages(current_user.id, q, skip=offset, limit=window)
+    if scope in ("all", "documents"):
+        hits += await AppointmentService(db).search_documents(
+            current_user.id, q, skip=offset, limit=window, all_appointments=current_user.role == UserRole.ADMIN
+        )
+    if scope == "all":
+        hits.sort(key=lambda hit: (-hit["rank"], -hit["created_at"].timestamp()))
+        hits = hits[skip:skip + limit]
+    return hits
@@ -1,57 +1,113 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from typing import List
+from typing import List, Optional, Union
 
-from app.dependencies import get_db
+from app.dependencies import get_db, get_current_identity, CurrentIdentity
 from app.schemas.inventory import (
     StockTransfer, StockTransferCreate, StockTransferUpdate,
     StockTransferItem, StockTransferItemCreate
 )
+from app.schemas.bulk import BulkCreated, BulkResult, BulkRowError
+from app.schemas.pagination import CursorPage
+from app.crud.pagination import MAX_PAGE_SIZE
 from app.services.inventory_service import InventoryService
-from app.models.user import User
-from app.api.deps import get_current_user
+from app.api.bulk import read_bulk_rows
+from app.api.ownership import (
+    authorize_business, authorize_stock_transfer, authorize_stock_transfer_locations, stock_transfer_access,
+)
+from app.models.inventory import StockTransfer as StockTransferModel
 
 router = APIRouter()
 
 @router.post("/stock-transfers/", response_model=StockTransfer, status_code=status.HTTP_201_CREATED)
-def create_stock_transfer(
+async def create_stock_transfer(
     transfer_in: StockTransferCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity)
 ):
+    await authorize_stock_transfer_locations(
+        db, transfer_in.business_id, transfer_in.from_location_id, transfer_in.to_location_id, current_user
+    )
     inventory_service = InventoryService(db)
-    return inventory_service.create_stock_transfer(transfer_in=transfer_in)
+    return await inventory_service.create_stock_transfer(transfer_in=transfer_in)
 
-@router.get("/stock-transfers/", response_model=List[StockTransfer])
-def read_stock_transfers(
-    db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
-    current_user: User = Depends(get_current_user)
+@router.get("/stock-transfers/", response_model=Union[List[StockTransfer], CursorPage[StockTransfer]])
+async def read_stock_transfers(
+    db: AsyncSession = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: CurrentIdentity = Depends(get_current_identity)
 ):
+    """Transfers of the businesses owned by the current user (all of them for admins)."""
     inventory_service = InventoryService(db)
-    transfers = inventory_service.get_stock_transfers(skip=skip, limit=limit)
+    owner_id = None if current_user.role == "admin" else current_user.id
+    transfers = await inventory_service.get_stock_transfers(skip=skip, limit=limit, cursor=cursor, owner_id=owner_id)
     return transfers
 
 @router.put("/stock-transfers/{transfer_id}", response_model=StockTransfer)
-def update_stock_transfer(
+async def update_stock_transfer(
     transfer_id: UUID,
     transfer_in: StockTransferUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity),
+    transfer: StockTransferModel = Depends(stock_transfer_access)
 ):
+    # Moving the transfer to other locations or another business requires owning those too
+    changes = transfer_in.model_dump(exclude_unset=True)
+    if {"business_id", "from_location_id", "to_location_id"} & changes.keys():
+        await authorize_stock_transfer_locations(
+            db,
+            changes.get("business_id") or transfer.business_id,
+            changes.get("from_location_id") or transfer.from_location_id,
+            changes.get("to_location_id") or transfer.to_location_id,
+            current_user,
+        )
     inventory_service = InventoryService(db)
-    updated_transfer = inventory_service.update_stock_transfer(transfer_id=transfer_id, transfer_in=transfer_in)
+    updated_transfer = await inventory_service.update_stock_transfer(transfer_id=transfer_id, transfer_in=transfer_in)
     if not updated_transfer:
         raise HTTPException(status_code=404, detail="Stock transfer not found")
     return updated_transfer
 
 @router.post("/stock-transfer-items/", response_model=StockTransferItem, status_code=status.HTTP_201_CREATED)
-def create_stock_transfer_item(
+async def create_stock_transfer_item(
     item_in: StockTransferItemCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity)
+):
+    await authorize_stock_transfer(db, item_in.transfer_id, current_user)
+    inventory_service = InventoryService(db)
+    return await inventory_service.create_stock_transfer_item(item_in=item_in)
+
+@router.post(
+    "/stock-transfer-items/bulk",
+    response_model=BulkResult,
+    openapi_extra={"requestBody": {"content": {
+        "application/json": {"schema": {"type": "array", "items": StockTransferItemCreate.model_json_schema()}},
+        "application/x-ndjson": {"schema": {"type": "string"}},
+    }}},
+)
+async def create_stock_transfer_items_bulk(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_identity)
 ):
+    """
+    Crea muchas líneas de transferencia en una sola transacción. Acepta un array JSON
+    o NDJSON (una línea por ítem); las filas inválidas se reportan en `errors` por índice.
+    El usuario debe ser dueño del negocio de cada transferencia referenciada (403 si no).
+    """
+    items_in, errors = await read_bulk_rows(request, StockTransferItemCreate)
     inventory_service = InventoryService(db)
-    return inventory_service.create_stock_transfer_item(item_in=item_in)
+    businesses = await inventory_service.get_stock_transfer_businesses(
+        {item.transfer_id for item in items_in.values()}
+    ) if items_in else {}
+    for business_id in set(businesses.values()):
+        await authorize_business(db, business_id, current_user)
+    created, row_errors = await inventory_service.create_stock_transfer_items_bulk(items_in) if items_in else ({}, {})
+    errors.update(row_errors)
+    return BulkResult(
+        created=[BulkCreated(index=index, id=item_id) for index, item_id in sorted(created.items())],
+        errors=[BulkRowError(index=index, errors=errs) for index, errs in sorted(errors.items())],
+    )
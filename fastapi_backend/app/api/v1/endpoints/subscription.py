@@ -1,127 +1,112 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from typing import List
+from typing import List, Optional, Union
 
 from app.dependencies import get_db, get_current_active_user
+from app.api.body import request_body
 from app.schemas.subscription import (
     SubscriptionProduct, SubscriptionProductCreate,
     Price, PriceCreate,
     Subscription, SubscriptionCreate, SubscriptionUpdate,
     SubscriptionProductResponse, PriceResponse
 )
+from app.schemas.pagination import CursorPage
+from app.crud.pagination import MAX_PAGE_SIZE
 from app.services.subscription_service import SubscriptionService
 from app.models.user import User as DBUser
 
 router = APIRouter()
 
-# Función helper para parsear datos de JSON o form-urlencoded
-async def parse_request_data(request: Request, model_class):
-    """Parse data from JSON or form-urlencoded request"""
-    ct = (request.headers.get("content-type") or "").lower()
-    
-    if ct.startswith("application/x-www-form-urlencoded") or ct.startswith("multipart/form-data"):
-        form = await request.form()
-        # Convert form data to dict
-        data = {}
-        for key, value in form.items():
-            data[key] = value
-        return model_class(**data)
-    else:
-        # Default to JSON
-        data = await request.json()
-        return model_class(**data)
-
 # --- SubscriptionProduct Endpoints ---
 @router.post("/products", response_model=SubscriptionProductResponse, status_code=status.HTTP_201_CREATED)
 async def create_subscription_product(
-    request: Request,
-    db: Session = Depends(get_db),
+    product_in: SubscriptionProductCreate = Depends(request_body(SubscriptionProductCreate)),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     """
     Create a new subscription product.
     Accepts JSON or form-urlencoded data.
     """
-    product_in = await parse_request_data(request, SubscriptionProductCreate)
     service = SubscriptionService(db)
-    return service.create_subscription_product(product_in=product_in)
+    return await service.create_subscription_product(product_in=product_in)
 
-@router.get("/products", response_model=List[SubscriptionProductResponse])
-def read_subscription_products(
-    db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
+@router.get("/products", response_model=Union[List[SubscriptionProductResponse], CursorPage[SubscriptionProductResponse]])
+async def read_subscription_products(
+    db: AsyncSession = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: DBUser = Depends(get_current_active_user)
 ):
     service = SubscriptionService(db)
-    return service.get_subscription_products(skip=skip, limit=limit)
+    return await service.get_subscription_products(skip=skip, limit=limit, cursor=cursor)
 
 # --- Price Endpoints ---
 @router.post("/prices", response_model=PriceResponse, status_code=status.HTTP_201_CREATED)
 async def create_price(
-    request: Request,
-    db: Session = Depends(get_db),
+    price_in: PriceCreate = Depends(request_body(PriceCreate)),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     """
     Create a new price.
     Accepts JSON or form-urlencoded data.
     """
-    price_in = await parse_request_data(request, PriceCreate)
     service = SubscriptionService(db)
-    return service.create_price(price_in=price_in)
+    return await service.create_price(price_in=price_in)
 
-@router.get("/prices", response_model=List[PriceResponse])
-def read_prices(
-    db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
+@router.get("/prices", response_model=Union[List[PriceResponse], CursorPage[PriceResponse]])
+async def read_prices(
+    db: AsyncSession = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: DBUser = Depends(get_current_active_user)
 ):
     service = SubscriptionService(db)
-    return service.get_prices(skip=skip, limit=limit)
+    return await service.get_prices(skip=skip, limit=limit, cursor=cursor)
 
 # --- Subscription Endpoints ---
 @router.post("/subscriptions", response_model=Subscription, status_code=status.HTTP_201_CREATED)
 async def create_subscription(
-    request: Request,
-    db: Session = Depends(get_db),
+    subscription_in: SubscriptionCreate = Depends(request_body(SubscriptionCreate)),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     """
     Create a new subscription.
     Accepts JSON or form-urlencoded data.
     """
-    subscription_in = await parse_request_data(request, SubscriptionCreate)
     service = SubscriptionService(db)
-    return service.create_subscription(subscription_in=subscription_in)
+    return await service.create_subscription(subscription_in=subscription_in)
 
-@router.get("/subscriptions", response_model=List[Subscription])
-def read_subscriptions(
+@router.get("/subscriptions", response_model=Union[List[Subscription], CursorPage[Subscription]])
+async def read_subscriptions(
     user_id: UUID,
-    db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
+    db: AsyncSession = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: DBUser = Depends(get_current_active_user)
 ):
     service = SubscriptionService(db)
-    return service.get_subscriptions_by_user(user_id=user_id, skip=skip, limit=limit)
+    return await service.get_subscriptions_by_user(user_id=user_id, skip=skip, limit=limit, cursor=cursor)
 
 @router.put("/subscriptions/{subscription_id}", response_model=Subscription)
 async def update_subscription(
     subscription_id: UUID,
-    request: Request,
-    db: Session = Depends(get_db),
+    subscription_in: SubscriptionUpdate = Depends(request_body(SubscriptionUpdate)),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user)
 ):
     """
     Update a subscription.
     Accepts JSON or form-urlencoded data.
     """
-    subscription_in = await parse_request_data(request, SubscriptionUpdate)
     service = SubscriptionService(db)
-    subscription = service.update_subscription(
+    subscription = await service.update_subscription(
         subscription_id=subscription_id, 
         subscription_in=subscription_in,
         user_id=current_user.id
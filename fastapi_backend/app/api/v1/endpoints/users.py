@@ -1,13 +1,14 @@
 from typing import List
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.dependencies import get_db, get_current_active_user # Import get_current_active_user
 from app.schemas.user import User, UserUpdate, UserCreate, UserRole # Import UserCreate and UserRole
-from app.services.user_service import UserService
+from app.services.user_service import user_service
 from app.models.user import User as DBUser # Import DBUser for type hinting in dependencies
+from app.crud.pagination import MAX_PAGE_SIZE
 
 router = APIRouter(
     tags=["Users"], # Capitalized tag
@@ -15,26 +16,25 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=User, status_code=status.HTTP_201_CREATED)
-def create_user(
+async def create_user(
     user: UserCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user) # Only authenticated users can create
 ):
-    user_service = UserService(db)
     # Only ADMIN can create users with a specific role, otherwise default to PATIENT
     if user.role and current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to set user roles."
         )
-    db_user = user_service.create_user(user)
+    db_user = await user_service.create(db, obj_in=user)
     return db_user
 
 @router.get("/", response_model=List[User])
-def read_users(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+async def read_users(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user) # Secure this endpoint
 ):
     # Only ADMIN can view all users
@@ -43,18 +43,16 @@ def read_users(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to view all users."
         )
-    user_service = UserService(db)
-    users = user_service.get_users(skip=skip, limit=limit)
+    users = await user_service.get_multi(db, skip=skip, limit=limit)
     return users
 
 @router.get("/{user_id}", response_model=User)
-def read_user(
+async def read_user(
     user_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user) # Secure this endpoint
 ):
-    user_service = UserService(db)
-    user = user_service.get_user(user_id)
+    user = await user_service.get(db, id=user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -67,14 +65,13 @@ def read_user(
     return user
 
 @router.put("/{user_id}", response_model=User)
-def update_user(
+async def update_user(
     user_id: UUID,
     user: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user) # Secure this endpoint
 ):
-    user_service = UserService(db)
-    db_user = user_service.get_user(user_id) # Get user to check ownership/roles
+    db_user = await user_service.get(db, id=user_id) # Get user to check ownership/roles
 
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
@@ -93,17 +90,16 @@ def update_user(
             detail="Not authorized to change user roles."
         )
 
-    db_user = user_service.update_user(user_id, user)
+    db_user = await user_service.update(db, db_obj=db_user, obj_in=user)
     return db_user
 
 @router.delete("/{user_id}", response_model=User)
-def delete_user(
+async def delete_user(
     user_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: DBUser = Depends(get_current_active_user) # Secure this endpoint
 ):
-    user_service = UserService(db)
-    db_user = user_service.get_user(user_id) # Get user to check ownership/roles
+    db_user = await user_service.get(db, id=user_id) # Get user to check ownership/roles
 
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
@@ -122,5 +118,5 @@ def delete_user(
             detail="Admins cannot delete their own account."
         )
 
-    db_user = user_service.delete_user(user_id)
+    db_user = await user_service.remove(db, id=user_id)
     return db_user
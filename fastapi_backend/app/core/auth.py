@@ -13,4 +13,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+def identity_claims(user) -> dict:
+    """Claims identifying `user`; includes role/active flags when TOKEN_IDENTITY_CLAIMS is on."""
+    claims = {"sub": str(user.id)}
+    if settings.TOKEN_IDENTITY_CLAIMS:
+        role = user.role.value if user.role is not None else None
+        claims.update({"role": role, "active": user.is_active is not False})
+    return claims
@@ -0,0 +1,201 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Set
+from uuid import UUID
+
+import asyncpg
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.db.session import async_engine
+
+logger = logging.getLogger(__name__)
+
+# Canal de NOTIFY compartido por todos los workers
+NOTIFY_CHANNEL = "chat_events"
+# Postgres rechaza payloads de NOTIFY de 8000 bytes o más
+NOTIFY_MAX_PAYLOAD = 7900
+# Campos que se conservan cuando un evento no cabe en el payload
+SLIM_EVENT_KEYS = ("type", "id", "conversation_id", "sender_id", "user_id")
+# Segundos como máximo para publicar un evento antes de descartarlo
+PUBLISH_TIMEOUT = 2.0
+
+
+class Subscription:
+    """Cola acotada de eventos (ya serializados a JSON) de una conexión."""
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # El cliente no consume al ritmo de los eventos: hay que cerrarle la conexión
+        self.overflowed = False
+
+    def deliver(self, payload: str) -> None:
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self) -> str:
+        return await self.queue.get()
+
+
+class InMemoryBroker:
+    """
+    Fan-out de eventos a las conexiones de este worker, indexadas por usuario.
+    Suficiente con un solo worker; con varios usar PostgresBroker.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscriptions: Dict[str, Set[Subscription]] = defaultdict(set)
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: UUID) -> AsyncIterator[Subscription]:
+        await self.start()
+        key = str(user_id)
+        subscription = Subscription(self.queue_size)
+        self._subscriptions[key].add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscriptions = self._subscriptions.get(key)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[key]
+
+    async def publish(self, user_ids: Iterable[UUID], event: Dict[str, Any]) -> None:
+        """
+        `event` debe ser serializable a JSON (ver fastapi.encoders.jsonable_encoder).
+        No lanza excepciones: se llama después de confirmar la escritura, y un
+        evento perdido se recupera con el cursor `after` de los mensajes.
+        """
+        self._deliver([str(user_id) for user_id in user_ids], json.dumps(event))
+
+    def _deliver(self, user_ids: Iterable[str], payload: str) -> None:
+        # Se serializa una sola vez y el mismo texto va a todas las colas
+        for user_id in user_ids:
+            for subscription in self._subscriptions.get(user_id, ()):
+                subscription.deliver(payload)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "users": len(self._subscriptions),
+            "connections": sum(len(subscriptions) for subscriptions in self._subscriptions.values()),
+        }
+
+
+class PostgresBroker(InMemoryBroker):
+    """
+    Fan-out entre workers con LISTEN/NOTIFY. Cada worker mantiene una conexión
+    dedicada escuchando NOTIFY_CHANNEL y reparte localmente lo que recibe; la
+    publicación es un pg_notify por evento con la lista de destinatarios, por esa
+    misma conexión para que los eventos de "escribiendo" no ocupen el pool de las
+    peticiones (solo se usa el pool mientras la conexión se está reconectando).
+
+    Los eventos emitidos mientras la conexión de escucha se está reconectando se
+    pierden: los clientes se ponen al día con el cursor `after` de los mensajes.
+    """
+
+    def __init__(self, queue_size: int, engine, reconnect_delay: float = 1.0):
+        super().__init__(queue_size)
+        self.engine = engine
+        self.reconnect_delay = reconnect_delay
+        self._listener: Optional[asyncio.Task] = None
+        self._connection: Optional[asyncpg.Connection] = None
+        # asyncpg no admite operaciones simultáneas en una conexión
+        self._notify_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def publish(self, user_ids: Iterable[UUID], event: Dict[str, Any]) -> None:
+        users = [str(user_id) for user_id in user_ids]
+        payload = json.dumps({"users": users, "event": event})
+        if len(payload.encode()) > NOTIFY_MAX_PAYLOAD:
+            # El cliente recupera el contenido completo por la API REST
+            event = {key: event[key] for key in SLIM_EVENT_KEYS if key in event}
+            payload = json.dumps({"users": users, "event": {**event, "truncated": True}})
+        try:
+            await asyncio.wait_for(self._notify(payload), PUBLISH_TIMEOUT)
+        except Exception:
+            # El mensaje ya está guardado: fallar aquí haría que el cliente lo reenviara
+            logger.exception("Chat event publish failed, event dropped")
+
+    async def _notify(self, payload: str) -> None:
+        connection = self._connection
+        if connection is not None and not connection.is_closed():
+            async with self._notify_lock:
+                await connection.execute("SELECT pg_notify($1, $2)", NOTIFY_CHANNEL, payload)
+            return
+        async with self.engine.connect() as conn:
+            await conn.execute(select(func.pg_notify(NOTIFY_CHANNEL, payload)))
+            await conn.commit()
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+            self._deliver(data["users"], json.dumps(data["event"]))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("Invalid chat event payload: %s", e)
+
+    async def _listen(self) -> None:
+        dsn = self.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(NOTIFY_CHANNEL, self._on_notify)
+                self._connection = connection
+                await closed.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Chat broker listener error")
+            finally:
+                self._connection = None
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(self.reconnect_delay)
+
+
+_broker: Optional[InMemoryBroker] = None
+
+
+def get_broker() -> InMemoryBroker:
+    """Broker del worker según CHAT_BROKER ("memory" o "postgres")."""
+    global _broker
+    if _broker is None:
+        if settings.CHAT_BROKER == "postgres":
+            _broker = PostgresBroker(settings.CHAT_WS_QUEUE_SIZE, async_engine)
+        else:
+            _broker = InMemoryBroker(settings.CHAT_WS_QUEUE_SIZE)
+    return _broker
+
+
+async def close_broker() -> None:
+    global _broker
+    if _broker is not None:
+        await _broker.close()
+        _broker = None
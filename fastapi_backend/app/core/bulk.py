@@ -0,0 +1,35 @@
+"""
+Lectura de las filas de un fichero de importación (CSV o NDJSON) ya guardado en
+disco. Sin dependencias de HTTP: lo usan tanto los endpoints como los servicios
+y los comandos de línea.
+"""
+import csv
+import json
+from typing import Any, Iterator, Literal, Tuple
+
+
+def parse_line(line: bytes) -> Any:
+    """El JSON de una línea NDJSON, o el ValueError si no es válida."""
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        return exc
+
+
+def iter_file_rows(path: str, format: Literal["csv", "ndjson"]) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield (index, row) from a spooled CSV or NDJSON file. Empty CSV cells become
+    None; as in app.api.bulk.iter_bulk_rows, an invalid NDJSON line yields a ValueError.
+    """
+    if format == "csv":
+        with open(path, newline="", encoding="utf-8-sig") as source:
+            for index, row in enumerate(csv.DictReader(source)):
+                # Extra cells (key None) are dropped
+                yield index, {key: (value if value != "" else None) for key, value in row.items() if key is not None}
+        return
+    with open(path, "rb") as source:
+        index = 0
+        for line in source:
+            if line.strip():
+                yield index, parse_line(line)
+                index += 1
@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import List, Literal, Optional, Union
 from pydantic import AnyHttpUrl, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import json
@@ -11,6 +11,85 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+
+    # Caché de identidad por worker para get_current_user (0 desactiva)
+    IDENTITY_CACHE_TTL: int = 60  # segundos
+    IDENTITY_CACHE_MAX_SIZE: int = 10000
+    # Incluir rol y estado activo en el JWT para que los endpoints de lectura
+    # no consulten al usuario. Los cambios de rol solo aplican al renovar el token.
+    TOKEN_IDENTITY_CLAIMS: bool = False
+
+    # Hash de contraseñas: coste de bcrypt y pool acotado fuera del event loop
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64  # en cola + ejecutándose, por worker
+    PASSWORD_HASH_QUEUE_TIMEOUT: float = 10.0  # segundos esperando turno antes de responder 503
+
+    # Listados de productos e inventario serializados con orjson directamente desde
+    # los objetos ORM, sin validar contra el response_model (salida de confianza)
+    TRUSTED_ORM_RESPONSES: bool = False
+
+    # Tamaño máximo del body en los endpoints que usan request_body (JSON, form o msgpack)
+    MAX_BODY_BYTES: int = 1024 * 1024
+
+    # Importación masiva del catálogo (POST /products/import y python -m app.import_products)
+    IMPORT_CHUNK_SIZE: int = 5000  # filas validadas y upsertadas por transacción
+    IMPORT_MAX_BYTES: int = 200 * 1024 * 1024
+    IMPORT_MAX_REPORTED_ERRORS: int = 1000  # filas con error guardadas en el informe
+
+    # Conteos de stock (POST /inventory/stock-count): todas las filas se aplican en una transacción
+    STOCK_COUNT_MAX_ROWS: int = 100000
+
+    # Filas leídas por vuelta del cursor de servidor en los endpoints /export
+    EXPORT_BATCH_SIZE: int = 2000
+
+    # Filas máximas por petición en los endpoints bulk (array JSON o NDJSON)
+    BULK_MAX_ROWS: int = 10000
+    BULK_MAX_BYTES: int = 16 * 1024 * 1024
+
+    # Caché de pertenencia a conversaciones del chat (0 desactiva)
+    MEMBERSHIP_CACHE_TTL: int = 60  # segundos
+    MEMBERSHIP_CACHE_MAX_SIZE: int = 50000
+
+    # Caché de propiedad (negocio/ubicación -> dueño) para autorizar endpoints (0 desactiva)
+    OWNERSHIP_CACHE_TTL: int = 60  # segundos
+    OWNERSHIP_CACHE_MAX_SIZE: int = 50000
+
+    # Nivel de los logs de la aplicación (loggers app.*); cada petición deja en INFO
+    # una línea JSON con su tiempo y sus sentencias SQL
+    LOG_LEVEL: str = "INFO"
+
+    # Instrumentación SQL por petición: nº de sentencias, tiempo en BD y las
+    # SQL_SLOWEST_STATEMENTS más lentas, en el log y en la cabecera Server-Timing
+    SQL_INSTRUMENTATION: bool = True
+    SQL_SLOWEST_STATEMENTS: int = 3
+    # Sentencias más lentas que esto (ms) se registran con su plan EXPLAIN (0 desactiva)
+    SQL_SLOW_QUERY_MS: float = 500
+
+    # Desarrollo/tests: sentencias SQL máximas por petición. Con un valor > 0 cada respuesta
+    # lleva la cuenta en X-SQL-Statements y las que lo superan se convierten en un 500 (0 desactiva)
+    SQL_STATEMENT_BUDGET: int = 0
+
+    # Token Bearer estático para /metrics, /metrics/db-pool y /metrics/chat (el scraper de
+    # Prometheus). Sin él, o con otro token, solo entran los admins con su token de sesión
+    METRICS_TOKEN: str = ""
+
+    # Embeddings de documentos de citas: "numpy" (índice local mapeado en memoria desde
+    # EMBEDDING_INDEX_DIR) o "pgvector" (columna vector en Postgres con índice HNSW)
+    EMBEDDING_BACKEND: Literal["numpy", "pgvector"] = "numpy"
+    # "hashing" (local, sin modelo) o el nombre de un modelo de sentence-transformers
+    EMBEDDING_MODEL: str = "hashing"
+    EMBEDDING_DIM: int = 384
+    EMBEDDING_INDEX_DIR: str = "var/embeddings"
+    EMBEDDING_BATCH_SIZE: int = 256  # documentos por lote en el backfill
+    # Índice numpy: a partir de estas filas se usa IVF en lugar de fuerza bruta
+    EMBEDDING_IVF_MIN_ROWS: int = 50000
+    EMBEDDING_IVF_PROBES: int = 8
+
+    # Chat en tiempo real: "memory" (un solo worker) o "postgres" (LISTEN/NOTIFY entre workers)
+    CHAT_BROKER: Literal["memory", "postgres"] = "memory"
+    # Eventos pendientes por conexión WebSocket antes de cerrarla por lenta
+    CHAT_WS_QUEUE_SIZE: int = 100
     
     # BACKEND_CORS_ORIGINS is a JSON-formatted list of origins
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = []
@@ -26,6 +105,19 @@ class Settings(BaseSettings):
     
     PROJECT_NAME: str = "SasDatQbox API"
     DATABASE_URL: str
+    # Opcional: por defecto se deriva de DATABASE_URL usando el driver asyncpg
+    ASYNC_DATABASE_URL: Optional[str] = None
+
+    # Pool de conexiones (valores por worker de uvicorn)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0  # segundos esperando una conexión libre
+    DB_POOL_RECYCLE: int = 1800  # segundos; -1 desactiva el reciclado
+    DB_POOL_PRE_PING: bool = True
+    # Presupuesto total de conexiones para todos los workers; si se define,
+    # pool_size + max_overflow de cada worker se recorta a DB_MAX_CONNECTIONS // WEB_CONCURRENCY
+    DB_MAX_CONNECTIONS: Optional[int] = None
+    WEB_CONCURRENCY: int = 1
     POSTGRES_DB: str
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
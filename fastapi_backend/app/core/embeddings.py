@@ -0,0 +1,62 @@
+import hashlib
+import re
+from functools import lru_cache
+from typing import List, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbedder:
+    """
+    Embedding local sin modelo: feature hashing de palabras y bigramas a `dim`
+    dimensiones con signo, normalizado (L2). Determinista y sin descargas, útil
+    para desarrollo y tests; en producción usar un modelo (EMBEDDING_MODEL).
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        tokens = _TOKEN_RE.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+                vectors[row, digest % self.dim] += 1.0 if (digest >> 63) else -1.0
+        return _normalize(vectors)
+
+
+class SentenceTransformerEmbedder:
+    """Modelo de sentence-transformers (dependencia opcional, no incluida en requirements)."""
+
+    def __init__(self, model_name: str, dim: int):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.dim = dim
+        if self.model.get_sentence_embedding_dimension() != dim:
+            raise ValueError(f"{model_name} produces {self.model.get_sentence_embedding_dimension()}-d vectors, EMBEDDING_DIM is {dim}")
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return _normalize(self.model.encode(list(texts), convert_to_numpy=True).astype(np.float32))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+@lru_cache(maxsize=1)
+def get_embedder():
+    """Embedder del proceso según EMBEDDING_MODEL ("hashing" o un modelo de sentence-transformers)."""
+    if settings.EMBEDDING_MODEL == "hashing":
+        return HashingEmbedder(settings.EMBEDDING_DIM)
+    return SentenceTransformerEmbedder(settings.EMBEDDING_MODEL, settings.EMBEDDING_DIM)
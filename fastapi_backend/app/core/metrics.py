@@ -0,0 +1,174 @@
+"""
+Métricas del worker en formato de texto de Prometheus (GET /metrics).
+
+MetricsMiddleware cuenta las peticiones HTTP por plantilla de ruta (la de FastAPI,
+p. ej. `/api/v1/inventory/{item_id}`, nunca el path real), método y código de
+estado, junto con un histograma de latencia y las peticiones en curso. Las
+peticiones que no casan con ninguna ruta comparten la etiqueta `<unmatched>` y
+los métodos desconocidos `OTHER`, así que la cardinalidad está acotada por las
+rutas declaradas. `render_metrics` añade la ocupación del pool de conexiones y de
+los pools de hilos (el de anyio para endpoints síncronos y el de hash de contraseñas).
+
+Cada worker de uvicorn tiene sus propios contadores: Prometheus debe raspar cada
+worker por separado o sumarlos con la etiqueta de instancia.
+"""
+import time
+from typing import Dict, List, Tuple
+
+from anyio import to_thread
+from starlette.routing import replace_params
+
+from app.core.broker import get_broker
+from app.core.security import hash_pool_status
+from app.db.pool import Histogram, pool_status
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+UNMATCHED_ROUTE = "<unmatched>"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RequestMetrics:
+    """Contadores de peticiones HTTP del worker, por (método, ruta) y código de estado."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.responses: Dict[Tuple[str, str, int], int] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float) -> None:
+        key = (method, route)
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency[key] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(seconds)
+        key = (method, route, status)
+        self.responses[key] = self.responses.get(key, 0) + 1
+
+
+request_metrics = RequestMetrics()
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latencia, código de estado y peticiones en curso por plantilla de ruta."""
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        metrics = self.metrics
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.in_flight -= 1
+            method = scope["method"]
+            metrics.observe(method if method in METHODS else "OTHER", route_template(scope), status, elapsed)
+
+
+def route_template(scope) -> str:
+    """
+    Plantilla de la ruta que atendió la petición. El router deja la ruta en
+    `scope["route"]`; con routers incluidos su `path` puede ser solo la parte
+    final (`/{item_id}`), así que el prefijo se toma del path real.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return UNMATCHED_ROUTE
+    path = scope["path"]
+    suffix, _ = replace_params(route.path_format, route.param_convertors, dict(scope.get("path_params", {})))
+    if len(suffix) < len(path) and path.endswith(suffix):
+        template = path[:len(path) - len(suffix)] + template
+    return template
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _metric(lines: List[str], name: str, kind: str, help: str) -> None:
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _histogram(lines: List[str], name: str, snapshot: dict, **labels) -> None:
+    for bound, count in snapshot["buckets"].items():
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+    suffix = _labels(**labels) if labels else ""
+    lines.append(f"{name}_sum{suffix} {snapshot['sum']}")
+    lines.append(f"{name}_count{suffix} {snapshot['count']}")
+
+
+def render_metrics(pool, metrics: RequestMetrics = request_metrics) -> str:
+    """Métricas del worker en formato de texto de Prometheus 0.0.4. Debe llamarse desde el event loop."""
+    lines: List[str] = []
+
+    _metric(lines, "http_requests_total", "counter", "HTTP responses by route template, method and status code.")
+    for (method, route, status), count in sorted(metrics.responses.items()):
+        lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    _metric(lines, "http_request_duration_seconds", "histogram", "HTTP request latency by route template and method.")
+    for (method, route), histogram in sorted(metrics.latency.items()):
+        _histogram(lines, "http_request_duration_seconds", histogram.snapshot(), method=method, route=route)
+
+    _metric(lines, "http_requests_in_flight", "gauge", "HTTP requests being served.")
+    lines.append(f"http_requests_in_flight {metrics.in_flight}")
+
+    status = pool_status(pool)
+    for key, help in (
+        ("size", "Configured size of the DB connection pool."),
+        ("checked_out", "DB connections in use."),
+        ("idle", "Idle DB connections in the pool."),
+        ("overflow", "DB connections open beyond the pool size."),
+        ("max_overflow", "Maximum DB connections allowed beyond the pool size."),
+    ):
+        _metric(lines, f"db_pool_{key}", "gauge", help)
+        lines.append(f"db_pool_{key} {status[key]}")
+    if "wait_time_seconds" in status:
+        _metric(lines, "db_pool_checkout_wait_seconds", "histogram", "Time spent waiting for a DB connection.")
+        _histogram(lines, "db_pool_checkout_wait_seconds", status["wait_time_seconds"])
+
+    # Pool de anyio donde Starlette ejecuta endpoints y dependencias síncronas
+    limiter = to_thread.current_default_thread_limiter()
+    for name, help, value in (
+        ("threadpool_threads", "Threads available to run sync endpoints.", limiter.total_tokens),
+        ("threadpool_threads_in_use", "Threads running sync endpoints.", limiter.borrowed_tokens),
+        ("threadpool_tasks_waiting", "Sync calls waiting for a free thread.", limiter.statistics().tasks_waiting),
+    ):
+        _metric(lines, name, "gauge", help)
+        lines.append(f"{name} {value}")
+
+    hashing = hash_pool_status()
+    for key, help in (
+        ("workers", "Threads hashing passwords."),
+        ("pending", "Password hash operations queued or running."),
+        ("max_pending", "Password hash operations accepted before answering 503."),
+    ):
+        _metric(lines, f"password_hash_{key}", "gauge", help)
+        lines.append(f"password_hash_{key} {hashing[key]}")
+
+    _metric(lines, "chat_websocket_connections", "gauge", "Open chat WebSocket connections.")
+    lines.append(f"chat_websocket_connections {get_broker().stats()['connections']}")
+
+    return "\n".join(lines) + "\n"
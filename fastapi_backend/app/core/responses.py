@@ -0,0 +1,51 @@
+from operator import attrgetter
+from typing import Any, List, Type, Union
+from uuid import UUID
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+
+def _default(obj: Any) -> Any:
+    # orjson solo reconoce uuid.UUID exacto; asyncpg devuelve una subclase propia
+    if isinstance(obj, UUID):
+        return str(obj)
+    raise TypeError
+
+
+def dumps(content: Any) -> bytes:
+    """JSON con orjson (UUID, datetime y enums nativos); las fechas UTC salen con "Z", igual que en pydantic."""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse serializada con `dumps`."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def orm_rows(schema: Type[BaseModel], objects: List[Any]) -> List[dict]:
+    """Copia de cada objeto ORM solo los campos de `schema`, sin validarlos."""
+    fields = tuple(schema.model_fields)
+    getter = attrgetter(*fields)
+    if len(fields) == 1:
+        return [{fields[0]: getter(obj)} for obj in objects]
+    return [dict(zip(fields, getter(obj))) for obj in objects]
+
+
+def trusted_list_response(schema: Type[BaseModel], result: Union[List[Any], dict]):
+    """
+    Con TRUSTED_ORM_RESPONSES devuelve el listado (lista o página de `paginate`)
+    serializado con orjson a partir de los objetos ORM, sin pasar por el
+    response_model; si no, devuelve `result` para que FastAPI lo valide.
+    Solo para esquemas cuyos campos son columnas del modelo sin conversión de tipo.
+    """
+    if not settings.TRUSTED_ORM_RESPONSES:
+        return result
+    if isinstance(result, dict):
+        return ORJSONResponse({**result, "items": orm_rows(schema, result["items"])})
+    return ORJSONResponse(orm_rows(schema, result))
@@ -1,14 +1,65 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
+from app.core.config import settings
+
 # --- Constants ---
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30  # 30 minutes
 
 # --- Password Hashing ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Los hashes con un coste distinto de BCRYPT_ROUNDS se marcan para re-hash (ver verify_and_update)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+# bcrypt libera el GIL, así que un pool de hilos basta para sacarlo del event loop.
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+# Backpressure: como máximo PASSWORD_HASH_MAX_PENDING operaciones en cola o ejecutándose
+_hash_slots: Optional[asyncio.Semaphore] = None
+
+async def _run_in_hash_pool(func: Callable[..., Any], *args: Any) -> Any:
+    global _hash_slots
+    if _hash_slots is None:
+        _hash_slots = asyncio.Semaphore(settings.PASSWORD_HASH_MAX_PENDING)
+    try:
+        await asyncio.wait_for(_hash_slots.acquire(), timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent authentication requests, try again later",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_slots.release()
+
+def hash_pool_status() -> Dict[str, int]:
+    """Operaciones de hash en cola o ejecutándose frente a los límites del pool."""
+    pending = settings.PASSWORD_HASH_MAX_PENDING - _hash_slots._value if _hash_slots is not None else 0
+    return {
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "pending": pending,
+        "max_pending": settings.PASSWORD_HASH_MAX_PENDING,
+    }
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica la contraseña fuera del event loop. Devuelve (válida, nuevo_hash);
+    nuevo_hash solo viene cuando el hash guardado usa un coste obsoleto.
+    """
+    return await _run_in_hash_pool(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_in_hash_pool(pwd_context.hash, password)
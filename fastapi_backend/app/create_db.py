@@ -16,6 +16,7 @@ from app.models.product import Product
 from app.models.inventory import Inventory, StockTransfer, StockTransferItem
 from app.models.patient import Patient
 from app.models.appointment import Appointment, AppointmentDocument
+from app.models.dashboard import DashboardUserStats, DashboardDailyStats
 from app.models.conversation import Conversation, ConversationParticipant, Message
 from app.core.config import settings
 
@@ -25,6 +26,8 @@ def main():
     
     with engine.connect() as connection:
         connection.execute(sa.text("CREATE SCHEMA IF NOT EXISTS pos;"))
+        if settings.EMBEDDING_BACKEND == "pgvector":
+            connection.execute(sa.text("CREATE EXTENSION IF NOT EXISTS vector;"))
         connection.commit()
 
     # This will create all tables defined in your models
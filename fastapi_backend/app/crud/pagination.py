@@ -0,0 +1,63 @@
+"""
+Paginación de listados.
+
+Por defecto los listados siguen con `skip`/`limit` (ahora ordenados por
+`(created_at, id)` para que el resultado sea determinista). Pasando `cursor`
+se activa el modo keyset: la respuesta es un `CursorPage` y la página
+siguiente se pide con `cursor=<next_cursor>`; `cursor=` vacío pide la primera.
+Con un índice sobre `(created_at, id)` cada página cuesta lo mismo sin
+importar cuán profunda sea.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple, Union
+
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Tamaño máximo de página de los listados (`limit`)
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(obj: Any) -> str:
+    raw = json.dumps([obj.created_at.isoformat(), str(obj.id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, model: Any) -> Tuple[datetime, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id_ = json.loads(raw)
+        return datetime.fromisoformat(created_at), model.id.type.python_type(id_)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def paginate(
+    db: AsyncSession,
+    query: Select,
+    model: Any,
+    *,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Union[List[Any], dict]:
+    """
+    Ejecuta `query` (un select de `model`) ordenado por `(created_at, id)`.
+    Sin `cursor` devuelve la lista con OFFSET; con `cursor` devuelve
+    `{"items": [...], "next_cursor": ...}` usando keyset.
+    """
+    if limit < 1 or skip < 0:
+        raise HTTPException(status_code=400, detail="limit must be at least 1 and skip cannot be negative")
+    query = query.order_by(model.created_at, model.id)
+    if cursor is None:
+        return list(await db.scalars(query.offset(skip).limit(limit)))
+
+    if cursor:
+        created_at, id_ = decode_cursor(cursor, model)
+        query = query.where(tuple_(model.created_at, model.id) > tuple_(created_at, id_))
+    items = list(await db.scalars(query.limit(limit + 1)))
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return {"items": items[:limit], "next_cursor": next_cursor}
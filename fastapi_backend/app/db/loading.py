@@ -0,0 +1,93 @@
+"""
+Política de carga de relaciones por schema de respuesta.
+
+Cada schema que anida relaciones declara aquí cómo se cargan (selectinload para
+colecciones, joinedload para many-to-one) y los servicios consultan con
+`.options(*loader_options(Schema))`. Así un listado cuesta un número fijo de
+consultas sin importar cuántas filas devuelva, y añadir un campo anidado a un
+schema obliga a declarar su carga en un único sitio.
+
+En la sesión async una relación sin cargar no se carga sola al serializar (falla
+con MissingGreenlet o, con lazy="raise", con un error explícito), así que un
+schema sin declarar se nota en el primer test que lo use.
+"""
+from typing import Callable, Dict, Tuple
+
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.interfaces import ORMOption
+
+from app.models.appointment import Appointment
+from app.models.business import Business
+from app.models.chat import Conversation, Message
+from app.models.subscription import SubscriptionProduct
+from app.schemas import appointment as appointment_schemas
+from app.schemas import business as business_schemas
+from app.schemas import chat as chat_schemas
+from app.schemas import subscription as subscription_schemas
+
+LoaderFactory = Callable[[], Tuple[ORMOption, ...]]
+
+_LOADER_FACTORIES: Dict[type, LoaderFactory] = {}
+_LOADER_OPTIONS: Dict[type, Tuple[ORMOption, ...]] = {}
+
+
+def loads(schema: type) -> Callable[[LoaderFactory], LoaderFactory]:
+    """
+    Declara la carga de `schema`. La función se evalúa en el primer uso: construir
+    las opciones configura los mappers y eso exige que todos los modelos estén importados.
+    """
+    def register(factory: LoaderFactory) -> LoaderFactory:
+        _LOADER_FACTORIES[schema] = factory
+        _LOADER_OPTIONS.pop(schema, None)
+        return factory
+    return register
+
+
+def loader_options(schema: type) -> Tuple[ORMOption, ...]:
+    """Opciones de carga declaradas para `schema`; KeyError si no tiene declaración."""
+    options = _LOADER_OPTIONS.get(schema)
+    if options is None:
+        try:
+            factory = _LOADER_FACTORIES[schema]
+        except KeyError:
+            raise KeyError(f"No loader options declared for {schema.__module__}.{schema.__qualname__}") from None
+        options = _LOADER_OPTIONS[schema] = tuple(factory())
+    return options
+
+
+# --- Declaraciones ---
+@loads(chat_schemas.Conversation)
+def _conversation():
+    return selectinload(Conversation.participants), selectinload(Conversation.messages).joinedload(Message.sender)
+
+
+@loads(chat_schemas.Message)
+@loads(chat_schemas.MessageEvent)
+def _message():
+    return (joinedload(Message.sender),)
+
+
+@loads(chat_schemas.InboxEntry)
+def _inbox_entry():
+    # Cada entrada de la bandeja lleva los participantes de su conversación
+    return (selectinload(Conversation.participants),)
+
+
+@loads(business_schemas.Business)
+def _business():
+    return (selectinload(Business.locations),)
+
+
+@loads(appointment_schemas.Appointment)
+def _appointment():
+    return (joinedload(Appointment.patient),)
+
+
+@loads(subscription_schemas.SubscriptionProductResponse)
+def _subscription_product():
+    return (selectinload(SubscriptionProduct.prices),)
+
+
+@loads(subscription_schemas.PriceResponse)
+def _price():
+    return ()
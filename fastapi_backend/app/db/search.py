@@ -0,0 +1,41 @@
+import html
+
+from sqlalchemy import Column, Computed, func
+from sqlalchemy.dialects.postgresql import TSVECTOR, ts_headline, websearch_to_tsquery
+from sqlalchemy.orm import deferred
+
+# Configuración de texto de Postgres usada por las columnas y por las consultas.
+# Cambiarla exige regenerar las columnas (nueva migración).
+TEXT_SEARCH_CONFIG = "spanish"
+# ts_headline devuelve el texto original sin escapar: las coincidencias se marcan con
+# caracteres de control y `highlight_snippet` escapa el HTML antes de poner los <b>
+START_SEL, STOP_SEL = "\x02", "\x03"
+SNIPPET_OPTIONS = f"MaxFragments=2, MaxWords=20, MinWords=5, StartSel={START_SEL}, StopSel={STOP_SEL}"
+
+
+def search_vector_column(source: str):
+    """
+    Columna tsvector generada (STORED) a partir de `source`: Postgres la mantiene
+    en cada INSERT/UPDATE. Diferida para no leerla en las consultas normales.
+    """
+    return deferred(Column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{TEXT_SEARCH_CONFIG}'::regconfig, coalesce({source}, ''))", persisted=True),
+    ))
+
+
+def search_query(text: str):
+    """Consulta del usuario con la sintaxis de buscador web: "frase", OR, -excluir."""
+    return websearch_to_tsquery(TEXT_SEARCH_CONFIG, text)
+
+
+def search_snippet(content, query):
+    """Fragmentos de `content` con las coincidencias marcadas; pasar por `highlight_snippet` antes de devolverlo."""
+    # Los marcadores que ya estuvieran en el texto se quitan para que no abran etiquetas
+    content = func.translate(content, START_SEL + STOP_SEL, "")
+    return ts_headline(TEXT_SEARCH_CONFIG, content, query, SNIPPET_OPTIONS)
+
+
+def highlight_snippet(snippet: str) -> str:
+    """Snippet de `search_snippet` como HTML seguro: texto escapado y coincidencias entre <b></b>."""
+    return html.escape(snippet).replace(START_SEL, "<b>").replace(STOP_SEL, "</b>")
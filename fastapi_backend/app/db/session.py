@@ -1,6 +1,21 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.pool import InstrumentedAsyncQueuePool, pool_kwargs
 
-engine = create_engine(settings.DATABASE_URL)
+# Sync engine: scripts (create_db, alembic) and tests that talk to the DB directly
+engine = create_engine(settings.DATABASE_URL, **pool_kwargs())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine: used by the API request handlers
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL
+    or make_url(settings.DATABASE_URL).set(drivername="postgresql+asyncpg"),
+    poolclass=InstrumentedAsyncQueuePool,
+    **pool_kwargs(),
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
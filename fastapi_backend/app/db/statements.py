@@ -0,0 +1,217 @@
+"""
+Instrumentación de las sentencias SQL por petición.
+
+`install_sql_instrumentation` engancha `before/after_cursor_execute` al engine y
+SQLStatsMiddleware abre un RequestSQLStats por petición HTTP (el contexto viaja
+con los greenlets de SQLAlchemy async). Por cada petición queda:
+
+- una línea de log JSON (logger `app.db.statements`, nivel INFO) con el número
+  de sentencias, el tiempo total en la base de datos y las más lentas;
+- la cabecera `Server-Timing` (`db` y `app`), visible en las devtools del navegador;
+- con SQL_STATEMENT_BUDGET > 0 (desarrollo/tests), `X-SQL-Statements` y un 500
+  si la petición se pasa del presupuesto, para que el test que la provoca falle.
+
+Las sentencias más lentas que SQL_SLOW_QUERY_MS se registran en WARNING junto con
+su plan (EXPLAIN sin ANALYZE, en otra conexión y fuera de la petición). Los
+parámetros nunca se escriben en los logs y los literales del SQL se enmascaran.
+"""
+import asyncio
+import json
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_COUNT_HEADER = "X-SQL-Statements"
+MAX_LOGGED_STATEMENT_LENGTH = 1000
+EXPLAIN_COOLDOWN = 300  # segundos sin repetir el EXPLAIN de la misma sentencia
+MAX_PENDING_EXPLAINS = 4
+EXPLAINABLE = ("select", "with", "insert", "update", "delete")
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def redact(statement: str) -> str:
+    """SQL de una línea, con los literales de texto sustituidos y recortado para el log."""
+    statement = _WHITESPACE.sub(" ", _LITERAL.sub("'?'", statement)).strip()
+    if len(statement) > MAX_LOGGED_STATEMENT_LENGTH:
+        statement = statement[:MAX_LOGGED_STATEMENT_LENGTH] + "..."
+    return statement
+
+
+class RequestSQLStats:
+    """Sentencias ejecutadas durante una petición: cuántas, cuánto tiempo y las más lentas."""
+
+    __slots__ = ("method", "path", "count", "duration", "slowest")
+
+    def __init__(self, method: str = "", path: str = ""):
+        self.method = method
+        self.path = path
+        self.count = 0
+        self.duration = 0.0
+        self.slowest: List[Tuple[float, str]] = []  # (segundos, sql), de más a menos lenta
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        keep = settings.SQL_SLOWEST_STATEMENTS
+        if keep > 0 and (len(self.slowest) < keep or duration > self.slowest[-1][0]):
+            self.slowest.append((duration, statement))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[keep:]
+
+    def summary(self) -> dict:
+        return {
+            "statements": self.count,
+            "db_ms": round(self.duration * 1000, 2),
+            "slowest": [{"ms": round(d * 1000, 2), "statement": redact(s)} for d, s in self.slowest],
+        }
+
+
+_current_stats: ContextVar[Optional[RequestSQLStats]] = ContextVar("sql_request_stats", default=None)
+# True dentro de las tareas de EXPLAIN, para no medirse a sí mismas
+_explaining: ContextVar[bool] = ContextVar("sql_explaining", default=False)
+
+_explained = TTLCache(maxsize=1000, ttl=EXPLAIN_COOLDOWN)
+_explain_tasks: "set[asyncio.Task]" = set()
+
+
+def current_stats() -> Optional[RequestSQLStats]:
+    return _current_stats.get()
+
+
+def install_sql_instrumentation(engine: AsyncEngine) -> None:
+    """Mide las sentencias de `engine`; idempotente."""
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context._sql_started
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record(statement, duration)
+        if settings.SQL_SLOW_QUERY_MS > 0 and duration * 1000 >= settings.SQL_SLOW_QUERY_MS and not _explaining.get():
+            if executemany and parameters:
+                parameters = parameters[0]
+            _slow_query(engine, statement, parameters, duration, stats)
+
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._sql_started = time.perf_counter()
+
+
+def _slow_query(engine: AsyncEngine, statement: str, parameters, duration: float, stats: Optional[RequestSQLStats]) -> None:
+    entry = {
+        "event": "slow_query",
+        "ms": round(duration * 1000, 2),
+        "statement": redact(statement),
+        "params": len(parameters) if parameters else 0,
+    }
+    if stats is not None:
+        entry["method"], entry["path"] = stats.method, stats.path
+
+    explainable = statement.lstrip().lower().startswith(EXPLAINABLE)
+    if not explainable or _explained.get(statement) or len(_explain_tasks) >= MAX_PENDING_EXPLAINS:
+        logger.warning(json.dumps(entry))
+        return
+    _explained.set(statement, True)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        logger.warning(json.dumps(entry))
+        return
+    task = loop.create_task(_explain_and_log(engine, statement, parameters, entry))
+    _explain_tasks.add(task)
+    task.add_done_callback(_explain_tasks.discard)
+
+
+async def _explain_and_log(engine: AsyncEngine, statement: str, parameters, entry: dict) -> None:
+    _current_stats.set(None)
+    _explaining.set(True)
+    try:
+        async with engine.connect() as conn:
+            result = await conn.exec_driver_sql("EXPLAIN " + statement, tuple(parameters or ()))
+            # El plan incrusta los valores de los parámetros en las condiciones
+            entry["plan"] = _LITERAL.sub("'?'", "\n".join(row[0] for row in result))
+    except Exception as exc:
+        entry["plan_error"] = repr(exc)
+    logger.warning(json.dumps(entry))
+
+
+class SQLStatsMiddleware:
+    """Middleware ASGI: estadísticas SQL de cada petición HTTP en Server-Timing y en el log."""
+
+    def __init__(self, app, budget: int = 0):
+        self.app = app
+        self.budget = budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        stats = RequestSQLStats(scope["method"], scope["path"])
+        token = _current_stats.set(stats)
+        status_code = 500
+        exceeded = False
+
+        async def send_with_stats(message):
+            nonlocal status_code, exceeded
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                if self.budget and stats.count > self.budget:
+                    exceeded = True
+                    logger.warning(
+                        "SQL statement budget exceeded: %s %s ran %d statements (budget %d)",
+                        stats.method, stats.path, stats.count, self.budget,
+                    )
+                    body = json.dumps({
+                        "detail": f"SQL statement budget exceeded: {stats.count} > {self.budget}",
+                    }).encode()
+                    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                    message = {"type": "http.response.start", "status": 500, "headers": headers}
+                    await send(self._with_stats_headers(message, stats, started))
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                status_code = message["status"]
+                message["headers"] = headers
+                message = self._with_stats_headers(message, stats, started)
+            elif exceeded:
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current_stats.reset(token)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(json.dumps({
+                    "event": "request",
+                    "method": stats.method,
+                    "path": stats.path,
+                    "status": 500 if exceeded else status_code,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    **stats.summary(),
+                }))
+
+    def _with_stats_headers(self, message: dict, stats: RequestSQLStats, started: float) -> dict:
+        elapsed = (time.perf_counter() - started) * 1000
+        timing = f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} statements", app;dur={elapsed:.2f}'
+        message["headers"].append((b"server-timing", timing.encode()))
+        if self.budget:
+            message["headers"].append((STATEMENT_COUNT_HEADER.lower().encode(), str(stats.count).encode()))
+        return message
@@ -1,40 +1,44 @@
-from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status, Request
+import hmac
+from typing import AsyncGenerator, Optional, Union
+from fastapi import Depends, HTTPException, status, Request, WebSocket
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.security.utils import get_authorization_scheme_param
+from starlette.requests import HTTPConnection
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from uuid import UUID
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import SessionLocal
+from app.db.session import AsyncSessionLocal
 from app.models.user import User as DBUser # Alias to avoid conflict with pydantic User
 from app.core.config import settings
 from app.schemas.user import UserRole # Import UserRole
+from app.services.user_service import user_service
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl="/api/v1/auth/login",
     auto_error=False  # No lanzar error automáticamente para poder manejarlo
 )
 
-def get_db() -> Generator:
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+def _cookie_token(connection: HTTPConnection) -> Optional[str]:
+    cookie_token = connection.cookies.get("access_token")
+    if cookie_token:
+        # FastAPI espera que el token no tenga el prefijo 'Bearer '
+        return cookie_token.replace("Bearer ", "")
+    return None
 
 def get_token(request: Request, token: Optional[str] = Depends(reusable_oauth2)) -> Optional[str]:
     """
     Intenta obtener el token de la cookie 'access_token'.
     Si no está, usa el flujo de OAuth2 (cabecera Authorization).
     """
-    cookie_token = request.cookies.get("access_token")
-    if cookie_token:
-        # FastAPI espera que el token no tenga el prefijo 'Bearer '
-        return cookie_token.replace("Bearer ", "")
-    return token
+    return _cookie_token(request) or token
 
-async def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(get_token)
-) -> DBUser:
+def _decode_token(token: Optional[str]) -> dict:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -42,19 +46,66 @@ async def get_current_user(
     )
     if token is None:
         raise credentials_exception
-        
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(DBUser).filter(DBUser.id == user_id).first()
-    if user is None:
+    if payload.get("sub") is None:
         raise credentials_exception
+    return payload
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_db), token: str = Depends(get_token)
+) -> DBUser:
+    payload = _decode_token(token)
+    user = await user_service.get_cached(db, id=payload["sub"])
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
+class TokenIdentity(BaseModel):
+    """Identidad del usuario tomada de los claims del token, sin consultar la base de datos."""
+    id: UUID
+    role: Optional[UserRole] = None
+    is_active: bool = True
+
+CurrentIdentity = Union[TokenIdentity, DBUser]
+
+async def get_current_identity(
+    db: AsyncSession = Depends(get_db), token: str = Depends(get_token)
+) -> CurrentIdentity:
+    """
+    Para endpoints de lectura que solo necesitan `id` y `role`. Con
+    TOKEN_IDENTITY_CLAIMS activo y un token que trae los claims, no hay
+    consulta del usuario; si no, se usa el usuario (cacheado) de la base de datos.
+    """
+    payload = _decode_token(token)
+    if not (settings.TOKEN_IDENTITY_CLAIMS and "role" in payload):
+        return await get_current_user(db, token)
+    if payload.get("active") is False:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return TokenIdentity(id=payload["sub"], role=payload["role"])
+
+async def get_websocket_identity(websocket: WebSocket) -> Optional[CurrentIdentity]:
+    """
+    Misma autenticación que get_token (cookie o cabecera Bearer) para WebSockets.
+    Usa una sesión propia solo para la consulta: una conexión abierta durante
+    horas no debe retener una conexión del pool. None si no es válida.
+    """
+    scheme, param = get_authorization_scheme_param(websocket.headers.get("Authorization"))
+    token = _cookie_token(websocket) or (param if scheme.lower() == "bearer" else None)
+    try:
+        async with AsyncSessionLocal() as db:
+            identity = await get_current_identity(db, token)
+    except HTTPException:
+        return None
+    return identity if identity.is_active else None
+
 async def get_current_active_user(
     current_user: DBUser = Depends(get_current_user),
 ) -> DBUser:
@@ -62,6 +113,19 @@ async def get_current_active_user(
     # Add logic here if you have an 'is_active' field in your User model.
     return current_user
 
+async def require_metrics_access(
+    db: AsyncSession = Depends(get_db), token: Optional[str] = Depends(get_token)
+) -> None:
+    """Endpoints /metrics: el token estático METRICS_TOKEN (Prometheus) o un admin."""
+    if settings.METRICS_TOKEN and token and hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        return
+    identity = await get_current_identity(db, token)
+    if identity.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="The user doesn't have enough privileges"
+        )
+
 async def get_current_active_admin(
     current_user: DBUser = Depends(get_current_user),
 ) -> DBUser:
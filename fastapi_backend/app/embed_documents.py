@@ -0,0 +1,32 @@
+"""
+Backfill de embeddings de los documentos de citas, por lotes de EMBEDDING_BATCH_SIZE.
+Con EMBEDDING_BACKEND=pgvector solo procesa los documentos sin vector; con "numpy"
+reconstruye el índice local de EMBEDDING_INDEX_DIR.
+
+    cd fastapi_backend
+    python -m app.embed_documents [--batch-size 512]
+"""
+import argparse
+import asyncio
+import time
+
+import app.main  # noqa: F401  registra todos los modelos
+from app.core.config import settings
+from app.core.embeddings import get_embedder
+from app.db.session import AsyncSessionLocal, async_engine
+from app.services.document_index import get_document_index
+
+
+async def main(batch_size: int):
+    print(f"Embedding appointment documents ({settings.EMBEDDING_BACKEND}, model={settings.EMBEDDING_MODEL})...")
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        total = await get_document_index().backfill(db, get_embedder(), batch_size)
+    await async_engine.dispose()
+    print(f"Embedded {total} documents in {time.perf_counter() - start:.1f} s.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_BATCH_SIZE)
+    asyncio.run(main(parser.parse_args().batch_size))
@@ -0,0 +1,47 @@
+"""
+Importación masiva del catálogo de un negocio desde un fichero CSV o NDJSON
+(crea o actualiza por SKU), con el mismo servicio que POST /products/import.
+El progreso queda registrado en pos.product_imports.
+
+    cd fastapi_backend
+    python -m app.import_products --business-id <uuid> productos.csv [--format ndjson]
+"""
+import argparse
+import asyncio
+import time
+from uuid import UUID
+
+import app.main  # noqa: F401  registra todos los modelos
+from app.db.session import AsyncSessionLocal, async_engine
+from app.models.product import ProductImport
+from app.services.product_import_service import ProductImportService
+
+
+async def main(args):
+    format = args.format or ("ndjson" if args.file.endswith((".ndjson", ".jsonl")) else "csv")
+    start = time.perf_counter()
+
+    def progress(job: ProductImport):
+        elapsed = time.perf_counter() - start
+        print(f"  {job.rows_processed} rows ({job.rows_processed / elapsed:,.0f} rows/s), "
+              f"{job.created_count} created, {job.updated_count} updated, {job.error_count} errors")
+
+    async with AsyncSessionLocal() as db:
+        service = ProductImportService(db)
+        job = await service.create_import(args.business_id)
+        print(f"Importing {args.file} ({format}) as import {job.id}...")
+        job = await service.run_import(job.id, args.file, format, on_progress=progress)
+    await async_engine.dispose()
+    print(f"Import {job.status} in {time.perf_counter() - start:.1f} s.")
+    if job.detail:
+        print(job.detail)
+    for error in job.errors[:20]:
+        print(f"  row {error['index']}: {error['errors']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file")
+    parser.add_argument("--business-id", type=UUID, required=True)
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    asyncio.run(main(parser.parse_args()))
@@ -1,19 +1,43 @@
-from fastapi import FastAPI, Request
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.exceptions import RequestValidationError
 from sqlalchemy.exc import IntegrityError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from app.api.v1.api import api_router
+from app.core.broker import close_broker, get_broker
 from app.core.config import settings
+from app.core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, render_metrics
+from app.db.pool import pool_status
+from app.db.session import async_engine
+from app.db.statements import SQLStatsMiddleware, install_sql_instrumentation
+from app.dependencies import require_metrics_access
+
+# Logs de la aplicación (loggers app.*) en stderr; uvicorn configura los suyos aparte
+app_logger = logging.getLogger("app")
+if not app_logger.handlers:
+    log_handler = logging.StreamHandler()
+    log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    app_logger.addHandler(log_handler)
+app_logger.setLevel(settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_broker()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
-print(f"CORS Origins: {settings.BACKEND_CORS_ORIGINS}")
+logger.info("CORS origins: %s", settings.BACKEND_CORS_ORIGINS)
 
 # Set all CORS enabled origins
 app.add_middleware(
@@ -25,6 +49,12 @@ app.add_middleware(
     allow_headers=["Authorization", "Content-Type", "X-Requested-With"],
 )
 
+if settings.SQL_INSTRUMENTATION or settings.SQL_STATEMENT_BUDGET > 0:
+    install_sql_instrumentation(async_engine)
+    app.add_middleware(SQLStatsMiddleware, budget=settings.SQL_STATEMENT_BUDGET)
+# Añadido el último para envolver a los demás y medir la petición completa
+app.add_middleware(MetricsMiddleware)
+
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     return JSONResponse(
@@ -41,8 +71,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
 @app.exception_handler(IntegrityError)
 async def integrity_exception_handler(request: Request, exc: IntegrityError):
-    # Log the error for debugging
-    print(f"IntegrityError: {exc.orig}")
+    logger.warning("IntegrityError on %s %s: %s", request.method, request.url.path, exc.orig)
     return JSONResponse(
         status_code=409,  # Conflict
         content={"detail": "Database integrity error. A resource may already exist."},
@@ -54,6 +83,21 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 def healthz():
     return {"ok": True}
 
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_access)])
+async def metrics():
+    """Peticiones por ruta, pool de conexiones y pools de hilos en formato de texto de Prometheus"""
+    return Response(render_metrics(async_engine.pool), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/metrics/db-pool", include_in_schema=False, dependencies=[Depends(require_metrics_access)])
+def db_pool_metrics():
+    """Ocupación del pool de conexiones del worker y tiempos de espera por conexión"""
+    return pool_status(async_engine.pool)
+
+@app.get("/metrics/chat", include_in_schema=False, dependencies=[Depends(require_metrics_access)])
+def chat_metrics():
+    """Conexiones WebSocket de chat abiertas en este worker"""
+    return get_broker().stats()
+
 @app.get("/", tags=["Root"])
 async def read_root():
     return {"message": "Bienvenido a la API de SasDatQbox v1"}
\ No newline at end of file
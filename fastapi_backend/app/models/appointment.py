@@ -1,11 +1,16 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, Numeric, Text, Enum
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
+from app.core.config import settings
 from app.db.base import Base
+from app.db.search import search_vector_column
 import uuid
 from sqlalchemy.sql import func
 import enum
 
+if settings.EMBEDDING_BACKEND == "pgvector":
+    from pgvector.sqlalchemy import Vector
+
 class AppointmentStatus(str, enum.Enum):
     PENDING_PAYMENT = "pending_payment"
     SCHEDULED = "scheduled"
@@ -30,7 +35,11 @@ class Appointment(Base):
     status = Column(Enum(AppointmentStatus), nullable=False, default=AppointmentStatus.PENDING_PAYMENT)
     appointment_datetime = Column(DateTime(timezone=True), nullable=False)
     reason = Column(Text, nullable=True)
+    notes = Column(Text, nullable=True)
     stripe_payment_intent_id = Column(String, nullable=True)
+    # Importe de la consulta; cuenta como ingreso en paid_at (al pasar a un estado pagado)
+    amount = Column(Numeric(10, 2), nullable=True)
+    paid_at = Column(DateTime(timezone=True), nullable=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -42,14 +51,23 @@ class Appointment(Base):
 
 class AppointmentDocument(Base):
     __tablename__ = "appointment_documents"
-    __table_args__ = {'schema': 'pos', 'extend_existing': True}
+    __table_args__ = (
+        Index('ix_appointment_documents_search_vector', 'search_vector', postgresql_using='gin'),  # búsqueda de texto
+        *([Index(
+            'ix_appointment_documents_embedding', 'embedding',
+            postgresql_using='hnsw', postgresql_ops={'embedding': 'vector_cosine_ops'},
+        )] if settings.EMBEDDING_BACKEND == "pgvector" else []),
+        {'schema': 'pos', 'extend_existing': True},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     appointment_id = Column(UUID(as_uuid=True), ForeignKey("pos.appointments.id"), nullable=False)
     document_type = Column(Enum(DocumentType), nullable=False)
     content = Column(Text, nullable=False)
-    # In the future, we can add a pgvector column here
-    # embedding = Column(Vector(384), nullable=True)
+    search_vector = search_vector_column("content")
+    # Solo se mapea con EMBEDDING_BACKEND=pgvector; con "numpy" los vectores viven en EMBEDDING_INDEX_DIR
+    if settings.EMBEDDING_BACKEND == "pgvector":
+        embedding = deferred(Column(Vector(settings.EMBEDDING_DIM), nullable=True))
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -1,11 +1,12 @@
 
 import uuid
 import enum
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Enum as SAEnum
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, Text, text, Enum as SAEnum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.base import Base
+from app.db.search import search_vector_column
 # Assuming you might use pgvector in the future
 # from pgvector.sqlalchemy import Vector
 
@@ -16,11 +17,21 @@ class ConversationType(str, enum.Enum):
 
 class Conversation(Base):
     __tablename__ = "conversations"
-    __table_args__ = {'schema': 'pos', 'extend_existing': True}
+    __table_args__ = (
+        # Una sola conversación directa por pareja, tipo y cita (también sin cita)
+        Index(
+            'uq_conversations_direct', 'type', 'appointment_id', 'direct_user_low', 'direct_user_high',
+            unique=True, postgresql_nulls_not_distinct=True, postgresql_where=text('direct_user_low IS NOT NULL'),
+        ),
+        {'schema': 'pos', 'extend_existing': True},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     appointment_id = Column(UUID(as_uuid=True), ForeignKey("pos.appointments.id"), nullable=True)
     type = Column(SAEnum(ConversationType), nullable=False)
+    # Solo en conversaciones directas (get-or-create): los dos participantes ordenados
+    direct_user_low = Column(UUID(as_uuid=True), nullable=True)
+    direct_user_high = Column(UUID(as_uuid=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -30,14 +41,25 @@ class Conversation(Base):
 
 class ConversationParticipant(Base):
     __tablename__ = "conversation_participants"
-    __table_args__ = {'schema': 'pos', 'extend_existing': True}
+    __table_args__ = (
+        # La PK (user_id, conversation_id) resuelve la pertenencia; este índice, los participantes de una conversación
+        Index('ix_conversation_participants_conversation_id', 'conversation_id'),
+        {'schema': 'pos', 'extend_existing': True},
+    )
 
     user_id = Column(UUID(as_uuid=True), ForeignKey("pos.users.id"), primary_key=True)
     conversation_id = Column(UUID(as_uuid=True), ForeignKey("pos.conversations.id"), primary_key=True)
+    # Marca de lectura: los mensajes de otros con created_at posterior son no leídos
+    last_read_at = Column(DateTime(timezone=True), nullable=True)
 
 class Message(Base):
     __tablename__ = "messages"
-    __table_args__ = {'schema': 'pos', 'extend_existing': True}
+    __table_args__ = (
+        Index('ix_messages_conversation_id_created_at_id', 'conversation_id', 'created_at', 'id'),  # historial paginado
+        Index('ix_messages_unread', 'conversation_id', postgresql_where=text('read_at IS NULL')),  # no leídos del inbox
+        Index('ix_messages_search_vector', 'search_vector', postgresql_using='gin'),  # búsqueda de texto
+        {'schema': 'pos', 'extend_existing': True},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     conversation_id = Column(UUID(as_uuid=True), ForeignKey("pos.conversations.id"), nullable=False)
@@ -45,6 +67,7 @@ class Message(Base):
     content = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     read_at = Column(DateTime(timezone=True), nullable=True)
+    search_vector = search_vector_column("content")
     # embedding = Column(Vector(384), nullable=True) # For future RAG feature
 
     conversation = relationship("Conversation", back_populates="messages")
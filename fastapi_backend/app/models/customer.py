@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, ForeignKey, DateTime
+from sqlalchemy import Column, String, ForeignKey, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -7,7 +7,10 @@ from app.db.base import Base
 
 class Customer(Base):
     __tablename__ = "customers"
-    __table_args__ = {'schema': 'pos'}
+    __table_args__ = (
+        Index('ix_customers_created_at_id', 'created_at', 'id'),  # paginación por cursor
+        {'schema': 'pos'},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     first_name = Column(String, nullable=False)
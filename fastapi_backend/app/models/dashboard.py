@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Date, DateTime, Integer, Numeric, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+# Fila de la plataforma: ingresos por suscripciones, que no pertenecen a ningún médico
+PLATFORM_STATS_ID = "00000000-0000-0000-0000-000000000000"
+
+
+class DashboardUserStats(Base):
+    """
+    Totales del dashboard por usuario, mantenidos en la misma transacción que las
+    escrituras de pacientes y citas (ver app/services/dashboard_service.py) y
+    reconstruibles con `python -m app.refresh_dashboard_stats`.
+    """
+    __tablename__ = "dashboard_user_stats"
+    __table_args__ = {'schema': 'pos'}
+
+    # Sin FK: la fila PLATFORM_STATS_ID no es un usuario
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    patient_count = Column(Integer, nullable=False, server_default=text("0"))
+    appointments_pending_payment = Column(Integer, nullable=False, server_default=text("0"))
+    appointments_scheduled = Column(Integer, nullable=False, server_default=text("0"))
+    appointments_active = Column(Integer, nullable=False, server_default=text("0"))
+    appointments_completed = Column(Integer, nullable=False, server_default=text("0"))
+    appointments_cancelled = Column(Integer, nullable=False, server_default=text("0"))
+    revenue_total = Column(Numeric(14, 2), nullable=False, server_default=text("0"))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class DashboardDailyStats(Base):
+    """Actividad e ingresos de un usuario en un día (CURRENT_DATE de la base de datos)."""
+    __tablename__ = "dashboard_daily_stats"
+    __table_args__ = {'schema': 'pos'}
+
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    day = Column(Date, primary_key=True)
+    patients_added = Column(Integer, nullable=False, server_default=text("0"))
+    appointments_created = Column(Integer, nullable=False, server_default=text("0"))
+    appointment_revenue = Column(Numeric(14, 2), nullable=False, server_default=text("0"))
+    subscription_revenue = Column(Numeric(14, 2), nullable=False, server_default=text("0"))
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -7,7 +7,11 @@ from app.db.base import Base
 
 class Inventory(Base):
     __tablename__ = "inventory"
-    __table_args__ = {'schema': 'pos'}
+    __table_args__ = (
+        UniqueConstraint('product_id', 'location_id', name='uq_inventory_product_location'),
+        Index('ix_inventory_created_at_id', 'created_at', 'id'),  # paginación por cursor
+        {'schema': 'pos'},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     product_id = Column(UUID(as_uuid=True), ForeignKey('pos.products.id'), nullable=False)
@@ -18,7 +22,10 @@ class Inventory(Base):
 
 class StockTransfer(Base):
     __tablename__ = "stock_transfers"
-    __table_args__ = {'schema': 'pos'}
+    __table_args__ = (
+        Index('ix_stock_transfers_created_at_id', 'created_at', 'id'),  # paginación por cursor
+        {'schema': 'pos'},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     business_id = Column(UUID(as_uuid=True), ForeignKey('pos.businesses.id'), nullable=False)
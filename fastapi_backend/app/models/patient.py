@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Date, JSON
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Date, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.db.base import Base
@@ -7,7 +7,10 @@ from sqlalchemy.sql import func
 
 class Patient(Base):
     __tablename__ = "patients"
-    __table_args__ = {'schema': 'pos', 'extend_existing': True}
+    __table_args__ = (
+        Index('ix_patients_created_at_id', 'created_at', 'id'),  # paginación por cursor
+        {'schema': 'pos', 'extend_existing': True},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("pos.users.id"), nullable=False)
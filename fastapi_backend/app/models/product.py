@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, String, Float, ForeignKey, DateTime, Index, Integer, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -7,7 +7,10 @@ from app.db.base import Base
 
 class Product(Base):
     __tablename__ = "products"
-    __table_args__ = {'schema': 'pos'}
+    __table_args__ = (
+        Index('ix_products_business_id_created_at_id', 'business_id', 'created_at', 'id'),  # paginación por cursor
+        {'schema': 'pos'},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
@@ -19,4 +22,23 @@ class Product(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     business = relationship("Business", back_populates="products")
-    
\ No newline at end of file
+
+
+class ProductImport(Base):
+    """Importación masiva del catálogo (POST /products/import o app.import_products) y su progreso."""
+    __tablename__ = "product_imports"
+    __table_args__ = {'schema': 'pos'}
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    business_id = Column(UUID(as_uuid=True), ForeignKey('pos.businesses.id'), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('pos.users.id'), nullable=True)  # NULL desde la CLI
+    status = Column(String, nullable=False, default='pending')  # pending, running, completed, failed
+    rows_processed = Column(Integer, nullable=False, default=0)
+    created_count = Column(Integer, nullable=False, default=0)
+    updated_count = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    errors = Column(JSON, nullable=False, default=list)  # primeras IMPORT_MAX_REPORTED_ERRORS filas con error
+    detail = Column(String)  # motivo si la importación falla por completo
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True))
@@ -1,6 +1,6 @@
 import uuid
 import enum
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Boolean, BigInteger, Integer, Enum
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Boolean, BigInteger, Integer, Enum, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -8,7 +8,10 @@ from app.db.base import Base
 
 class SubscriptionProduct(Base):
     __tablename__ = "subscription_products"
-    __table_args__ = {'schema': 'pos'}
+    __table_args__ = (
+        Index('ix_subscription_products_created_at_id', 'created_at', 'id'),  # paginación por cursor
+        {'schema': 'pos'},
+    )
     id = Column(String, primary_key=True) # Product ID from Stripe
     active = Column(Boolean)
     name = Column(String, nullable=True)
@@ -18,8 +21,8 @@ class SubscriptionProduct(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
-    # Relationships
-    prices = relationship("Price", back_populates="product", lazy="selectin")
+    # Relationships: se cargan según la política de app/db/loading.py, nunca en cada consulta
+    prices = relationship("Price", back_populates="product", lazy="raise")
 
 class PricingType(enum.Enum):
     one_time = "one_time"
@@ -33,11 +36,14 @@ class PricingPlanInterval(enum.Enum):
 
 class Price(Base):
     __tablename__ = "prices"
-    __table_args__ = {"schema": "pos"}
+    __table_args__ = (
+        Index('ix_prices_created_at_id', 'created_at', 'id'),  # paginación por cursor
+        {"schema": "pos"},
+    )
 
     id = Column(String, primary_key=True)
     product_id = Column(String, ForeignKey("pos.subscription_products.id"))
-    product = relationship("SubscriptionProduct", back_populates="prices", lazy="selectin")
+    product = relationship("SubscriptionProduct", back_populates="prices", lazy="raise")
     active = Column(Boolean, nullable=True)
     description = Column(String)
     unit_amount = Column(BigInteger)
@@ -62,7 +68,10 @@ class SubscriptionStatus(enum.Enum):
 
 class Subscription(Base):
     __tablename__ = "subscriptions"
-    __table_args__ = {'schema': 'pos'}
+    __table_args__ = (
+        Index('ix_subscriptions_user_id_created_at_id', 'user_id', 'created_at', 'id'),  # paginación por cursor
+        {'schema': 'pos'},
+    )
     id = Column(String, primary_key=True) # Subscription ID from Stripe
     user_id = Column(UUID(as_uuid=True), ForeignKey('pos.users.id'), nullable=False)
     status = Column(Enum(SubscriptionStatus))
@@ -0,0 +1,29 @@
+"""
+Reconstruye las estadísticas precalculadas del dashboard (pos.dashboard_user_stats
+y pos.dashboard_daily_stats) a partir de pacientes y citas. Los servicios las
+mantienen al escribir; esto es para el backfill tras la migración y para corregir
+desvíos, p. ej. una vez al día desde cron.
+
+    cd fastapi_backend
+    python -m app.refresh_dashboard_stats
+"""
+import argparse
+import asyncio
+import time
+
+import app.main  # noqa: F401  registra todos los modelos
+from app.db.session import AsyncSessionLocal, async_engine
+from app.services.dashboard_service import DashboardService
+
+
+async def main(args):
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        await DashboardService(db).rebuild()
+    await async_engine.dispose()
+    print(f"Dashboard stats rebuilt in {time.perf_counter() - start:.1f} s.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    asyncio.run(main(parser.parse_args()))
@@ -1,5 +1,5 @@
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from uuid import UUID
 from datetime import datetime
@@ -26,6 +26,9 @@ class AppointmentDocument(AppointmentDocumentBase):
     class Config:
         from_attributes = True
 
+class SimilarDocument(AppointmentDocument):
+    score: float  # similitud coseno con la consulta
+
 # Appointment Schemas
 # Shared properties
 class AppointmentBase(BaseModel):
@@ -34,6 +37,7 @@ class AppointmentBase(BaseModel):
     status: AppointmentStatus = AppointmentStatus.SCHEDULED
     reason: Optional[str] = None
     notes: Optional[str] = None
+    amount: Optional[float] = Field(None, ge=0)
 
 # Properties to receive on appointment creation
 class AppointmentCreate(AppointmentBase):
@@ -50,11 +54,13 @@ class AppointmentUpdate(BaseModel):
     status: Optional[AppointmentStatus] = None
     reason: Optional[str] = None
     notes: Optional[str] = None
+    amount: Optional[float] = Field(None, ge=0)
 
 # Properties shared by models in DB
 class AppointmentInDBBase(AppointmentBase):
     id: UUID
     doctor_id: UUID
+    paid_at: Optional[datetime] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     patient: Patient # Nest patient details
@@ -0,0 +1,40 @@
+from typing import Any, Dict, Iterable, List, Tuple, Type, TypeVar
+from uuid import UUID
+
+from pydantic import BaseModel, ValidationError
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# --- Bulk operation schemas ---
+class BulkRowError(BaseModel):
+    index: int  # posición de la fila en el array / línea NDJSON (desde 0)
+    errors: List[Any]  # mismo formato que los 422 de FastAPI: {loc, msg, type}
+
+class BulkCreated(BaseModel):
+    index: int
+    id: UUID
+
+class BulkResult(BaseModel):
+    created: List[BulkCreated] = []
+    errors: List[BulkRowError] = []
+
+
+# --- Errores por fila ---
+def row_error(loc: Tuple[Any, ...], msg: str, type_: str) -> Dict[str, Any]:
+    return {"loc": list(loc), "msg": msg, "type": type_}
+
+
+def validate_rows(
+    rows: Iterable[Tuple[int, Any]], model_class: Type[ModelT]
+) -> Tuple[Dict[int, ModelT], Dict[int, List[Dict[str, Any]]]]:
+    valid: Dict[int, ModelT] = {}
+    errors: Dict[int, List[Dict[str, Any]]] = {}
+    for index, row in rows:
+        if isinstance(row, ValueError):
+            errors[index] = [row_error((), f"Invalid JSON: {row}", "json_invalid")]
+            continue
+        try:
+            valid[index] = model_class.model_validate(row)
+        except ValidationError as exc:
+            errors[index] = [row_error(err["loc"], err["msg"], err["type"]) for err in exc.errors()]
+    return valid, errors
@@ -1,9 +1,9 @@
 
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Literal, Optional, List
 from uuid import UUID
 from datetime import datetime
-from .user import User # Import User schema for nesting
+from .user import User, UserRole # Import User schema for nesting
 from app.models.chat import ConversationType
 
 # Message Schemas
@@ -35,6 +35,11 @@ class ConversationBase(BaseModel):
 
 class ConversationCreate(ConversationBase):
     participant_ids: List[UUID] = Field(..., min_items=2, max_items=2, description="A conversation must have exactly two participants for now.")
+    initial_message: Optional[str] = None
+
+class DirectConversationCreate(ConversationBase):
+    user_id: UUID = Field(..., description="The other participant.")
+    initial_message: Optional[str] = Field(None, description="Only sent when the conversation is created.")
 
 class Conversation(ConversationBase):
     id: UUID
@@ -45,3 +50,58 @@ class Conversation(ConversationBase):
 
     class Config:
         from_attributes = True
+
+# Inbox Schemas
+class ParticipantSummary(BaseModel):
+    id: UUID
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    avatar_url: Optional[str] = None
+    role: Optional[UserRole] = None
+
+    class Config:
+        from_attributes = True
+
+class MessagePreview(BaseModel):
+    id: UUID
+    sender_id: UUID
+    content: str  # truncado a INBOX_PREVIEW_LENGTH caracteres
+    created_at: datetime
+
+class InboxEntry(ConversationBase):
+    id: UUID
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    participants: List[ParticipantSummary] = []
+    last_message: Optional[MessagePreview] = None
+    unread_count: int = 0
+    last_read_at: Optional[datetime] = None
+
+# Realtime (WebSocket) Schemas
+class MessageEvent(MessageBase):
+    type: Literal["message"] = "message"
+    id: UUID
+    conversation_id: UUID
+    sender_id: UUID
+    created_at: datetime
+    read_at: Optional[datetime] = None
+    sender: ParticipantSummary
+
+    class Config:
+        from_attributes = True
+
+class ReadEvent(BaseModel):
+    type: Literal["read"] = "read"
+    conversation_id: UUID
+    user_id: UUID
+    last_read_at: Optional[datetime] = None
+
+class TypingEvent(BaseModel):
+    type: Literal["typing"] = "typing"
+    conversation_id: UUID
+    user_id: UUID
+
+class ClientEvent(BaseModel):
+    """Eventos que el cliente envía por el WebSocket."""
+    type: Literal["typing", "read"]
+    conversation_id: UUID
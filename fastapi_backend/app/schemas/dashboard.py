@@ -1,8 +1,15 @@
+from typing import Dict
 from pydantic import BaseModel
 
 class DashboardStats(BaseModel):
     patient_count: int
+    # Ingresos de hoy: citas pagadas hoy (y, para admins, suscripciones cobradas hoy)
     todays_revenue: float
+    total_revenue: float = 0.0
+    appointment_counts: Dict[str, int] = {}
+    todays_new_patients: int = 0
+    todays_new_appointments: int = 0
+    todays_subscription_revenue: float = 0.0
 
     class Config:
         from_attributes = True
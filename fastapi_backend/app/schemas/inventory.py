@@ -2,7 +2,9 @@ from typing import Optional, List
 from datetime import datetime
 from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+
+from app.schemas.bulk import BulkRowError
 
 # --- Inventory Schemas ---
 class InventoryBase(BaseModel):
@@ -32,6 +34,35 @@ class Inventory(InventoryInDBBase):
 class InventoryInDB(InventoryInDBBase):
     pass
 
+# --- Stock count (conteo físico) Schemas ---
+class StockCountRow(BaseModel):
+    product_id: Optional[UUID] = None
+    sku: Optional[str] = None
+    quantity: int = Field(..., ge=0)
+
+    @model_validator(mode="after")
+    def check_product_reference(self):
+        if self.product_id is None and not self.sku:
+            raise ValueError("Either product_id or sku is required")
+        return self
+
+class StockVariance(BaseModel):
+    index: Optional[int] = None  # None: producto no contado y puesto a 0 por full_count
+    product_id: UUID
+    sku: Optional[str] = None
+    expected: int
+    counted: int
+    variance: int
+
+class StockCountResult(BaseModel):
+    location_id: UUID
+    applied: bool  # False si hubo errores o con dry_run: no se cambió nada
+    rows: int
+    adjusted: int
+    net_variance: int
+    variances: List[StockVariance] = []
+    errors: List[BulkRowError] = []
+
 # --- StockTransfer Schemas ---
 class StockTransferBase(BaseModel):
     business_id: UUID
@@ -0,0 +1,9 @@
+from typing import Generic, List, Optional, TypeVar
+
+from pydantic import BaseModel
+
+ItemT = TypeVar("ItemT")
+
+class CursorPage(BaseModel, Generic[ItemT]):
+    items: List[ItemT]
+    next_cursor: Optional[str] = None  # None cuando no hay más páginas
@@ -1,7 +1,10 @@
-from typing import Optional
+from datetime import datetime
+from typing import List, Literal, Optional
 from uuid import UUID
 from pydantic import BaseModel, Field
 
+from app.schemas.bulk import BulkRowError
+
 class ProductBase(BaseModel):
     name: str = Field(..., description="Name of the product")
     description: Optional[str] = None
@@ -29,3 +32,23 @@ class Product(ProductInDBBase):
 
 class ProductInDB(ProductInDBBase):
     pass
+
+# --- Bulk import ---
+class ProductImportRow(ProductBase):
+    sku: str = Field(..., min_length=1)  # clave del upsert
+
+class ProductImport(BaseModel):
+    id: UUID
+    business_id: UUID
+    status: Literal["pending", "running", "completed", "failed"]
+    rows_processed: int
+    created_count: int
+    updated_count: int
+    error_count: int
+    errors: List[BulkRowError] = []  # como mucho IMPORT_MAX_REPORTED_ERRORS; error_count es el total
+    detail: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import Literal, Optional
+from uuid import UUID
+from datetime import datetime
+from app.models.appointment import DocumentType
+
+class SearchHit(BaseModel):
+    type: Literal["message", "document"]
+    id: UUID
+    conversation_id: Optional[UUID] = None  # mensajes
+    appointment_id: Optional[UUID] = None  # documentos
+    document_type: Optional[DocumentType] = None
+    snippet: str  # fragmento en HTML escapado, con las coincidencias entre <b></b>
+    rank: float
+    created_at: Optional[datetime] = None
@@ -1,120 +1,219 @@
 
-from sqlalchemy.orm import Session
-from sqlalchemy.orm import selectinload
+import asyncio
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from typing import List, Optional
 from datetime import datetime
-
-from app.models.appointment import Appointment, AppointmentDocument
+from decimal import Decimal
+
+from app.core.embeddings import get_embedder
+from app.db.loading import loader_options
+from app.db.search import highlight_snippet, search_query, search_snippet
+from app.models.appointment import Appointment, AppointmentDocument, AppointmentStatus
+from app.services.dashboard_service import DashboardService
+from app.services.document_index import get_document_index
+from app.schemas import appointment as appointment_schemas
 from app.schemas.appointment import AppointmentCreate, AppointmentUpdate, AppointmentDocumentCreate, AppointmentDocumentUpdate, AppointmentCreateInternal
 
 class AppointmentService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
     # Appointment methods
-    def create_appointment(self, appointment_in: AppointmentCreateInternal) -> Appointment:
+    async def create_appointment(self, appointment_in: AppointmentCreateInternal) -> Appointment:
         db_appointment = Appointment(**appointment_in.model_dump())
         self.db.add(db_appointment)
-        self.db.commit()
-        self.db.refresh(db_appointment)
-        return db_appointment
-
-    def get_appointment(self, appointment_id: UUID) -> Optional[Appointment]:
-        return self.db.query(Appointment).filter(Appointment.id == appointment_id).first()
-
-    def get_appointments(self, skip: int = 0, limit: int = 100) -> List[Appointment]:
-        return self.db.query(Appointment).offset(skip).limit(limit).all()
-
-    def get_appointments_by_user(self, user_id: UUID):
-        return self.db.query(Appointment).options(selectinload(Appointment.patient)).filter(Appointment.doctor_id == user_id).all()
+        await DashboardService(self.db).record_appointment(db_appointment, old_status=None)
+        await self.db.commit()
+        return await self.get_appointment(db_appointment.id)
+
+    async def get_appointment(self, appointment_id: UUID) -> Optional[Appointment]:
+        return await self.db.scalar(
+            select(Appointment).options(*loader_options(appointment_schemas.Appointment)).where(Appointment.id == appointment_id)
+        )
+
+    async def get_appointments(self, skip: int = 0, limit: int = 100) -> List[Appointment]:
+        result = await self.db.scalars(
+            select(Appointment).options(*loader_options(appointment_schemas.Appointment)).offset(skip).limit(limit)
+        )
+        return list(result)
+
+    async def get_appointments_by_user(self, user_id: UUID):
+        result = await self.db.scalars(
+            select(Appointment).options(*loader_options(appointment_schemas.Appointment)).where(Appointment.doctor_id == user_id)
+        )
+        return list(result)
+
+    async def _save(
+        self, db_appointment: Appointment, old_status: AppointmentStatus, old_amount: Optional[Decimal]
+    ) -> Appointment:
+        # Las estadísticas del dashboard se actualizan en la misma transacción
+        await DashboardService(self.db).record_appointment(db_appointment, old_status, old_amount=old_amount)
+        self.db.add(db_appointment)
+        await self.db.commit()
+        return await self.get_appointment(db_appointment.id)
 
-    def update_appointment(self, appointment_id: UUID, appointment_in: AppointmentUpdate) -> Optional[Appointment]:
-        db_appointment = self.get_appointment(appointment_id)
+    async def update_appointment(self, appointment_id: UUID, appointment_in: AppointmentUpdate) -> Optional[Appointment]:
+        db_appointment = await self.get_appointment(appointment_id)
         if not db_appointment:
             return None
+        old_status, old_amount = db_appointment.status, db_appointment.amount
         update_data = appointment_in.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_appointment, key, value)
-        self.db.add(db_appointment)
-        self.db.commit()
-        self.db.refresh(db_appointment)
-        return db_appointment
+        return await self._save(db_appointment, old_status, old_amount)
 
-    def delete_appointment(self, appointment_id: UUID) -> Optional[Appointment]:
-        db_appointment = self.get_appointment(appointment_id)
+    async def delete_appointment(self, appointment_id: UUID) -> Optional[Appointment]:
+        db_appointment = await self.get_appointment(appointment_id)
         if not db_appointment:
             return None
-        self.db.delete(db_appointment)
-        self.db.commit()
+        await DashboardService(self.db).record_appointment(db_appointment, db_appointment.status, deleted=True)
+        await self.db.delete(db_appointment)
+        await self.db.commit()
         return db_appointment
 
-    def confirm_appointment(self, appointment_id: UUID) -> Optional[Appointment]:
-        db_appointment = self.get_appointment(appointment_id)
+    async def confirm_appointment(self, appointment_id: UUID) -> Optional[Appointment]:
+        db_appointment = await self.get_appointment(appointment_id)
         if not db_appointment:
             return None
-        db_appointment.status = "confirmed"
+        old_status = db_appointment.status
+        db_appointment.status = AppointmentStatus.SCHEDULED
         db_appointment.updated_at = datetime.utcnow()
-        self.db.add(db_appointment)
-        self.db.commit()
-        self.db.refresh(db_appointment)
-        return db_appointment
+        return await self._save(db_appointment, old_status, db_appointment.amount)
 
-    def cancel_appointment(self, appointment_id: UUID) -> Optional[Appointment]:
-        db_appointment = self.get_appointment(appointment_id)
+    async def cancel_appointment(self, appointment_id: UUID) -> Optional[Appointment]:
+        db_appointment = await self.get_appointment(appointment_id)
         if not db_appointment:
             return None
-        db_appointment.status = "cancelled"
+        old_status = db_appointment.status
+        db_appointment.status = AppointmentStatus.CANCELLED
         db_appointment.updated_at = datetime.utcnow()
-        self.db.add(db_appointment)
-        self.db.commit()
-        self.db.refresh(db_appointment)
-        return db_appointment
+        return await self._save(db_appointment, old_status, db_appointment.amount)
 
-    def reschedule_appointment(self, appointment_id: UUID, appointment_in: AppointmentUpdate) -> Optional[Appointment]:
-        db_appointment = self.get_appointment(appointment_id)
+    async def reschedule_appointment(self, appointment_id: UUID, appointment_in: AppointmentUpdate) -> Optional[Appointment]:
+        db_appointment = await self.get_appointment(appointment_id)
         if not db_appointment:
             return None
+        old_status, old_amount = db_appointment.status, db_appointment.amount
         update_data = appointment_in.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_appointment, key, value)
-        db_appointment.status = "rescheduled"
         db_appointment.updated_at = datetime.utcnow()
-        self.db.add(db_appointment)
-        self.db.commit()
-        self.db.refresh(db_appointment)
-        return db_appointment
+        return await self._save(db_appointment, old_status, old_amount)
 
     # Appointment Document methods
-    def create_appointment_document(self, doc_in: AppointmentDocumentCreate) -> AppointmentDocument:
+    async def create_appointment_document(self, doc_in: AppointmentDocumentCreate) -> AppointmentDocument:
         db_doc = AppointmentDocument(**doc_in.model_dump())
         self.db.add(db_doc)
-        self.db.commit()
-        self.db.refresh(db_doc)
+        await self.db.commit()
+        await self.db.refresh(db_doc)
         return db_doc
 
-    def get_appointment_document(self, doc_id: UUID) -> Optional[AppointmentDocument]:
-        return self.db.query(AppointmentDocument).filter(AppointmentDocument.id == doc_id).first()
+    async def get_appointment_document(self, doc_id: UUID) -> Optional[AppointmentDocument]:
+        return await self.db.scalar(select(AppointmentDocument).where(AppointmentDocument.id == doc_id))
 
-    def get_appointment_documents(self, appointment_id: UUID) -> List[AppointmentDocument]:
-        return self.db.query(AppointmentDocument).filter(AppointmentDocument.appointment_id == appointment_id).all()
+    async def get_appointment_documents(self, appointment_id: UUID) -> List[AppointmentDocument]:
+        result = await self.db.scalars(
+            select(AppointmentDocument).where(AppointmentDocument.appointment_id == appointment_id)
+        )
+        return list(result)
     
-    def update_appointment_document(self, doc_id: UUID, doc_in: AppointmentDocumentUpdate) -> Optional[AppointmentDocument]:
-        db_doc = self.get_appointment_document(doc_id)
+    async def search_documents(
+        self, user_id: UUID, q: str, skip: int = 0, limit: int = 20, all_appointments: bool = False
+    ) -> List[dict]:
+        """
+        Documentos de las citas del usuario (como médico o paciente; todas con
+        `all_appointments`) que coinciden con `q`, por relevancia.
+        """
+        query = search_query(q)
+        rank = func.ts_rank(AppointmentDocument.search_vector, query)
+        page = (
+            select(
+                AppointmentDocument.id, AppointmentDocument.appointment_id, AppointmentDocument.document_type,
+                AppointmentDocument.content, AppointmentDocument.created_at, rank.label("rank"),
+            )
+            .where(AppointmentDocument.search_vector.bool_op("@@")(query))
+            .order_by(rank.desc(), AppointmentDocument.created_at.desc(), AppointmentDocument.id)
+            .offset(skip)
+            .limit(limit)
+        )
+        if not all_appointments:
+            page = page.join(Appointment, Appointment.id == AppointmentDocument.appointment_id).where(
+                or_(Appointment.doctor_id == user_id, Appointment.patient_id == user_id)
+            )
+        page = page.subquery()
+        rows = await self.db.execute(
+            select(page, search_snippet(page.c.content, query).label("snippet"))
+            .order_by(page.c.rank.desc(), page.c.created_at.desc(), page.c.id)
+        )
+        return [
+            {
+                "type": "document",
+                "id": row.id,
+                "appointment_id": row.appointment_id,
+                "document_type": row.document_type,
+                "snippet": highlight_snippet(row.snippet),
+                "rank": row.rank,
+                "created_at": row.created_at,
+            }
+            for row in rows
+        ]
+
+    async def similar_documents(
+        self, user_id: UUID, q: str, k: int = 10, all_appointments: bool = False
+    ) -> List[dict]:
+        """
+        Los `k` documentos semánticamente más cercanos a `q` dentro de las citas
+        del usuario (todas con `all_appointments`), con su similitud.
+        """
+        vector = (await asyncio.to_thread(get_embedder().embed, [q]))[0]
+        scope = None
+        if not all_appointments:
+            scope = (
+                select(AppointmentDocument.id)
+                .join(Appointment, Appointment.id == AppointmentDocument.appointment_id)
+                .where(or_(Appointment.doctor_id == user_id, Appointment.patient_id == user_id))
+            )
+        hits = await get_document_index().search(self.db, vector, k, scope)
+        documents = {
+            doc.id: doc
+            for doc in await self.db.scalars(
+                select(AppointmentDocument).where(AppointmentDocument.id.in_([doc_id for doc_id, _ in hits]))
+            )
+        }
+        # El índice local puede contener documentos borrados desde el último backfill
+        return [
+            {
+                "id": doc_id,
+                "appointment_id": documents[doc_id].appointment_id,
+                "document_type": documents[doc_id].document_type,
+                "content": documents[doc_id].content,
+                "created_at": documents[doc_id].created_at,
+                "updated_at": documents[doc_id].updated_at,
+                "score": score,
+            }
+            for doc_id, score in hits
+            if doc_id in documents
+        ]
+
+    async def update_appointment_document(self, doc_id: UUID, doc_in: AppointmentDocumentUpdate) -> Optional[AppointmentDocument]:
+        db_doc = await self.get_appointment_document(doc_id)
         if not db_doc:
             return None
         update_data = doc_in.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_doc, key, value)
         self.db.add(db_doc)
-        self.db.commit()
-        self.db.refresh(db_doc)
+        await self.db.commit()
+        await self.db.refresh(db_doc)
         return db_doc
 
-    def delete_appointment_document(self, doc_id: UUID) -> Optional[AppointmentDocument]:
-        db_doc = self.get_appointment_document(doc_id)
+    async def delete_appointment_document(self, doc_id: UUID) -> Optional[AppointmentDocument]:
+        db_doc = await self.get_appointment_document(doc_id)
         if not db_doc:
             return None
-        self.db.delete(db_doc)
-        self.db.commit()
+        await self.db.delete(db_doc)
+        await self.db.commit()
         return db_doc
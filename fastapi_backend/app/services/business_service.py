@@ -1,23 +1,75 @@
-from sqlalchemy.orm import Session
+from typing import NamedTuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.loading import loader_options
 from app.models.business import Business, BusinessLocation
+from app.schemas import business as business_schemas
 from app.schemas.business import BusinessCreate, BusinessUpdate, BusinessLocationCreate, BusinessLocationUpdate
 from uuid import UUID
 
+class Ownership(NamedTuple):
+    business_id: UUID
+    owner_id: UUID
+
+# Ownership of businesses and locations, keyed by ("business" | "location", str(id))
+ownership_cache = TTLCache(maxsize=settings.OWNERSHIP_CACHE_MAX_SIZE, ttl=settings.OWNERSHIP_CACHE_TTL)
+
 class BusinessService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
     # --- Business CRUD ---
-    def get_business(self, business_id: UUID) -> Business | None:
-        return self.db.query(Business).filter(Business.id == business_id).first()
+    async def get_business(self, business_id: UUID) -> Business | None:
+        return await self.db.scalar(
+            select(Business).options(*loader_options(business_schemas.Business)).where(Business.id == business_id)
+        )
+
+    async def get_business_ownership(self, business_id: UUID) -> Ownership | None:
+        """(business_id, owner_id) for authorization checks, without loading the business."""
+        key = ("business", str(business_id))
+        ownership = ownership_cache.get(key)
+        if ownership is None:
+            owner_id = await self.db.scalar(select(Business.owner_id).where(Business.id == business_id))
+            if owner_id is None:
+                return None
+            ownership = Ownership(business_id, owner_id)
+            ownership_cache.set(key, ownership)
+        return ownership
+
+    async def get_location_ownership(self, location_id: UUID) -> Ownership | None:
+        """Owning business and its owner for a location, resolved in one joined query."""
+        key = ("location", str(location_id))
+        ownership = ownership_cache.get(key)
+        if ownership is None:
+            row = (await self.db.execute(
+                select(BusinessLocation.business_id, Business.owner_id)
+                .join(Business, Business.id == BusinessLocation.business_id)
+                .where(BusinessLocation.id == location_id)
+            )).first()
+            if row is None:
+                return None
+            ownership = Ownership(*row)
+            ownership_cache.set(key, ownership)
+        return ownership
 
-    def get_businesses(self, owner_id: UUID | None = None, skip: int = 0, limit: int = 100) -> list[Business]:
-        query = self.db.query(Business)
+    def invalidate_ownership(self, business: Business | None = None, location_id: UUID | None = None) -> None:
+        if business is not None:
+            ownership_cache.invalidate(("business", str(business.id)))
+            for location in business.locations:
+                ownership_cache.invalidate(("location", str(location.id)))
+        if location_id is not None:
+            ownership_cache.invalidate(("location", str(location_id)))
+
+    async def get_businesses(self, owner_id: UUID | None = None, skip: int = 0, limit: int = 100) -> list[Business]:
+        query = select(Business).options(*loader_options(business_schemas.Business))
         if owner_id:
-            query = query.filter(Business.owner_id == owner_id)
-        return query.offset(skip).limit(limit).all()
+            query = query.where(Business.owner_id == owner_id)
+        result = await self.db.scalars(query.offset(skip).limit(limit))
+        return list(result)
 
-    def create_business(self, business_in: BusinessCreate) -> Business:
+    async def create_business(self, business_in: BusinessCreate) -> Business:
         db_business = Business(
             name=business_in.name,
             address=business_in.address,
@@ -27,12 +79,11 @@ class BusinessService:
             owner_id=business_in.owner_id
         )
         self.db.add(db_business)
-        self.db.commit()
-        self.db.refresh(db_business)
-        return db_business
+        await self.db.commit()
+        return await self.get_business(db_business.id)
 
-    def update_business(self, business_id: UUID, business_in: BusinessUpdate) -> Business | None:
-        db_business = self.get_business(business_id)
+    async def update_business(self, business_id: UUID, business_in: BusinessUpdate) -> Business | None:
+        db_business = await self.get_business(business_id)
         if not db_business:
             return None
         
@@ -41,26 +92,30 @@ class BusinessService:
             setattr(db_business, key, value)
         
         self.db.add(db_business)
-        self.db.commit()
-        self.db.refresh(db_business)
-        return db_business
+        await self.db.commit()
+        self.invalidate_ownership(business=db_business)
+        return await self.get_business(business_id)
 
-    def delete_business(self, business_id: UUID) -> Business | None:
-        db_business = self.get_business(business_id)
+    async def delete_business(self, business_id: UUID) -> Business | None:
+        db_business = await self.get_business(business_id)
         if not db_business:
             return None
-        self.db.delete(db_business)
-        self.db.commit()
+        await self.db.delete(db_business)
+        await self.db.commit()
+        self.invalidate_ownership(business=db_business)
         return db_business
 
     # --- BusinessLocation CRUD ---
-    def get_business_location(self, location_id: UUID) -> BusinessLocation | None:
-        return self.db.query(BusinessLocation).filter(BusinessLocation.id == location_id).first()
+    async def get_business_location(self, location_id: UUID) -> BusinessLocation | None:
+        return await self.db.scalar(select(BusinessLocation).where(BusinessLocation.id == location_id))
 
-    def get_business_locations_by_business(self, business_id: UUID, skip: int = 0, limit: int = 100) -> list[BusinessLocation]:
-        return self.db.query(BusinessLocation).filter(BusinessLocation.business_id == business_id).offset(skip).limit(limit).all()
+    async def get_business_locations_by_business(self, business_id: UUID, skip: int = 0, limit: int = 100) -> list[BusinessLocation]:
+        result = await self.db.scalars(
+            select(BusinessLocation).where(BusinessLocation.business_id == business_id).offset(skip).limit(limit)
+        )
+        return list(result)
 
-    def create_business_location(self, location_in: BusinessLocationCreate) -> BusinessLocation:
+    async def create_business_location(self, location_in: BusinessLocationCreate) -> BusinessLocation:
         db_location = BusinessLocation(
             business_id=location_in.business_id,
             name=location_in.name,
@@ -68,12 +123,12 @@ class BusinessService:
             phone=location_in.phone
         )
         self.db.add(db_location)
-        self.db.commit()
-        self.db.refresh(db_location)
+        await self.db.commit()
+        await self.db.refresh(db_location)
         return db_location
 
-    def update_business_location(self, location_id: UUID, location_in: BusinessLocationUpdate) -> BusinessLocation | None:
-        db_location = self.get_business_location(location_id)
+    async def update_business_location(self, location_id: UUID, location_in: BusinessLocationUpdate) -> BusinessLocation | None:
+        db_location = await self.get_business_location(location_id)
         if not db_location:
             return None
         
@@ -82,14 +137,16 @@ class BusinessService:
             setattr(db_location, key, value)
         
         self.db.add(db_location)
-        self.db.commit()
-        self.db.refresh(db_location)
+        await self.db.commit()
+        self.invalidate_ownership(location_id=location_id)
+        await self.db.refresh(db_location)
         return db_location
 
-    def delete_business_location(self, location_id: UUID) -> BusinessLocation | None:
-        db_location = self.get_business_location(location_id)
+    async def delete_business_location(self, location_id: UUID) -> BusinessLocation | None:
+        db_location = await self.get_business_location(location_id)
         if not db_location:
             return None
-        self.db.delete(db_location)
-        self.db.commit()
+        await self.db.delete(db_location)
+        await self.db.commit()
+        self.invalidate_ownership(location_id=location_id)
         return db_location
@@ -1,18 +1,30 @@
 
-from sqlalchemy.orm import Session
-from uuid import UUID
-from typing import List, Optional
+from sqlalchemy import and_, delete, exists, func, insert, or_, select, true, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID, uuid4
+from typing import List, Optional, Tuple
 from datetime import datetime
 
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.loading import loader_options
+from app.db.search import highlight_snippet, search_query, search_snippet
 from app.models.chat import Conversation, Message, ConversationParticipant
 from app.models.user import User
-from app.schemas.chat import ConversationCreate, MessageCreateInternal
+from app.schemas import chat as chat_schemas
+from app.schemas.chat import ConversationCreate, DirectConversationCreate, MessageCreateInternal
+
+INBOX_PREVIEW_LENGTH = 140
+
+# Pertenencia (user_id, conversation_id) confirmada; solo se cachean aciertos
+membership_cache = TTLCache(maxsize=settings.MEMBERSHIP_CACHE_MAX_SIZE, ttl=settings.MEMBERSHIP_CACHE_TTL)
 
 class ChatService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def create_conversation(self, conversation_in: ConversationCreate, current_user_id: UUID) -> Conversation:
+    async def create_conversation(self, conversation_in: ConversationCreate, current_user_id: UUID) -> Conversation:
         if current_user_id not in conversation_in.participant_ids:
             raise ValueError("Creator must be a participant")
 
@@ -21,58 +33,287 @@ class ChatService:
             appointment_id=conversation_in.appointment_id
         )
         self.db.add(db_conversation)
-        self.db.commit()
+        await self.db.flush()
+        await self._add_participants(db_conversation.id, conversation_in.participant_ids)
+        if conversation_in.initial_message:
+            self.db.add(Message(
+                conversation_id=db_conversation.id, sender_id=current_user_id, content=conversation_in.initial_message,
+            ))
+        # Conversación, participantes y primer mensaje en una sola transacción
+        await self.db.commit()
+        return await self.get_conversation(db_conversation.id)
 
-        for user_id in conversation_in.participant_ids:
-            participant = ConversationParticipant(
-                user_id=user_id,
-                conversation_id=db_conversation.id
+    async def get_or_create_direct_conversation(
+        self, conversation_in: DirectConversationCreate, current_user_id: UUID
+    ) -> Tuple[Conversation, bool]:
+        """
+        Conversación directa entre el usuario actual y `user_id` para el tipo y la
+        cita dados; idempotente gracias al índice único uq_conversations_direct.
+        Devuelve (conversación, creada).
+        """
+        if conversation_in.user_id == current_user_id:
+            raise ValueError("A direct conversation needs two different users")
+        low, high = sorted((current_user_id, conversation_in.user_id))
+        key = {
+            "type": conversation_in.type,
+            "appointment_id": conversation_in.appointment_id,
+            "direct_user_low": low,
+            "direct_user_high": high,
+        }
+        conversation_id = await self.db.scalar(
+            pg_insert(Conversation)
+            .values(id=uuid4(), **key)
+            .on_conflict_do_nothing(
+                index_elements=list(key), index_where=Conversation.direct_user_low.is_not(None),
             )
-            self.db.add(participant)
-        
-        self.db.commit()
-        self.db.refresh(db_conversation)
-        return db_conversation
+            .returning(Conversation.id)
+        )
+        created = conversation_id is not None
+        if created:
+            await self._add_participants(conversation_id, [low, high])
+            if conversation_in.initial_message:
+                self.db.add(Message(
+                    conversation_id=conversation_id, sender_id=current_user_id, content=conversation_in.initial_message,
+                ))
+            await self.db.commit()
+        else:
+            # Ya existía (o la creó una petición concurrente, que ya confirmó)
+            conversation_id = await self.db.scalar(
+                select(Conversation.id).where(
+                    *(getattr(Conversation, column).is_not_distinct_from(value) for column, value in key.items())
+                )
+            )
+        return await self.get_conversation(conversation_id), created
+
+    async def _add_participants(self, conversation_id: UUID, user_ids: List[UUID]) -> None:
+        # Un único INSERT multi-fila; dict.fromkeys quita duplicados conservando el orden
+        await self.db.execute(insert(ConversationParticipant), [
+            {"conversation_id": conversation_id, "user_id": user_id} for user_id in dict.fromkeys(user_ids)
+        ])
+
+    async def get_conversation(self, conversation_id: UUID) -> Optional[Conversation]:
+        return await self.db.scalar(
+            select(Conversation).options(*loader_options(chat_schemas.Conversation)).where(Conversation.id == conversation_id)
+        )
+
+    async def get_user_conversations(self, user_id: UUID) -> List[Conversation]:
+        result = await self.db.scalars(
+            select(Conversation)
+            .join(Conversation.participants)
+            .options(*loader_options(chat_schemas.Conversation))
+            .where(User.id == user_id)
+        )
+        return list(result)
 
-    def get_conversation(self, conversation_id: UUID) -> Optional[Conversation]:
-        return self.db.query(Conversation).filter(Conversation.id == conversation_id).first()
+    async def get_inbox(self, user_id: UUID, skip: int = 0, limit: int = 50) -> List[dict]:
+        """
+        Una fila por conversación del usuario con el último mensaje y sus no leídos,
+        ordenadas por actividad. El último mensaje sale de un LATERAL sobre el índice
+        (conversation_id, created_at, id) y los no leídos se cuentan desde la marca
+        `last_read_at`, así que el coste no crece con el historial.
+        """
+        last_message = (
+            select(
+                Message.id,
+                Message.sender_id,
+                func.left(Message.content, INBOX_PREVIEW_LENGTH).label("content"),
+                Message.created_at,
+            )
+            .where(Message.conversation_id == Conversation.id)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(1)
+            .lateral("last_message")
+        )
+        # Solo recorre los mensajes posteriores a la marca de lectura del usuario
+        unread_count = (
+            select(func.count())
+            .where(
+                Message.conversation_id == Conversation.id,
+                Message.sender_id != user_id,
+                or_(
+                    ConversationParticipant.last_read_at.is_(None),
+                    Message.created_at > ConversationParticipant.last_read_at,
+                ),
+            )
+            .scalar_subquery()
+        )
+        rows = await self.db.execute(
+            select(Conversation, ConversationParticipant.last_read_at, last_message, unread_count.label("unread_count"))
+            .join(ConversationParticipant, and_(
+                ConversationParticipant.conversation_id == Conversation.id,
+                ConversationParticipant.user_id == user_id,
+            ))
+            .outerjoin(last_message, true())
+            .options(*loader_options(chat_schemas.InboxEntry))
+            .order_by(func.coalesce(last_message.c.created_at, Conversation.created_at).desc(), Conversation.id)
+            .offset(skip)
+            .limit(limit)
+        )
+        return [
+            {
+                "id": row.Conversation.id,
+                "type": row.Conversation.type,
+                "appointment_id": row.Conversation.appointment_id,
+                "created_at": row.Conversation.created_at,
+                "updated_at": row.Conversation.updated_at,
+                "participants": row.Conversation.participants,
+                "last_message": {
+                    "id": row.id, "sender_id": row.sender_id, "content": row.content, "created_at": row.created_at,
+                } if row.id is not None else None,
+                "unread_count": row.unread_count,
+                "last_read_at": row.last_read_at,
+            }
+            for row in rows
+        ]
 
-    def get_user_conversations(self, user_id: UUID) -> List[Conversation]:
-        return self.db.query(Conversation).join(Conversation.participants).filter(User.id == user_id).all()
+    async def search_messages(self, user_id: UUID, q: str, skip: int = 0, limit: int = 20) -> List[dict]:
+        """
+        Mensajes de las conversaciones del usuario que coinciden con `q`, por
+        relevancia. Usa el índice GIN de `search_vector`; el fragmento resaltado
+        solo se calcula para la página devuelta.
+        """
+        query = search_query(q)
+        rank = func.ts_rank(Message.search_vector, query)
+        page = (
+            select(
+                Message.id, Message.conversation_id, Message.content, Message.created_at, rank.label("rank"),
+            )
+            .join(ConversationParticipant, and_(
+                ConversationParticipant.conversation_id == Message.conversation_id,
+                ConversationParticipant.user_id == user_id,
+            ))
+            .where(Message.search_vector.bool_op("@@")(query))
+            .order_by(rank.desc(), Message.created_at.desc(), Message.id)
+            .offset(skip)
+            .limit(limit)
+            .subquery()
+        )
+        rows = await self.db.execute(
+            select(page, search_snippet(page.c.content, query).label("snippet"))
+            .order_by(page.c.rank.desc(), page.c.created_at.desc(), page.c.id)
+        )
+        return [
+            {
+                "type": "message",
+                "id": row.id,
+                "conversation_id": row.conversation_id,
+                "snippet": highlight_snippet(row.snippet),
+                "rank": row.rank,
+                "created_at": row.created_at,
+            }
+            for row in rows
+        ]
 
-    def create_message(self, message_in: MessageCreateInternal) -> Message:
+    async def create_message(self, message_in: MessageCreateInternal) -> Message:
         db_message = Message(**message_in.model_dump())
         self.db.add(db_message)
-        self.db.commit()
-        self.db.refresh(db_message)
-        return db_message
-
-    def get_messages_for_conversation(self, conversation_id: UUID) -> List[Message]:
-        return self.db.query(Message).filter(Message.conversation_id == conversation_id).order_by(Message.created_at.asc()).all()
-
-    def mark_conversation_as_read(self, conversation_id: UUID, user_id: UUID):
-        """Mark all messages in a conversation as read for a specific user"""
-        # Update all unread messages in the conversation for this user
-        messages = self.db.query(Message).filter(
-            Message.conversation_id == conversation_id,
-            Message.sender_id != user_id,
-            Message.read_at.is_(None)
-        ).all()
-        
-        for message in messages:
-            message.read_at = datetime.utcnow()
-        
-        self.db.commit()
+        await self.db.commit()
+        return await self.db.scalar(
+            select(Message).options(*loader_options(chat_schemas.Message)).where(Message.id == db_message.id)
+        )
+
+    async def is_participant(self, conversation_id: UUID, user_id: UUID) -> bool:
+        """
+        Comprueba la pertenencia con un EXISTS sobre la clave primaria de
+        conversation_participants, sin cargar participantes ni mensajes.
+        """
+        key = (str(user_id), str(conversation_id))
+        if membership_cache.get(key):
+            return True
+        is_member = await self.db.scalar(select(
+            exists().where(
+                ConversationParticipant.user_id == user_id,
+                ConversationParticipant.conversation_id == conversation_id,
+            )
+        ))
+        if is_member:
+            membership_cache.set(key, True)
+        return is_member
+
+    async def get_participant_ids(self, conversation_id: UUID) -> List[UUID]:
+        result = await self.db.scalars(
+            select(ConversationParticipant.user_id).where(ConversationParticipant.conversation_id == conversation_id)
+        )
+        return list(result)
+
+    async def get_messages_for_conversation(
+        self,
+        conversation_id: UUID,
+        before: Optional[UUID] = None,
+        after: Optional[UUID] = None,
+        limit: int = 50,
+    ) -> List[Message]:
+        """
+        Una página del historial en orden cronológico. `before`/`after` son ids de
+        mensajes de la conversación usados como cursor sobre (created_at, id); sin
+        `after` se devuelven los `limit` mensajes más recientes (antes de `before`).
+        """
+        def position(message_id: UUID):
+            return (
+                select(Message.created_at, Message.id)
+                .where(Message.id == message_id, Message.conversation_id == conversation_id)
+                .scalar_subquery()
+            )
 
-    def delete_conversation(self, conversation_id: UUID):
+        key = tuple_(Message.created_at, Message.id)
+        query = (
+            select(Message)
+            .options(*loader_options(chat_schemas.Message))
+            .where(Message.conversation_id == conversation_id)
+        )
+        if before is not None:
+            query = query.where(key < position(before))
+        if after is not None:
+            query = query.where(key > position(after))
+            result = await self.db.scalars(query.order_by(Message.created_at, Message.id).limit(limit))
+            return list(result)
+
+        result = await self.db.scalars(query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit))
+        return list(reversed(result.all()))
+
+    async def mark_conversation_as_read(self, conversation_id: UUID, user_id: UUID) -> Optional[datetime]:
+        """
+        Avanza la marca de lectura del participante y, para quien todavía use
+        `Message.read_at`, lo rellena con un único UPDATE en la base de datos.
+        Devuelve la nueva marca.
+        """
+        last_read_at = await self.db.scalar(
+            update(ConversationParticipant)
+            .where(
+                ConversationParticipant.conversation_id == conversation_id,
+                ConversationParticipant.user_id == user_id,
+            )
+            .values(last_read_at=func.now())
+            .returning(ConversationParticipant.last_read_at)
+        )
+        await self.db.execute(
+            update(Message)
+            .where(
+                Message.conversation_id == conversation_id,
+                Message.sender_id != user_id,
+                Message.read_at.is_(None),
+            )
+            .values(read_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+        return last_read_at
+
+    async def delete_conversation(self, conversation_id: UUID):
         """Delete a conversation and all its messages"""
         # Delete all messages in the conversation
-        self.db.query(Message).filter(Message.conversation_id == conversation_id).delete()
+        await self.db.execute(delete(Message).where(Message.conversation_id == conversation_id))
         
         # Delete all participants
-        self.db.query(ConversationParticipant).filter(ConversationParticipant.conversation_id == conversation_id).delete()
+        participant_ids = await self.db.scalars(
+            delete(ConversationParticipant)
+            .where(ConversationParticipant.conversation_id == conversation_id)
+            .returning(ConversationParticipant.user_id)
+        )
+        for user_id in participant_ids:
+            membership_cache.invalidate((str(user_id), str(conversation_id)))
         
         # Delete the conversation
-        self.db.query(Conversation).filter(Conversation.id == conversation_id).delete()
+        await self.db.execute(delete(Conversation).where(Conversation.id == conversation_id))
         
-        self.db.commit()
+        await self.db.commit()
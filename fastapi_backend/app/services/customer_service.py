@@ -1,38 +1,40 @@
 from uuid import UUID
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.customer import Customer
 from app.schemas.customer import CustomerCreate, CustomerUpdate
+from app.crud.pagination import paginate
 
 class CustomerService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def get_customer(self, customer_id: UUID) -> Customer | None:
-        return self.db.query(Customer).filter(Customer.id == customer_id).first()
+    async def get_customer(self, customer_id: UUID) -> Customer | None:
+        return await self.db.scalar(select(Customer).where(Customer.id == customer_id))
 
-    def create_customer(self, customer_in: CustomerCreate) -> Customer:
+    async def create_customer(self, customer_in: CustomerCreate) -> Customer:
         db_customer = Customer(**customer_in.model_dump())
         self.db.add(db_customer)
-        self.db.commit()
-        self.db.refresh(db_customer)
+        await self.db.commit()
+        await self.db.refresh(db_customer)
         return db_customer
 
-    def update_customer(self, customer_id: UUID, customer_in: CustomerUpdate) -> Customer | None:
-        db_customer = self.get_customer(customer_id)
+    async def update_customer(self, customer_id: UUID, customer_in: CustomerUpdate) -> Customer | None:
+        db_customer = await self.get_customer(customer_id)
         if db_customer:
             update_data = customer_in.model_dump(exclude_unset=True)
             for key, value in update_data.items():
                 setattr(db_customer, key, value)
-            self.db.commit()
-            self.db.refresh(db_customer)
+            await self.db.commit()
+            await self.db.refresh(db_customer)
         return db_customer
 
-    def delete_customer(self, customer_id: UUID) -> Customer | None:
-        db_customer = self.get_customer(customer_id)
+    async def delete_customer(self, customer_id: UUID) -> Customer | None:
+        db_customer = await self.get_customer(customer_id)
         if db_customer:
-            self.db.delete(db_customer)
-            self.db.commit()
+            await self.db.delete(db_customer)
+            await self.db.commit()
         return db_customer
 
-    def get_customers(self, skip: int = 0, limit: int = 100) -> list[Customer]:
-        return self.db.query(Customer).offset(skip).limit(limit).all()
+    async def get_customers(self, skip: int = 0, limit: int = 100, cursor: str | None = None) -> list[Customer] | dict:
+        return await paginate(self.db, select(Customer), Customer, skip=skip, limit=limit, cursor=cursor)
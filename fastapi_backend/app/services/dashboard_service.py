@@ -1,19 +1,236 @@
-from sqlalchemy.orm import Session
-from app.models.patient import Patient  # Import Patient model directly
-from ..schemas.dashboard import DashboardStats
+"""
+Estadísticas del dashboard a partir de filas precalculadas.
+
+Los servicios de pacientes, citas y suscripciones llaman a los `record_*` dentro
+de su propia transacción, así que los totales por usuario (pos.dashboard_user_stats)
+y las filas diarias (pos.dashboard_daily_stats) cambian a la vez que los datos.
+Cada `record_*` es un upsert que suma el delta sobre la fila, así que las
+escrituras concurrentes no se pisan. Leer el dashboard es una búsqueda por clave
+primaria, sin importar cuántos pacientes o citas tenga el usuario.
+
+`rebuild` recalcula todo desde las tablas de origen. Sirve para el backfill inicial
+y para corregir desvíos, y se puede lanzar periódicamente con
+`python -m app.refresh_dashboard_stats`.
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Optional
+from uuid import UUID
+
+from sqlalchemy import Date, DateTime, and_, cast, delete, func, literal, select, text, union_all, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.appointment import Appointment, AppointmentStatus
+from app.models.dashboard import PLATFORM_STATS_ID, DashboardDailyStats, DashboardUserStats
+from app.models.patient import Patient
+from app.models.subscription import Price
+from app.schemas.dashboard import DashboardStats
+
+# Estados de una cita que ya pasó por el pago
+PAID_STATUSES = frozenset({AppointmentStatus.SCHEDULED, AppointmentStatus.ACTIVE, AppointmentStatus.COMPLETED})
+
+STATUS_COLUMNS = {status: f"appointments_{status.value}" for status in AppointmentStatus}
+
 
 class DashboardService:
-    def get_dashboard_stats(self, db: Session, user_id: str) -> DashboardStats:
-        # Lógica para contar pacientes
-        patient_count = db.query(Patient).filter(Patient.user_id == user_id).count()
+    def __init__(self, db: AsyncSession):
+        self.db = db
 
-        # Lógica para calcular ingresos (simulada por ahora)
-        # En una implementación real, esto vendría de una tabla de transacciones o pagos.
-        todays_revenue = 1250.75  # Valor de ejemplo
+    async def get_dashboard_stats(self, user_id: UUID, include_platform: bool = False) -> DashboardStats:
+        """Totales del usuario y su actividad de hoy; los admins ven además los ingresos por suscripciones."""
+        user_ids = [user_id, UUID(PLATFORM_STATS_ID)] if include_platform else [user_id]
+        rows = (await self.db.execute(
+            select(DashboardUserStats, DashboardDailyStats)
+            .outerjoin(DashboardDailyStats, and_(
+                DashboardDailyStats.user_id == DashboardUserStats.user_id,
+                DashboardDailyStats.day == func.current_date(),
+            ))
+            .where(DashboardUserStats.user_id.in_(user_ids))
+        )).all()
 
-        return DashboardStats(
-            patient_count=patient_count,
-            todays_revenue=todays_revenue
+        stats = DashboardStats(
+            patient_count=0, todays_revenue=0.0, total_revenue=0.0,
+            appointment_counts={status.value: 0 for status in AppointmentStatus},
         )
+        todays_revenue = Decimal(0)
+        for totals, today in rows:
+            if str(totals.user_id) == PLATFORM_STATS_ID:
+                if today is not None:
+                    todays_revenue += today.subscription_revenue
+                    stats.todays_subscription_revenue = float(today.subscription_revenue)
+                continue
+            stats.patient_count = totals.patient_count
+            stats.total_revenue = float(totals.revenue_total)
+            stats.appointment_counts = {
+                status.value: getattr(totals, column) for status, column in STATUS_COLUMNS.items()
+            }
+            if today is not None:
+                todays_revenue += today.appointment_revenue
+                stats.todays_new_patients = today.patients_added
+                stats.todays_new_appointments = today.appointments_created
+        stats.todays_revenue = float(todays_revenue)
+        return stats
+
+    # --- Mantenimiento incremental (sin commit: van en la transacción del llamador) ---
+    async def _add(
+        self, user_id: UUID, totals: Dict[str, object], daily: Optional[Dict[str, object]] = None,
+        at: Optional[datetime] = None,
+    ) -> None:
+        """Suma los deltas a los totales y a la fila del día de `at` (hoy por defecto)."""
+        if totals:
+            insert = pg_insert(DashboardUserStats).values(user_id=user_id, **totals)
+            await self.db.execute(insert.on_conflict_do_update(
+                index_elements=[DashboardUserStats.user_id],
+                set_={
+                    **{key: getattr(DashboardUserStats, key) + insert.excluded[key] for key in totals},
+                    "updated_at": func.now(),
+                },
+            ))
+        if daily:
+            # El día se calcula en la base de datos, con su zona horaria, igual que en `rebuild`
+            day = func.current_date() if at is None else cast(literal(at, DateTime(timezone=True)), Date)
+            insert = pg_insert(DashboardDailyStats).values(user_id=user_id, day=day, **daily)
+            await self.db.execute(insert.on_conflict_do_update(
+                index_elements=[DashboardDailyStats.user_id, DashboardDailyStats.day],
+                set_={key: getattr(DashboardDailyStats, key) + insert.excluded[key] for key in daily},
+            ))
+
+    async def record_patient_added(self, patient: Patient) -> None:
+        await self._add(patient.user_id, {"patient_count": 1}, {"patients_added": 1})
+
+    async def record_patient_removed(self, patient: Patient) -> None:
+        await self._add(patient.user_id, {"patient_count": -1}, {"patients_added": -1}, at=patient.created_at)
+
+    async def record_appointment(
+        self, appointment: Appointment, old_status: Optional[AppointmentStatus], deleted: bool = False,
+        old_amount: Optional[Decimal] = None,
+    ) -> None:
+        """
+        Refleja un alta, cambio de estado o borrado de `appointment`. La primera vez
+        que una cita con importe llega a un estado pagado se fija `paid_at` y su
+        importe cuenta como ingreso de ese día; cancelarla no lo descuenta, borrarla sí.
+        Si cambia el importe de una cita ya pagada (`old_amount` es el anterior), la
+        diferencia se aplica al día de `paid_at`.
+        """
+        if deleted:
+            await self._add(appointment.doctor_id, {STATUS_COLUMNS[AppointmentStatus(old_status)]: -1},
+                            {"appointments_created": -1}, at=appointment.created_at)
+            if appointment.paid_at is not None and appointment.amount is not None:
+                amount = -Decimal(str(appointment.amount))
+                await self._add(appointment.doctor_id, {"revenue_total": amount},
+                                {"appointment_revenue": amount}, at=appointment.paid_at)
+            return
+
+        if appointment.paid_at is not None and old_status is not None:
+            difference = Decimal(str(appointment.amount or 0)) - Decimal(str(old_amount or 0))
+            if difference:
+                await self._add(appointment.doctor_id, {"revenue_total": difference},
+                                {"appointment_revenue": difference}, at=appointment.paid_at)
 
-dashboard_service = DashboardService()
+        new_status = AppointmentStatus(appointment.status)
+        totals: Dict[str, object] = {}
+        daily: Dict[str, object] = {}
+        if old_status != new_status:
+            if old_status is not None:
+                totals[STATUS_COLUMNS[AppointmentStatus(old_status)]] = -1
+            totals[STATUS_COLUMNS[new_status]] = 1
+        if old_status is None:
+            daily["appointments_created"] = 1
+        if new_status in PAID_STATUSES and appointment.amount is not None and appointment.paid_at is None:
+            appointment.paid_at = datetime.now(timezone.utc)
+            totals["revenue_total"] = Decimal(str(appointment.amount))
+            daily["appointment_revenue"] = Decimal(str(appointment.amount))
+        await self._add(appointment.doctor_id, totals, daily)
+
+    async def record_subscription_payment(self, price_id: Optional[str], quantity: Optional[int]) -> None:
+        """Cobro de un periodo de suscripción (unit_amount en céntimos), en la fila de la plataforma."""
+        unit_amount = await self.db.scalar(select(Price.unit_amount).where(Price.id == price_id)) if price_id else None
+        if not unit_amount:
+            return
+        amount = Decimal(unit_amount * (quantity or 1)) / 100
+        await self._add(UUID(PLATFORM_STATS_ID), {"revenue_total": amount}, {"subscription_revenue": amount})
+
+    # --- Reconstrucción completa ---
+    async def rebuild(self) -> None:
+        """
+        Recalcula totales y filas diarias de pacientes y citas desde las tablas de
+        origen, en una transacción. Los ingresos por suscripciones no se pueden
+        reconstruir (solo se guarda el periodo actual) y se conservan.
+        """
+        # Las escrituras que mantienen las filas esperan a que termine la reconstrucción
+        await self.db.execute(text(
+            "LOCK TABLE pos.dashboard_user_stats, pos.dashboard_daily_stats IN EXCLUSIVE MODE"
+        ))
+        platform_id = UUID(PLATFORM_STATS_ID)
+
+        patients = (
+            select(Patient.user_id.label("user_id"), func.count().label("patient_count"))
+            .group_by(Patient.user_id)
+            .subquery()
+        )
+        appointments = (
+            select(
+                Appointment.doctor_id.label("user_id"),
+                *[
+                    func.count().filter(Appointment.status == status).label(column)
+                    for status, column in STATUS_COLUMNS.items()
+                ],
+                func.coalesce(func.sum(Appointment.amount).filter(Appointment.paid_at.isnot(None)), 0).label("revenue_total"),
+            )
+            .group_by(Appointment.doctor_id)
+            .subquery()
+        )
+        user_id = func.coalesce(patients.c.user_id, appointments.c.user_id)
+        totals = select(
+            user_id,
+            func.coalesce(patients.c.patient_count, 0),
+            *[func.coalesce(appointments.c[column], 0) for column in STATUS_COLUMNS.values()],
+            func.coalesce(appointments.c.revenue_total, 0),
+        ).select_from(patients.outerjoin(appointments, patients.c.user_id == appointments.c.user_id, full=True))
+        columns = ["user_id", "patient_count", *STATUS_COLUMNS.values(), "revenue_total"]
+
+        await self.db.execute(
+            update(DashboardUserStats)
+            .where(DashboardUserStats.user_id != platform_id)
+            .values({column: 0 for column in columns[1:]})
+        )
+        insert = pg_insert(DashboardUserStats).from_select(columns, totals)
+        await self.db.execute(insert.on_conflict_do_update(
+            index_elements=[DashboardUserStats.user_id],
+            set_={**{column: insert.excluded[column] for column in columns[1:]}, "updated_at": func.now()},
+        ))
+
+        zero = literal(0)
+        activity = union_all(
+            select(Patient.user_id.label("user_id"), cast(Patient.created_at, Date).label("day"),
+                   literal(1).label("patients_added"), zero.label("appointments_created"), zero.label("appointment_revenue")),
+            select(Appointment.doctor_id, cast(Appointment.created_at, Date), zero, literal(1), zero),
+            select(Appointment.doctor_id, cast(Appointment.paid_at, Date), zero, zero, Appointment.amount)
+            .where(Appointment.paid_at.isnot(None), Appointment.amount.isnot(None)),
+        ).subquery()
+        daily = (
+            select(
+                activity.c.user_id, activity.c.day, func.sum(activity.c.patients_added),
+                func.sum(activity.c.appointments_created), func.sum(activity.c.appointment_revenue),
+            )
+            .where(activity.c.day.isnot(None))
+            .group_by(activity.c.user_id, activity.c.day)
+        )
+        daily_columns = ["user_id", "day", "patients_added", "appointments_created", "appointment_revenue"]
+
+        await self.db.execute(
+            update(DashboardDailyStats).values({column: 0 for column in daily_columns[2:]})
+        )
+        insert = pg_insert(DashboardDailyStats).from_select(daily_columns, daily)
+        await self.db.execute(insert.on_conflict_do_update(
+            index_elements=[DashboardDailyStats.user_id, DashboardDailyStats.day],
+            set_={column: insert.excluded[column] for column in daily_columns[2:]},
+        ))
+        await self.db.execute(delete(DashboardDailyStats).where(
+            DashboardDailyStats.patients_added == 0,
+            DashboardDailyStats.appointments_created == 0,
+            DashboardDailyStats.appointment_revenue == 0,
+            DashboardDailyStats.subscription_revenue == 0,
+        ))
+        await self.db.commit()
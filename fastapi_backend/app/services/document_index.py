@@ -0,0 +1,224 @@
+import asyncio
+import json
+import os
+import shutil
+import time
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import Select, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.appointment import AppointmentDocument
+
+Hit = Tuple[UUID, float]
+
+# Filas de muestra para entrenar los centroides IVF y pasadas de k-means
+IVF_TRAIN_SAMPLE = 50000
+IVF_ITERATIONS = 10
+
+
+async def _documents_in_chunks(db: AsyncSession, batch_size: int, pending_only: bool = False):
+    """(ids, contenidos) de los documentos por lotes, paginando por id."""
+    last_id = None
+    while True:
+        query = select(AppointmentDocument.id, AppointmentDocument.content).order_by(AppointmentDocument.id).limit(batch_size)
+        if last_id is not None:
+            query = query.where(AppointmentDocument.id > last_id)
+        if pending_only:
+            query = query.where(AppointmentDocument.embedding.is_(None))
+        rows = (await db.execute(query)).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield [row.id for row in rows], [row.content for row in rows]
+
+
+class PgVectorDocumentIndex:
+    """Vectores en appointment_documents.embedding; búsqueda por distancia coseno con el índice HNSW."""
+
+    async def search(self, db: AsyncSession, vector: np.ndarray, k: int, scope: Optional[Select] = None) -> List[Hit]:
+        distance = AppointmentDocument.embedding.cosine_distance(vector)
+        query = (
+            select(AppointmentDocument.id, (1 - distance).label("score"))
+            .where(AppointmentDocument.embedding.is_not(None))
+            .order_by(distance)
+            .limit(k)
+        )
+        if scope is not None:
+            query = query.where(AppointmentDocument.id.in_(scope))
+        return [(row.id, float(row.score)) for row in await db.execute(query)]
+
+    async def backfill(self, db: AsyncSession, embedder, batch_size: int) -> int:
+        """Embebe solo los documentos sin vector; un UPDATE por lote y commit por lote."""
+        total = 0
+        async for ids, contents in _documents_in_chunks(db, batch_size, pending_only=True):
+            vectors = await asyncio.to_thread(embedder.embed, contents)
+            await db.execute(update(AppointmentDocument), [
+                {"id": doc_id, "embedding": vector} for doc_id, vector in zip(ids, vectors)
+            ])
+            await db.commit()
+            total += len(ids)
+        return total
+
+
+class _NumpyIndexFiles:
+    """Ficheros .npy de un índice construido, abiertos con mmap (solo lectura)."""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json")) as meta:
+            self.meta = json.load(meta)
+        load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        # (n, dim) float32 normalizados; puede tener filas sobrantes si se borraron documentos durante el backfill
+        self.vectors = load("vectors")[:self.meta["rows"]]
+        self.ids = load("ids")  # (n,) S16: bytes del UUID
+        self.id_order = load("id_order")  # argsort de ids, para localizar filas por id
+        self.centroids = load("centroids") if self.meta["ivf"] else None
+        self.list_offsets = load("list_offsets") if self.meta["ivf"] else None
+
+    def rows_for(self, document_ids: List[UUID]) -> np.ndarray:
+        wanted = np.array([doc_id.bytes for doc_id in document_ids], dtype="S16")
+        positions = np.searchsorted(self.ids, wanted, sorter=self.id_order)
+        positions = np.minimum(positions, len(self.ids) - 1)
+        rows = np.asarray(self.id_order)[positions]
+        return rows[self.ids[rows] == wanted]
+
+
+class NumpyDocumentIndex:
+    """
+    Índice local en EMBEDDING_INDEX_DIR, pensado para desarrollo y tests: los
+    vectores se leen con mmap, así que varios workers comparten las páginas.
+    Búsqueda exacta (fuerza bruta) o IVF a partir de EMBEDDING_IVF_MIN_ROWS.
+    El backfill reconstruye el índice completo y lo sustituye atómicamente; los
+    documentos creados después no aparecen hasta el siguiente backfill.
+    """
+
+    def __init__(self, path: str, ivf_min_rows: int, probes: int):
+        self.path = path
+        self.ivf_min_rows = ivf_min_rows
+        self.probes = probes
+        self._files: Optional[_NumpyIndexFiles] = None
+        self._built_at: Optional[float] = None
+
+    def _load(self) -> Optional[_NumpyIndexFiles]:
+        try:
+            built_at = os.stat(os.path.join(self.path, "meta.json")).st_mtime
+        except FileNotFoundError:
+            return None
+        if built_at != self._built_at:
+            self._files, self._built_at = _NumpyIndexFiles(self.path), built_at
+        return self._files
+
+    async def search(self, db: AsyncSession, vector: np.ndarray, k: int, scope: Optional[Select] = None) -> List[Hit]:
+        files = self._load()
+        if files is None or len(files.ids) == 0:
+            return []
+        rows = None
+        if scope is not None:
+            rows = files.rows_for(list(await db.scalars(scope)))
+        return await asyncio.to_thread(self._search, files, np.asarray(vector, dtype=np.float32), k, rows)
+
+    def _search(self, files: _NumpyIndexFiles, vector: np.ndarray, k: int, rows: Optional[np.ndarray]) -> List[Hit]:
+        if rows is None and files.centroids is not None:
+            # IVF: solo las listas de los `probes` centroides más cercanos (contiguas en disco)
+            lists = np.argsort(files.centroids @ vector)[-self.probes:]
+            rows = np.concatenate([
+                np.arange(files.list_offsets[i], files.list_offsets[i + 1]) for i in lists
+            ])
+        if rows is None:
+            scores = files.vectors @ vector
+            rows = np.arange(len(scores))
+        else:
+            rows = np.sort(rows)
+            scores = files.vectors[rows] @ vector
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(UUID(bytes=files.ids[rows[i]].ljust(16, b"\0")), float(scores[i])) for i in top]
+
+    async def backfill(self, db: AsyncSession, embedder, batch_size: int) -> int:
+        """Embebe todos los documentos por lotes escribiendo directamente en un .npy mapeado."""
+        count = await db.scalar(select(func.count()).select_from(AppointmentDocument))
+        staging = f"{self.path}.building"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        vectors = np.lib.format.open_memmap(
+            os.path.join(staging, "vectors.npy"), mode="w+", dtype=np.float32, shape=(count, embedder.dim)
+        )
+        ids = np.empty(count, dtype="S16")
+        total = 0
+        async for chunk_ids, contents in _documents_in_chunks(db, batch_size):
+            # Documentos creados durante el backfill: se quedan para el siguiente
+            chunk_ids, contents = chunk_ids[:count - total], contents[:count - total]
+            if not chunk_ids:
+                break
+            vectors[total:total + len(chunk_ids)] = await asyncio.to_thread(embedder.embed, contents)
+            ids[total:total + len(chunk_ids)] = [doc_id.bytes for doc_id in chunk_ids]
+            total += len(chunk_ids)
+        await asyncio.to_thread(self._finish, staging, vectors[:total], ids[:total])
+        return total
+
+    def _finish(self, staging: str, vectors: np.ndarray, ids: np.ndarray) -> None:
+        ivf = len(ids) >= self.ivf_min_rows
+        if ivf:
+            centroids, assignments = _train_ivf(vectors, n_lists=int(np.sqrt(len(ids))))
+            order = np.argsort(assignments, kind="stable")
+            np.save(os.path.join(staging, "centroids.npy"), centroids)
+            np.save(os.path.join(staging, "list_offsets.npy"), np.searchsorted(assignments[order], np.arange(len(centroids) + 1)))
+            # Filas reordenadas por lista para que cada lista sea un bloque contiguo
+            ordered = np.lib.format.open_memmap(
+                os.path.join(staging, "vectors.sorted.npy"), mode="w+", dtype=np.float32, shape=vectors.shape
+            )
+            for start in range(0, len(order), IVF_TRAIN_SAMPLE):
+                ordered[start:start + IVF_TRAIN_SAMPLE] = vectors[order[start:start + IVF_TRAIN_SAMPLE]]
+            ordered.flush()
+            del ordered, vectors
+            os.replace(os.path.join(staging, "vectors.sorted.npy"), os.path.join(staging, "vectors.npy"))
+            ids = ids[order]
+        else:
+            vectors.flush()
+        np.save(os.path.join(staging, "ids.npy"), ids)
+        np.save(os.path.join(staging, "id_order.npy"), np.argsort(ids, kind="stable"))
+        with open(os.path.join(staging, "meta.json"), "w") as meta:
+            json.dump({"rows": int(len(ids)), "dim": int(settings.EMBEDDING_DIM), "ivf": ivf, "built_at": time.time()}, meta)
+
+        # Sustitución atómica del directorio: los workers lo recargan al ver el nuevo meta.json
+        previous = f"{self.path}.previous"
+        shutil.rmtree(previous, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.replace(self.path, previous)
+        os.replace(staging, self.path)
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def _train_ivf(vectors: np.ndarray, n_lists: int) -> Tuple[np.ndarray, np.ndarray]:
+    """k-means esférico sobre una muestra; devuelve (centroides, lista de cada fila)."""
+    rng = np.random.default_rng(0)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), min(len(vectors), IVF_TRAIN_SAMPLE), replace=False))])
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+    for _ in range(IVF_ITERATIONS):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        counts = np.bincount(labels, minlength=n_lists)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        filled = counts > 0
+        # Suma de los miembros de cada lista no vacía, normalizada (las vacías conservan su centroide)
+        sums = np.add.reduceat(sample[np.argsort(labels, kind="stable")], starts[filled], axis=0)
+        centroids[filled] = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    assignments = np.concatenate([
+        np.argmax(vectors[start:start + IVF_TRAIN_SAMPLE] @ centroids.T, axis=1)
+        for start in range(0, len(vectors), IVF_TRAIN_SAMPLE)
+    ])
+    return centroids, assignments
+
+
+@lru_cache(maxsize=1)
+def get_document_index():
+    """Índice de documentos del proceso según EMBEDDING_BACKEND."""
+    if settings.EMBEDDING_BACKEND == "pgvector":
+        return PgVectorDocumentIndex()
+    return NumpyDocumentIndex(settings.EMBEDDING_INDEX_DIR, settings.EMBEDDING_IVF_MIN_ROWS, settings.EMBEDDING_IVF_PROBES)
@@ -1,43 +1,51 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import Integer, String, and_, bindparam, exists, func, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as UUIDType, insert
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
+from app.models.business import Business
 from app.models.inventory import Inventory, StockTransfer, StockTransferItem
+from app.models.product import Product
+from app.crud.pagination import paginate
+from app.schemas.bulk import row_error
 from app.schemas.inventory import (
-    InventoryCreate, InventoryUpdate,
+    InventoryCreate, InventoryUpdate, StockCountRow,
     StockTransferCreate, StockTransferUpdate,
     StockTransferItemCreate, StockTransferItemUpdate
 )
+import uuid
 from uuid import UUID
 
 class InventoryService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
     # --- Inventory CRUD ---
-    def get_inventory_item(self, item_id: UUID) -> Inventory | None:
-        return self.db.query(Inventory).filter(Inventory.id == item_id).first()
+    async def get_inventory_item(self, item_id: UUID) -> Inventory | None:
+        return await self.db.scalar(select(Inventory).where(Inventory.id == item_id))
 
-    def get_inventory_item_by_product_and_location(self, product_id: UUID, location_id: UUID) -> Inventory | None:
-        return self.db.query(Inventory).filter(
+    async def get_inventory_item_by_product_and_location(self, product_id: UUID, location_id: UUID) -> Inventory | None:
+        return await self.db.scalar(select(Inventory).where(
             Inventory.product_id == product_id, 
             Inventory.location_id == location_id
-        ).first()
+        ))
 
-    def get_inventory_items(self, skip: int = 0, limit: int = 100) -> list[Inventory]:
-        return self.db.query(Inventory).offset(skip).limit(limit).all()
+    async def get_inventory_items(self, skip: int = 0, limit: int = 100, cursor: str | None = None) -> list[Inventory] | dict:
+        return await paginate(self.db, select(Inventory), Inventory, skip=skip, limit=limit, cursor=cursor)
 
-    def create_inventory_item(self, item_in: InventoryCreate) -> Inventory:
+    async def create_inventory_item(self, item_in: InventoryCreate) -> Inventory:
         db_item = Inventory(
             product_id=item_in.product_id,
             location_id=item_in.location_id,
             quantity=item_in.quantity
         )
         self.db.add(db_item)
-        self.db.commit()
-        self.db.refresh(db_item)
+        await self.db.commit()
+        await self.db.refresh(db_item)
         return db_item
 
-    def update_inventory_item(self, item_id: UUID, item_in: InventoryUpdate) -> Inventory | None:
-        db_item = self.get_inventory_item(item_id)
+    async def update_inventory_item(self, item_id: UUID, item_in: InventoryUpdate) -> Inventory | None:
+        db_item = await self.get_inventory_item(item_id)
         if not db_item:
             return None
         
@@ -46,26 +54,153 @@ class InventoryService:
             setattr(db_item, key, value)
         
         self.db.add(db_item)
-        self.db.commit()
-        self.db.refresh(db_item)
+        await self.db.commit()
+        await self.db.refresh(db_item)
         return db_item
 
-    def delete_inventory_item(self, item_id: UUID) -> Inventory | None:
-        db_item = self.get_inventory_item(item_id)
+    async def delete_inventory_item(self, item_id: UUID) -> Inventory | None:
+        db_item = await self.get_inventory_item(item_id)
         if not db_item:
             return None
-        self.db.delete(db_item)
-        self.db.commit()
+        await self.db.delete(db_item)
+        await self.db.commit()
         return db_item
 
+    async def apply_stock_count(
+        self, location_id: UUID, business_id: UUID, counts: dict[int, StockCountRow],
+        full_count: bool = False, apply: bool = True,
+    ) -> tuple[list[dict], dict[int, list[dict]], bool]:
+        """
+        Concilia un conteo físico de la ubicación con el inventario actual con un número
+        fijo de sentencias, sin importar cuántas filas tenga: un join sobre unnest()
+        resuelve SKU/product_id y lee las cantidades actuales, y un único INSERT ... ON
+        CONFLICT escribe los ajustes. Con full_count los productos de la ubicación que no
+        aparecen en el conteo pasan a 0. Todo o nada: si alguna fila tiene error (o
+        apply=False) no se cambia nada. Devuelve (varianzas, errores por índice, aplicado).
+        """
+        uuid_array = ARRAY(UUIDType(as_uuid=True))
+        # Bloquea el inventario de la ubicación en orden de id, como _apply_stock_transfer
+        await self.db.execute(
+            select(Inventory.id).where(Inventory.location_id == location_id).order_by(Inventory.id).with_for_update()
+        )
+
+        indexes = sorted(counts)
+        counted = func.unnest(
+            bindparam("indexes", indexes, type_=ARRAY(Integer)),
+            bindparam("product_ids", [counts[i].product_id for i in indexes], type_=uuid_array),
+            bindparam("skus", [counts[i].sku for i in indexes], type_=ARRAY(String)),
+        ).table_valued("index", "product_id", "sku").render_derived(name="counted")
+        by_id, by_sku = aliased(Product), aliased(Product)
+        product_id = func.coalesce(by_id.id, by_sku.id)
+        resolved = await self.db.execute(
+            select(
+                counted.c.index,
+                product_id,
+                func.coalesce(by_id.sku, by_sku.sku),
+                func.coalesce(by_id.business_id, by_sku.business_id),
+                Inventory.quantity,
+            )
+            .select_from(counted)
+            .outerjoin(by_id, by_id.id == counted.c.product_id)
+            .outerjoin(by_sku, and_(counted.c.product_id.is_(None), by_sku.sku == counted.c.sku))
+            .outerjoin(Inventory, and_(Inventory.location_id == location_id, Inventory.product_id == product_id))
+            .order_by(counted.c.index)
+        )
+
+        errors: dict[int, list[dict]] = {}
+        latest: dict[UUID, tuple[int, str | None, int | None]] = {}
+        for index, pid, sku, owner, expected in resolved:
+            if pid is None or owner != business_id:
+                loc = ["product_id"] if counts[index].product_id is not None else ["sku"]
+                errors[index] = [row_error(loc, "Product not found in this business", "not_found")]
+                continue
+            if pid in latest:
+                # Como en la importación de productos: gana la última fila de cada producto
+                errors[latest[pid][0]] = [row_error((), f"Product counted again at row {index}", "duplicate")]
+            latest[pid] = (index, sku, expected)
+
+        variances = []
+        changes: dict[UUID, int] = {}
+        for pid, (index, sku, expected) in latest.items():
+            quantity = counts[index].quantity
+            if expected is None or quantity != expected:
+                changes[pid] = quantity
+            if quantity != (expected or 0):
+                variances.append({
+                    "index": index, "product_id": pid, "sku": sku,
+                    "expected": expected or 0, "counted": quantity, "variance": quantity - (expected or 0),
+                })
+
+        if full_count:
+            counted_ids = func.unnest(
+                bindparam("counted_ids", list(latest), type_=uuid_array)
+            ).table_valued("product_id").render_derived(name="counted_ids")
+            uncounted = and_(
+                Inventory.location_id == location_id,
+                Inventory.quantity != 0,
+                ~exists().where(counted_ids.c.product_id == Inventory.product_id),
+            )
+            missing = await self.db.execute(
+                select(Inventory.product_id, Product.sku, Inventory.quantity)
+                .join(Product, Product.id == Inventory.product_id)
+                .where(uncounted)
+                .order_by(Product.sku)
+            )
+            variances.extend(
+                {"index": None, "product_id": pid, "sku": sku, "expected": expected, "counted": 0, "variance": -expected}
+                for pid, sku, expected in missing
+            )
+
+        if errors or not apply:
+            await self.db.rollback()
+            return variances, errors, False
+
+        if changes:
+            adjustments = func.unnest(
+                bindparam("adjusted_ids", list(changes), type_=uuid_array),
+                bindparam("quantities", list(changes.values()), type_=ARRAY(Integer)),
+            ).table_valued("product_id", "quantity").render_derived(name="adjustments")
+            stmt = insert(Inventory).from_select(
+                ["id", "product_id", "location_id", "quantity"],
+                select(
+                    func.gen_random_uuid(),
+                    adjustments.c.product_id,
+                    literal(location_id, type_=Inventory.location_id.type),
+                    adjustments.c.quantity,
+                ),
+            )
+            await self.db.execute(stmt.on_conflict_do_update(
+                index_elements=[Inventory.product_id, Inventory.location_id],
+                set_={"quantity": stmt.excluded.quantity, "updated_at": func.now()},
+            ))
+        if full_count:
+            await self.db.execute(
+                update(Inventory).where(uncounted).values(quantity=0, updated_at=func.now())
+                .execution_options(synchronize_session=False)
+            )
+        await self.db.commit()
+        return variances, errors, True
+
     # --- StockTransfer CRUD ---
-    def get_stock_transfer(self, transfer_id: UUID) -> StockTransfer | None:
-        return self.db.query(StockTransfer).filter(StockTransfer.id == transfer_id).first()
+    async def get_stock_transfer(self, transfer_id: UUID) -> StockTransfer | None:
+        return await self.db.scalar(select(StockTransfer).where(StockTransfer.id == transfer_id))
+
+    async def get_stock_transfers(
+        self, skip: int = 0, limit: int = 100, cursor: str | None = None, owner_id: UUID | None = None
+    ) -> list[StockTransfer] | dict:
+        """Todas las transferencias, o solo las de los negocios de `owner_id`."""
+        query = select(StockTransfer)
+        if owner_id is not None:
+            query = query.where(StockTransfer.business_id.in_(select(Business.id).where(Business.owner_id == owner_id)))
+        return await paginate(self.db, query, StockTransfer, skip=skip, limit=limit, cursor=cursor)
 
-    def get_stock_transfers(self, skip: int = 0, limit: int = 100) -> list[StockTransfer]:
-        return self.db.query(StockTransfer).offset(skip).limit(limit).all()
+    async def get_stock_transfer_businesses(self, transfer_ids: set[UUID]) -> dict[UUID, UUID]:
+        """Negocio de cada transferencia existente de `transfer_ids`, en una consulta."""
+        return dict((await self.db.execute(
+            select(StockTransfer.id, StockTransfer.business_id).where(StockTransfer.id.in_(transfer_ids))
+        )).all())
 
-    def create_stock_transfer(self, transfer_in: StockTransferCreate) -> StockTransfer:
+    async def create_stock_transfer(self, transfer_in: StockTransferCreate) -> StockTransfer:
         db_transfer = StockTransfer(
             business_id=transfer_in.business_id,
             from_location_id=transfer_in.from_location_id,
@@ -74,83 +209,175 @@ class InventoryService:
             notes=transfer_in.notes
         )
         self.db.add(db_transfer)
-        self.db.commit()
-        self.db.refresh(db_transfer)
+        await self.db.commit()
+        await self.db.refresh(db_transfer)
         return db_transfer
 
-    def update_stock_transfer(self, transfer_id: UUID, transfer_in: StockTransferUpdate) -> StockTransfer | None:
-        db_transfer = self.get_stock_transfer(transfer_id)
+    async def update_stock_transfer(self, transfer_id: UUID, transfer_in: StockTransferUpdate) -> StockTransfer | None:
+        db_transfer = await self.get_stock_transfer(transfer_id)
         if not db_transfer:
             return None
 
         update_data = transfer_in.model_dump(exclude_unset=True)
         
         if update_data.get("status") == "completed" and db_transfer.status != "completed":
-            print(f"--- PROCESSING TRANSFER {transfer_id} ---")
-            transfer_items = self.get_stock_transfer_items(transfer_id=transfer_id)
-            if not transfer_items:
-                raise HTTPException(status_code=404, detail="No items found for this transfer.")
-
-            for item in transfer_items:
-                print(f"  - Processing item {item.product_id}, quantity {item.quantity}")
-                from_inventory = self.get_inventory_item_by_product_and_location(item.product_id, db_transfer.from_location_id)
-                
-                if not from_inventory or from_inventory.quantity < item.quantity:
-                    self.db.rollback()
-                    raise HTTPException(status_code=400, detail=f"Insufficient stock for product {item.product_id}")
-                
-                print(f"    - Source inventory (before): {from_inventory.quantity}")
-                from_inventory.quantity -= item.quantity
-                print(f"    - Source inventory (after): {from_inventory.quantity}")
-                self.db.add(from_inventory)
-
-                to_inventory = self.get_inventory_item_by_product_and_location(item.product_id, db_transfer.to_location_id)
-                if to_inventory:
-                    print(f"    - Destination inventory (before): {to_inventory.quantity}")
-                    to_inventory.quantity += item.quantity
-                    print(f"    - Destination inventory (after): {to_inventory.quantity}")
-                    self.db.add(to_inventory)
-                else:
-                    print(f"    - Destination inventory not found. Creating with quantity {item.quantity}")
-                    new_inventory_item = Inventory(product_id=item.product_id, location_id=db_transfer.to_location_id, quantity=item.quantity)
-                    self.db.add(new_inventory_item)
+            # Bloquea la transferencia y re-lee su estado: dos completados concurrentes no pueden pasar ambos
+            db_transfer = await self.db.scalar(
+                select(StockTransfer).where(StockTransfer.id == transfer_id)
+                .with_for_update().execution_options(populate_existing=True)
+            )
+            if db_transfer.status != "completed":
+                await self._apply_stock_transfer(db_transfer)
 
         for key, value in update_data.items():
             setattr(db_transfer, key, value)
         
         self.db.add(db_transfer)
-        self.db.commit()
-        self.db.refresh(db_transfer)
+        await self.db.commit()
+        await self.db.refresh(db_transfer)
         return db_transfer
 
-    def delete_stock_transfer(self, transfer_id: UUID) -> StockTransfer | None:
-        db_transfer = self.get_stock_transfer(transfer_id)
+    async def _apply_stock_transfer(self, db_transfer: StockTransfer) -> None:
+        """
+        Mueve el stock de todas las líneas de la transferencia con un número fijo de
+        sentencias, sin importar cuántas líneas tenga. Debe llamarse con la fila de la
+        transferencia bloqueada; el commit lo hace quien llama.
+        """
+        product_ids = select(StockTransferItem.product_id).where(StockTransferItem.transfer_id == db_transfer.id)
+        totals = (
+            select(StockTransferItem.product_id, func.sum(StockTransferItem.quantity).label("quantity"))
+            .where(StockTransferItem.transfer_id == db_transfer.id)
+            .group_by(StockTransferItem.product_id)
+            .subquery()
+        )
+        if not await self.db.scalar(select(product_ids.exists())):
+            await self.db.rollback()
+            raise HTTPException(status_code=404, detail="No items found for this transfer.")
+
+        # Bloquea origen y destino en orden de id para que transferencias cruzadas no hagan deadlock
+        locked = (
+            select(Inventory.id)
+            .where(
+                Inventory.location_id.in_([db_transfer.from_location_id, db_transfer.to_location_id]),
+                Inventory.product_id.in_(product_ids),
+            )
+            .order_by(Inventory.id)
+            .with_for_update()
+            .subquery()
+        )
+        await self.db.execute(select(func.count()).select_from(locked))
+
+        source = aliased(Inventory)
+        shortage = await self.db.scalar(
+            select(totals.c.product_id)
+            .outerjoin(source, and_(
+                source.product_id == totals.c.product_id,
+                source.location_id == db_transfer.from_location_id,
+            ))
+            .where(func.coalesce(source.quantity, 0) < totals.c.quantity)
+            .order_by(totals.c.product_id)
+            .limit(1)
+        )
+        if shortage is not None:
+            await self.db.rollback()
+            raise HTTPException(status_code=400, detail=f"Insufficient stock for product {shortage}")
+
+        await self.db.execute(
+            update(Inventory)
+            .where(
+                Inventory.location_id == db_transfer.from_location_id,
+                Inventory.product_id == totals.c.product_id,
+            )
+            .values(quantity=Inventory.quantity - totals.c.quantity, updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+
+        incoming = insert(Inventory).from_select(
+            ["id", "product_id", "location_id", "quantity"],
+            select(
+                func.gen_random_uuid(),
+                totals.c.product_id,
+                literal(db_transfer.to_location_id, type_=Inventory.location_id.type),
+                totals.c.quantity,
+            ).order_by(totals.c.product_id),
+        )
+        await self.db.execute(
+            incoming.on_conflict_do_update(
+                index_elements=[Inventory.product_id, Inventory.location_id],
+                set_={"quantity": Inventory.quantity + incoming.excluded.quantity, "updated_at": func.now()},
+            )
+        )
+
+    async def delete_stock_transfer(self, transfer_id: UUID) -> StockTransfer | None:
+        db_transfer = await self.get_stock_transfer(transfer_id)
         if not db_transfer:
             return None
-        self.db.delete(db_transfer)
-        self.db.commit()
+        await self.db.delete(db_transfer)
+        await self.db.commit()
         return db_transfer
 
     # --- StockTransferItem CRUD ---
-    def get_stock_transfer_item(self, item_id: UUID) -> StockTransferItem | None:
-        return self.db.query(StockTransferItem).filter(StockTransferItem.id == item_id).first()
+    async def get_stock_transfer_item(self, item_id: UUID) -> StockTransferItem | None:
+        return await self.db.scalar(select(StockTransferItem).where(StockTransferItem.id == item_id))
 
-    def get_stock_transfer_items(self, transfer_id: UUID, skip: int = 0, limit: int = 100) -> list[StockTransferItem]:
-        return self.db.query(StockTransferItem).filter(StockTransferItem.transfer_id == transfer_id).offset(skip).limit(limit).all()
+    async def get_stock_transfer_items(self, transfer_id: UUID, skip: int = 0, limit: int = 100) -> list[StockTransferItem]:
+        result = await self.db.scalars(
+            select(StockTransferItem).where(StockTransferItem.transfer_id == transfer_id).offset(skip).limit(limit)
+        )
+        return list(result)
 
-    def create_stock_transfer_item(self, item_in: StockTransferItemCreate) -> StockTransferItem:
+    async def create_stock_transfer_item(self, item_in: StockTransferItemCreate) -> StockTransferItem:
         db_item = StockTransferItem(
             transfer_id=item_in.transfer_id,
             product_id=item_in.product_id,
             quantity=item_in.quantity
         )
         self.db.add(db_item)
-        self.db.commit()
-        self.db.refresh(db_item)
+        await self.db.commit()
+        await self.db.refresh(db_item)
         return db_item
 
-    def update_stock_transfer_item(self, item_id: UUID, item_in: StockTransferItemUpdate) -> StockTransferItem | None:
-        db_item = self.get_stock_transfer_item(item_id)
+    async def create_stock_transfer_items_bulk(
+        self, items_in: dict[int, StockTransferItemCreate]
+    ) -> tuple[dict[int, UUID], dict[int, list[dict]]]:
+        """
+        Inserta muchas líneas con un INSERT multi-fila (en lotes de insertmanyvalues) y
+        un solo commit. Las filas cuya transferencia no existe o ya está completada, o
+        cuyo producto no existe, se devuelven como errores sin abortar el resto.
+        Entrada y salida van indexadas por la posición de la fila en la petición.
+        """
+        transfer_status = dict((await self.db.execute(
+            select(StockTransfer.id, StockTransfer.status)
+            .where(StockTransfer.id.in_({item.transfer_id for item in items_in.values()}))
+        )).all())
+        known_products = set(await self.db.scalars(
+            select(Product.id).where(Product.id.in_({item.product_id for item in items_in.values()}))
+        ))
+
+        created: dict[int, UUID] = {}
+        errors: dict[int, list[dict]] = {}
+        rows = []
+        for index, item in items_in.items():
+            row_errors = []
+            if item.transfer_id not in transfer_status:
+                row_errors.append(row_error(["transfer_id"], "Stock transfer not found", "not_found"))
+            elif transfer_status[item.transfer_id] == "completed":
+                row_errors.append(row_error(["transfer_id"], "Stock transfer is already completed", "conflict"))
+            if item.product_id not in known_products:
+                row_errors.append(row_error(["product_id"], "Product not found", "not_found"))
+            if row_errors:
+                errors[index] = row_errors
+                continue
+            created[index] = uuid.uuid4()
+            rows.append({"id": created[index], **item.model_dump()})
+
+        if rows:
+            await self.db.execute(insert(StockTransferItem), rows)
+            await self.db.commit()
+        return created, errors
+
+    async def update_stock_transfer_item(self, item_id: UUID, item_in: StockTransferItemUpdate) -> StockTransferItem | None:
+        db_item = await self.get_stock_transfer_item(item_id)
         if not db_item:
             return None
         
@@ -159,14 +386,14 @@ class InventoryService:
             setattr(db_item, key, value)
         
         self.db.add(db_item)
-        self.db.commit()
-        self.db.refresh(db_item)
+        await self.db.commit()
+        await self.db.refresh(db_item)
         return db_item
 
-    def delete_stock_transfer_item(self, item_id: UUID) -> StockTransferItem | None:
-        db_item = self.get_stock_transfer_item(item_id)
+    async def delete_stock_transfer_item(self, item_id: UUID) -> StockTransferItem | None:
+        db_item = await self.get_stock_transfer_item(item_id)
         if not db_item:
             return None
-        self.db.delete(db_item)
-        self.db.commit()
+        await self.db.delete(db_item)
+        await self.db.commit()
         return db_item
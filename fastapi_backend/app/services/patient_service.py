@@ -1,65 +1,74 @@
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from typing import List, Optional
 from sqlalchemy import or_
 
 from app.models.patient import Patient
+from app.crud.pagination import paginate
+from app.services.dashboard_service import DashboardService
 from app.schemas.patient import PatientCreateInternal, PatientUpdate
 
 class PatientService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def get_patient(self, patient_id: UUID):
-        return self.db.query(Patient).filter(Patient.id == patient_id).first()
+    async def get_patient(self, patient_id: UUID):
+        return await self.db.scalar(select(Patient).where(Patient.id == patient_id))
 
-    def get_patients(self, skip: int = 0, limit: int = 100):
-        return self.db.query(Patient).offset(skip).limit(limit).all()
+    async def get_patients(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+        return await paginate(self.db, select(Patient), Patient, skip=skip, limit=limit, cursor=cursor)
 
-    def get_patients_by_user(self, user_id: UUID, skip: int = 0, limit: int = 100):
-        return self.db.query(Patient).filter(Patient.user_id == user_id).offset(skip).limit(limit).all()
+    async def get_patients_by_user(self, user_id: UUID, skip: int = 0, limit: int = 100):
+        result = await self.db.scalars(
+            select(Patient).where(Patient.user_id == user_id).offset(skip).limit(limit)
+        )
+        return list(result)
 
-    def search_patients(self, search_term: str):
-        return self.db.query(Patient).filter(
+    async def search_patients(self, search_term: str):
+        result = await self.db.scalars(select(Patient).where(
             or_(
                 Patient.first_name.ilike(f"%{search_term}%"),
                 Patient.last_name.ilike(f"%{search_term}%"),
                 Patient.email.ilike(f"%{search_term}%")
             )
-        ).all()
+        ))
+        return list(result)
 
-    def create_patient(self, patient_in: PatientCreateInternal):
+    async def create_patient(self, patient_in: PatientCreateInternal):
         db_patient = Patient(**patient_in.model_dump())
         self.db.add(db_patient)
-        self.db.commit()
-        self.db.refresh(db_patient)
+        await DashboardService(self.db).record_patient_added(db_patient)
+        await self.db.commit()
+        await self.db.refresh(db_patient)
         return db_patient
 
-    def update_patient(self, patient_id: UUID, patient_in: PatientUpdate):
-        db_patient = self.get_patient(patient_id)
+    async def update_patient(self, patient_id: UUID, patient_in: PatientUpdate):
+        db_patient = await self.get_patient(patient_id)
         if not db_patient:
             return None
         update_data = patient_in.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_patient, key, value)
         self.db.add(db_patient)
-        self.db.commit()
-        self.db.refresh(db_patient)
+        await self.db.commit()
+        await self.db.refresh(db_patient)
         return db_patient
 
-    def delete_patient(self, patient_id: UUID):
-        db_patient = self.get_patient(patient_id)
+    async def delete_patient(self, patient_id: UUID):
+        db_patient = await self.get_patient(patient_id)
         if not db_patient:
             return None
-        self.db.delete(db_patient)
-        self.db.commit()
+        await DashboardService(self.db).record_patient_removed(db_patient)
+        await self.db.delete(db_patient)
+        await self.db.commit()
         return db_patient
 
-    def get_patient_medical_history(self, patient_id: UUID):
+    async def get_patient_medical_history(self, patient_id: UUID):
         # Por ahora devolvemos un historial básico
         # En el futuro esto podría incluir citas, recetas, etc.
-        patient = self.get_patient(patient_id)
+        patient = await self.get_patient(patient_id)
         if not patient:
             return None
         
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Callable, Iterator, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import Float, String, bindparam, func, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as UUIDType, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.bulk import iter_file_rows
+from app.core.config import settings
+from app.models.product import Product, ProductImport
+from app.schemas.bulk import row_error, validate_rows
+from app.schemas.product import ProductImportRow
+
+logger = logging.getLogger(__name__)
+
+
+def _read_chunk(rows: Iterator[Tuple[int, Any]], size: int) -> Tuple[int, dict, dict]:
+    """Lee y valida hasta `size` filas: (filas leídas, válidas por índice, errores por índice)."""
+    valid, errors = validate_rows(islice(rows, size), ProductImportRow)
+    return len(valid) + len(errors), valid, errors
+
+
+class ProductImportService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create_import(self, business_id: UUID, user_id: Optional[UUID] = None) -> ProductImport:
+        job = ProductImport(business_id=business_id, user_id=user_id, status="pending", errors=[])
+        self.db.add(job)
+        await self.db.commit()
+        await self.db.refresh(job)
+        return job
+
+    async def get_import(self, import_id: UUID) -> ProductImport | None:
+        return await self.db.scalar(select(ProductImport).where(ProductImport.id == import_id))
+
+    async def upsert_products(
+        self, business_id: UUID, rows: dict[int, ProductImportRow]
+    ) -> tuple[int, int, dict[int, list[dict]]]:
+        """
+        INSERT ... ON CONFLICT (sku) DO UPDATE de las filas del negocio. Un SKU de otro
+        negocio no se toca y la fila se devuelve como error. Devuelve (creados, actualizados, errores por índice); no hace commit.
+        """
+        errors: dict[int, list[dict]] = {}
+        index_by_sku: dict[str, int] = {}
+        for index, row in rows.items():
+            if row.sku in index_by_sku:
+                # Dentro de un mismo lote gana la última aparición del SKU
+                errors[index_by_sku[row.sku]] = [row_error(["sku"], f"SKU repeated at row {index}", "duplicate")]
+            index_by_sku[row.sku] = index
+        if not index_by_sku:
+            return 0, 0, errors
+
+        # Un único INSERT ... SELECT FROM unnest(arrays) por lote: una ida y vuelta y un solo plan
+        products = [rows[index] for index in index_by_sku.values()]
+        source = func.unnest(
+            bindparam("skus", [row.sku for row in products], type_=ARRAY(String)),
+            bindparam("names", [row.name for row in products], type_=ARRAY(String)),
+            bindparam("descriptions", [row.description for row in products], type_=ARRAY(String)),
+            bindparam("prices", [row.price for row in products], type_=ARRAY(Float)),
+        ).table_valued("sku", "name", "description", "price").render_derived(name="source")
+        stmt = pg_insert(Product.__table__).from_select(
+            ["id", "business_id", "sku", "name", "description", "price"],
+            select(
+                func.gen_random_uuid(), literal(business_id, UUIDType(as_uuid=True)),
+                source.c.sku, source.c.name, source.c.description, source.c.price,
+            ),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Product.sku],
+            set_={
+                "name": stmt.excluded.name,
+                "description": stmt.excluded.description,
+                "price": stmt.excluded.price,
+                "updated_at": func.now(),
+            },
+            where=Product.business_id == stmt.excluded.business_id,
+        ).returning(Product.sku, literal_column("xmax = 0").label("inserted"))
+        result = await self.db.execute(stmt)
+        created = updated = 0
+        for sku, inserted in result:
+            if inserted:
+                created += 1
+            else:
+                updated += 1
+            del index_by_sku[sku]
+        for index in index_by_sku.values():
+            errors[index] = [row_error(["sku"], "SKU already belongs to another business", "conflict")]
+        return created, updated, errors
+
+    async def run_import(
+        self, import_id: UUID, path: str, format: str, on_progress: Optional[Callable[[ProductImport], None]] = None
+    ) -> ProductImport:
+        """
+        Procesa el fichero por lotes de IMPORT_CHUNK_SIZE: valida, hace el upsert y
+        guarda el progreso en la misma transacción, así que un fallo a mitad deja
+        aplicados (y contados) los lotes anteriores.
+        """
+        job = await self.get_import(import_id)
+        job.status = "running"
+        await self.db.commit()
+        rows = iter_file_rows(path, format)
+        # El siguiente lote se lee y valida en un hilo mientras Postgres procesa el actual
+        pending = asyncio.ensure_future(asyncio.to_thread(_read_chunk, rows, settings.IMPORT_CHUNK_SIZE))
+        try:
+            while True:
+                count, valid, errors = await pending
+                if not count:
+                    break
+                pending = asyncio.ensure_future(asyncio.to_thread(_read_chunk, rows, settings.IMPORT_CHUNK_SIZE))
+                created, updated, upsert_errors = await self.upsert_products(job.business_id, valid)
+                errors.update(upsert_errors)
+
+                job.rows_processed += count
+                job.created_count += created
+                job.updated_count += updated
+                job.error_count += len(errors)
+                room = settings.IMPORT_MAX_REPORTED_ERRORS - len(job.errors)
+                if errors and room > 0:
+                    job.errors = job.errors + [
+                        {"index": index, "errors": errs} for index, errs in sorted(errors.items())[:room]
+                    ]
+                await self.db.commit()
+                if on_progress:
+                    on_progress(job)
+            job.status = "completed"
+        except Exception as exc:
+            pending.cancel()
+            logger.exception("Product import %s failed", import_id)
+            await self.db.rollback()
+            job = await self.get_import(import_id)
+            job.status = "failed"
+            job.detail = str(exc)
+        job.finished_at = datetime.now(timezone.utc)
+        await self.db.commit()
+        return job
@@ -1,27 +1,32 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.product import Product
+from app.crud.pagination import paginate
 from app.schemas.product import ProductCreate, ProductUpdate
 from uuid import UUID
 
 class ProductService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def get_product(self, product_id: UUID) -> Product | None:
-        return self.db.query(Product).filter(Product.id == product_id).first()
+    async def get_product(self, product_id: UUID) -> Product | None:
+        return await self.db.scalar(select(Product).where(Product.id == product_id))
 
-    def get_products_by_business(self, business_id: UUID, skip: int = 0, limit: int = 100) -> list[Product]:
-        return self.db.query(Product).filter(Product.business_id == business_id).offset(skip).limit(limit).all()
+    async def get_products_by_business(
+        self, business_id: UUID, skip: int = 0, limit: int = 100, cursor: str | None = None
+    ) -> list[Product] | dict:
+        query = select(Product).where(Product.business_id == business_id)
+        return await paginate(self.db, query, Product, skip=skip, limit=limit, cursor=cursor)
 
-    def create_product(self, product_in: ProductCreate) -> Product:
+    async def create_product(self, product_in: ProductCreate) -> Product:
         db_product = Product(**product_in.model_dump())
         self.db.add(db_product)
-        self.db.commit()
-        self.db.refresh(db_product)
+        await self.db.commit()
+        await self.db.refresh(db_product)
         return db_product
 
-    def update_product(self, product_id: UUID, product_in: ProductUpdate) -> Product | None:
-        db_product = self.get_product(product_id)
+    async def update_product(self, product_id: UUID, product_in: ProductUpdate) -> Product | None:
+        db_product = await self.get_product(product_id)
         if not db_product:
             return None
         
@@ -30,14 +35,14 @@ class ProductService:
             setattr(db_product, key, value)
         
         self.db.add(db_product)
-        self.db.commit()
-        self.db.refresh(db_product)
+        await self.db.commit()
+        await self.db.refresh(db_product)
         return db_product
 
-    def delete_product(self, product_id: UUID) -> Product | None:
-        db_product = self.get_product(product_id)
+    async def delete_product(self, product_id: UUID) -> Product | None:
+        db_product = await self.get_product(product_id)
         if not db_product:
             return None
-        self.db.delete(db_product)
-        self.db.commit()
+        await self.db.delete(db_product)
+        await self.db.commit()
         return db_product
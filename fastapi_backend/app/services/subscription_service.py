@@ -1,65 +1,94 @@
-from sqlalchemy.orm import Session
-from app.models.subscription import SubscriptionProduct, Price, Subscription
-from app.schemas.subscription import SubscriptionProductCreate, PriceCreate, SubscriptionCreate, SubscriptionUpdate
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud.pagination import paginate
+from app.db.loading import loader_options
+from app.models.subscription import SubscriptionProduct, Price, Subscription, SubscriptionStatus
+from app.schemas.subscription import (
+    SubscriptionProductCreate, PriceCreate, SubscriptionCreate, SubscriptionUpdate,
+    SubscriptionProductResponse, PriceResponse,
+)
+from app.services.dashboard_service import DashboardService
 from uuid import UUID
 from typing import List, Optional
 
 class SubscriptionService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
     # --- SubscriptionProduct CRUD ---
-    def get_subscription_product(self, product_id: str) -> SubscriptionProduct | None:
-        return self.db.query(SubscriptionProduct).filter(SubscriptionProduct.id == product_id).first()
+    async def get_subscription_product(self, product_id: str) -> SubscriptionProduct | None:
+        return await self.db.scalar(
+            select(SubscriptionProduct)
+            .options(*loader_options(SubscriptionProductResponse))
+            .where(SubscriptionProduct.id == product_id)
+        )
 
-    def get_subscription_products(self, skip: int = 0, limit: int = 100) -> list[SubscriptionProduct]:
-        return self.db.query(SubscriptionProduct).offset(skip).limit(limit).all()
+    async def get_subscription_products(
+        self, skip: int = 0, limit: int = 100, cursor: str | None = None
+    ) -> list[SubscriptionProduct] | dict:
+        query = select(SubscriptionProduct).options(*loader_options(SubscriptionProductResponse))
+        return await paginate(self.db, query, SubscriptionProduct, skip=skip, limit=limit, cursor=cursor)
 
-    def create_subscription_product(self, product_in: SubscriptionProductCreate) -> SubscriptionProduct:
+    async def create_subscription_product(self, product_in: SubscriptionProductCreate) -> SubscriptionProduct:
         db_product = SubscriptionProduct(**product_in.model_dump())
         self.db.add(db_product)
-        self.db.commit()
-        self.db.refresh(db_product)
-        return db_product
+        await self.db.commit()
+        return await self.get_subscription_product(db_product.id)
 
     # --- Price CRUD ---
-    def get_price(self, price_id: str) -> Price | None:
-        return self.db.query(Price).filter(Price.id == price_id).first()
+    async def get_price(self, price_id: str) -> Price | None:
+        return await self.db.scalar(select(Price).where(Price.id == price_id))
 
-    def get_prices(self, skip: int = 0, limit: int = 100) -> list[Price]:
-        return self.db.query(Price).offset(skip).limit(limit).all()
+    async def get_prices(self, skip: int = 0, limit: int = 100, cursor: str | None = None) -> list[Price] | dict:
+        query = select(Price).options(*loader_options(PriceResponse))
+        return await paginate(self.db, query, Price, skip=skip, limit=limit, cursor=cursor)
 
-    def create_price(self, price_in: PriceCreate) -> Price:
+    async def create_price(self, price_in: PriceCreate) -> Price:
         db_price = Price(**price_in.model_dump())
         self.db.add(db_price)
-        self.db.commit()
-        self.db.refresh(db_price)
+        await self.db.commit()
+        await self.db.refresh(db_price)
         return db_price
 
     # --- Subscription CRUD ---
-    def get_subscription(self, subscription_id: str) -> Subscription | None:
-        return self.db.query(Subscription).filter(Subscription.id == subscription_id).first()
+    async def get_subscription(self, subscription_id: str) -> Subscription | None:
+        return await self.db.scalar(select(Subscription).where(Subscription.id == subscription_id))
 
-    def get_subscriptions_by_user(self, user_id: UUID, skip: int = 0, limit: int = 100) -> List[Subscription]:
-        return self.db.query(Subscription).filter(Subscription.user_id == user_id).offset(skip).limit(limit).all()
+    async def get_subscriptions_by_user(
+        self, user_id: UUID, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+    ) -> List[Subscription] | dict:
+        query = select(Subscription).where(Subscription.user_id == user_id)
+        return await paginate(self.db, query, Subscription, skip=skip, limit=limit, cursor=cursor)
 
-    def update_subscription(self, subscription_id: UUID, subscription_in: SubscriptionUpdate, user_id: UUID) -> Optional[Subscription]:
-        subscription = self.db.query(Subscription).filter(Subscription.id == subscription_id, Subscription.user_id == user_id).first()
+    async def update_subscription(self, subscription_id: UUID, subscription_in: SubscriptionUpdate, user_id: UUID) -> Optional[Subscription]:
+        subscription = await self.db.scalar(
+            select(Subscription).where(Subscription.id == subscription_id, Subscription.user_id == user_id)
+        )
         if not subscription:
             return None
         
+        was_active = _is_active(subscription.status)
         update_data = subscription_in.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(subscription, key, value)
+        if _is_active(subscription.status) and not was_active:
+            await DashboardService(self.db).record_subscription_payment(subscription.price_id, subscription.quantity)
             
         self.db.add(subscription)
-        self.db.commit()
-        self.db.refresh(subscription)
+        await self.db.commit()
+        await self.db.refresh(subscription)
         return subscription
 
-    def create_subscription(self, subscription_in: SubscriptionCreate) -> Subscription:
+    async def create_subscription(self, subscription_in: SubscriptionCreate) -> Subscription:
         db_subscription = Subscription(**subscription_in.model_dump())
         self.db.add(db_subscription)
-        self.db.commit()
-        self.db.refresh(db_subscription)
+        if _is_active(db_subscription.status):
+            await DashboardService(self.db).record_subscription_payment(db_subscription.price_id, db_subscription.quantity)
+        await self.db.commit()
+        await self.db.refresh(db_subscription)
         return db_subscription
+
+
+def _is_active(status) -> bool:
+    # El estado llega como str desde los schemas y como enum desde la base de datos
+    return status in (SubscriptionStatus.active, SubscriptionStatus.active.value)
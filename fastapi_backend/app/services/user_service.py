@@ -1,44 +1,94 @@
-from sqlalchemy.orm import Session
+import copy
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 from sqlalchemy.exc import IntegrityError
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate, UserRole # Import UserRole
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash_async, verify_password_async
 from uuid import UUID
 from app.services.customer_service import CustomerService
 from app.schemas.customer import CustomerCreate
-from typing import Optional
+from typing import Any, Optional
 from app.crud.base import CRUDBase
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# Column snapshots of recently authenticated users, keyed by str(user.id)
+identity_cache = TTLCache(maxsize=settings.IDENTITY_CACHE_MAX_SIZE, ttl=settings.IDENTITY_CACHE_TTL)
 
 class UserService(CRUDBase[User, UserCreate, UserUpdate]):
-    def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
-        return db.query(User).filter(User.email == email).first()
+    async def get_cached(self, db: AsyncSession, *, id: Any) -> Optional[User]:
+        """
+        Like `get`, but served from the identity cache when possible. A hit
+        attaches a fresh instance to `db` without emitting a SELECT.
+        """
+        snapshot = identity_cache.get(str(id))
+        if snapshot is not None:
+            user = User(**copy.deepcopy(snapshot))
+            make_transient_to_detached(user)
+            db.add(user)
+            return user
+        user = await self.get(db, id=id)
+        if user is not None:
+            identity_cache.set(str(user.id), {
+                attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs
+            })
+        return user
+
+    def invalidate_identity(self, user_id: Any) -> None:
+        identity_cache.invalidate(str(user_id))
+
+    async def get_by_email(self, db: AsyncSession, *, email: str) -> Optional[User]:
+        return await db.scalar(select(User).where(User.email == email))
 
-    def create(self, db: Session, *, obj_in: UserCreate) -> User:
+    async def authenticate(self, db: AsyncSession, *, email: str, password: str) -> Optional[User]:
+        """Check credentials, re-hashing the password if BCRYPT_ROUNDS changed since it was stored."""
+        user = await self.get_by_email(db, email=email)
+        if not user:
+            return None
+        valid, new_hash = await verify_password_async(password, user.hashed_password)
+        if not valid:
+            return None
+        if new_hash:
+            user.hashed_password = new_hash
+            await db.commit()
+            self.invalidate_identity(user.id)
+        return user
+
+    async def create(self, db: AsyncSession, *, obj_in: UserCreate) -> User:
         db_obj = User(
             email=obj_in.email,
-            hashed_password=get_password_hash(obj_in.password),
+            hashed_password=await get_password_hash_async(obj_in.password),
             first_name=obj_in.first_name,
             last_name=obj_in.last_name,
         )
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
         return db_obj
 
-    def update(self, db: Session, *, db_obj: User, obj_in: UserUpdate) -> User:
+    async def update(self, db: AsyncSession, *, db_obj: User, obj_in: UserUpdate) -> User:
         """Update user with proper password handling"""
         update_data = obj_in.dict(exclude_unset=True)
         
         # Handle password hashing if password is being updated
         if "password" in update_data and update_data["password"]:
-            update_data["hashed_password"] = get_password_hash(update_data["password"])
+            update_data["hashed_password"] = await get_password_hash_async(update_data["password"])
             del update_data["password"]
         
         # Remove hashed_password from update_data if it's not being set
         if "hashed_password" not in update_data:
             update_data.pop("hashed_password", None)
         
-        return super().update(db, db_obj=db_obj, obj_in=update_data)
+        user = await super().update(db, db_obj=db_obj, obj_in=update_data)
+        self.invalidate_identity(user.id)
+        return user
+
+    async def remove(self, db: AsyncSession, *, id: Any) -> User:
+        user = await super().remove(db, id=id)
+        self.invalidate_identity(id)
+        return user
 
     def is_active(self, user: User) -> bool:
         return True # Implement logic for user activation status if needed
@@ -0,0 +1,77 @@
+"""
+Microbenchmark del parseo de bodies: el antiguo parse_request_data de los
+endpoints (request.json()/form() + Model(**data)) frente a app.api.body.parse_body
+(validación desde los bytes), con el body de un producto en JSON, form y msgpack.
+Los Request se construyen en memoria, sin servidor.
+
+    cd fastapi_backend
+    python -m benchmarks.bench_body_parser --iterations 20000
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from urllib.parse import urlencode
+
+from starlette.requests import Request
+
+import app.main  # noqa: F401  registra todos los modelos
+from app.api.body import parse_body
+from app.schemas.business import BusinessCreate
+from app.schemas.product import ProductCreate
+
+
+async def legacy_parse_request_data(request: Request, model_class):
+    """Copia del helper que estaba duplicado en los módulos de endpoints."""
+    ct = (request.headers.get("content-type") or "").lower()
+    if ct.startswith("application/x-www-form-urlencoded") or ct.startswith("multipart/form-data"):
+        form = await request.form()
+        data = {}
+        for key, value in form.items():
+            data[key] = value
+        return model_class(**data)
+    data = await request.json()
+    return model_class(**data)
+
+
+def _request(content_type: str, body: bytes) -> Request:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    headers = [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": headers, "query_string": b""}, receive)
+
+
+async def _measure(parser, model, content_type: str, body: bytes, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await parser(_request(content_type, body), model)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def main(args):
+    product = {"name": "Producto", "description": "Descripción " * 5, "price": 12.5, "sku": "SKU-1", "business_id": str(uuid.uuid4())}
+    business = {"name": "Negocio", "owner_id": str(uuid.uuid4()), "address": "Calle 1", "phone": "555", "email": "a@b.com"}
+    cases = [
+        ("ProductCreate json", ProductCreate, "application/json", json.dumps(product).encode()),
+        ("BusinessCreate json", BusinessCreate, "application/json", json.dumps(business).encode()),
+        ("ProductCreate form", ProductCreate, "application/x-www-form-urlencoded", urlencode(product).encode()),
+    ]
+    try:
+        import msgpack
+        cases.append(("ProductCreate msgpack", ProductCreate, "application/msgpack", msgpack.packb(product)))
+    except ImportError:
+        pass
+    for name, model, content_type, body in cases:
+        new = await _measure(parse_body, model, content_type, body, args.iterations)
+        line = f"{name:>22}: parse_body {new:6.1f} µs"
+        if content_type != "application/msgpack":
+            old = await _measure(legacy_parse_request_data, model, content_type, body, args.iterations)
+            line += f"   parse_request_data {old:6.1f} µs   ({old / new:.1f}x)"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,107 @@
+"""
+Prueba de carga del WebSocket de chat contra un servidor en marcha: abre N
+conexiones ociosas (10.000 por defecto) de un mismo usuario, mide la memoria del
+worker y el tiempo hasta que un mensaje enviado por REST llega a todas ellas.
+
+Crea dos usuarios y una conversación por /auth/register y /chat/conversations/.
+Arrancar el servidor con un solo worker para medir "por worker":
+
+    cd fastapi_backend
+    METRICS_TOKEN=bench uvicorn app.main:app --port 8000 --workers 1 &
+    python -m benchmarks.bench_chat_websockets --connections 10000 --server-pid $! --metrics-token bench
+
+El cliente y el servidor necesitan un límite de descriptores (ulimit -n) mayor que N.
+"""
+import argparse
+import asyncio
+import json
+import resource
+import time
+import uuid
+
+import requests
+import websockets
+
+
+def _rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _register(api: str) -> tuple:
+    email = f"bench_{uuid.uuid4().hex[:8]}@example.com"
+    r = requests.post(f"{api}/auth/register", json={"email": email, "password": "bench-password"})
+    r.raise_for_status()
+    body = r.json()
+    return body["user"]["id"], {"Authorization": f"Bearer {body['token']}"}
+
+
+async def main(args):
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    api = f"{args.url}/api/v1"
+    ws_url = api.replace("http", "ws", 1) + "/chat/ws"
+    listener_id, listener_headers = _register(api)
+    sender_id, sender_headers = _register(api)
+    r = requests.post(f"{api}/chat/conversations/", headers=sender_headers, json={
+        "type": "medical_consultation", "participant_ids": [sender_id, listener_id],
+    })
+    r.raise_for_status()
+    conversation_id = r.json()["id"]
+
+    rss_before = _rss_mb(args.server_pid) if args.server_pid else None
+    slots = asyncio.Semaphore(args.connect_concurrency)
+
+    async def connect():
+        async with slots:
+            return await websockets.connect(ws_url, additional_headers=listener_headers, open_timeout=60)
+
+    start = time.perf_counter()
+    sockets = await asyncio.gather(*(connect() for _ in range(args.connections)))
+    connect_time = time.perf_counter() - start
+    print(f"{len(sockets)} connections open in {connect_time:.1f} s ({len(sockets) / connect_time:.0f}/s)")
+
+    await asyncio.sleep(args.idle)
+    if args.metrics_token:
+        metrics_headers = {"Authorization": f"Bearer {args.metrics_token}"}
+        print("server:", requests.get(f"{args.url}/metrics/chat", headers=metrics_headers).json())
+    if rss_before is not None:
+        rss_after = _rss_mb(args.server_pid)
+        print(f"worker RSS {rss_before:.1f} MB -> {rss_after:.1f} MB "
+              f"({(rss_after - rss_before) * 1024 / len(sockets):.1f} KB per connection)")
+
+    for _ in range(args.messages):
+        start = time.perf_counter()
+        r = await asyncio.to_thread(
+            requests.post, f"{api}/chat/conversations/{conversation_id}/messages/",
+            headers=sender_headers, json={"content": "ping", "conversation_id": conversation_id},
+        )
+        r.raise_for_status()
+        arrivals = await asyncio.gather(*(_received_at(ws, start) for ws in sockets))
+        arrivals.sort()
+        print(f"fan-out to {len(arrivals)}: p50 {arrivals[len(arrivals) // 2] * 1000:7.1f} ms, "
+              f"p99 {arrivals[int(len(arrivals) * 0.99)] * 1000:7.1f} ms, last {arrivals[-1] * 1000:7.1f} ms")
+
+    await asyncio.gather(*(ws.close() for ws in sockets))
+
+
+async def _received_at(ws, start: float) -> float:
+    while json.loads(await ws.recv())["type"] != "message":
+        pass
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--idle", type=float, default=5.0, help="segundos ociosos antes de medir")
+    parser.add_argument("--messages", type=int, default=3)
+    parser.add_argument("--metrics-token", help="METRICS_TOKEN del servidor para leer /metrics/chat")
+    parser.add_argument("--server-pid", type=int, help="pid del worker para medir su memoria (Linux)")
+    asyncio.run(main(parser.parse_args()))
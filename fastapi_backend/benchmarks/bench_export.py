@@ -0,0 +1,77 @@
+"""
+Benchmark de los endpoints de exportación: genera N productos en un negocio y
+consume export_response en proceso para cada formato, midiendo el tiempo hasta
+el primer lote con filas, el tiempo total y el pico de memoria asignada durante
+la exportación (tracemalloc, en una segunda pasada). Con tablas de distinto
+tamaño el pico debe mantenerse igual. Usa DATABASE_URL y borra sus datos al terminar.
+
+    cd fastapi_backend
+    python -m benchmarks.bench_export --rows 1000000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+import uuid
+
+from sqlalchemy import delete, insert, text
+
+import app.main  # noqa: F401  registra todos los modelos
+from app.api.export import export_query, export_response
+from app.db.session import AsyncSessionLocal, async_engine
+from app.models.business import Business
+from app.models.product import Product as ProductModel
+from app.models.user import User
+from app.schemas.product import Product
+
+
+async def _consume(query, format: str):
+    response = export_response(query, format, "products")
+    start = time.perf_counter()
+    first, size = None, 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+        if first is None and size > 4096:  # la cabecera CSV/Arrow sola no cuenta
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start, size
+
+
+async def main(args):
+    user_id, business_id = uuid.uuid4(), uuid.uuid4()
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(User), [{"id": user_id, "email": f"bench-{user_id}@example.com", "hashed_password": "x"}])
+        await db.execute(insert(Business), [{"id": business_id, "name": "bench", "owner_id": user_id}])
+        start = time.perf_counter()
+        await db.execute(text("""
+            INSERT INTO pos.products (id, name, description, price, sku, business_id, created_at)
+            SELECT gen_random_uuid(), 'Producto ' || g, 'Descripción del producto ' || g, 1 + g % 1000,
+                   'bench-' || :business || '-' || g, CAST(:business AS uuid), now()
+            FROM generate_series(1, :n) g
+        """), {"business": str(business_id), "n": args.rows})
+        await db.commit()
+        print(f"seeded {args.rows} products in {time.perf_counter() - start:.1f} s")
+
+    try:
+        query = export_query(ProductModel, Product).where(ProductModel.business_id == business_id)
+        for format in args.formats:
+            first, total, size = await _consume(query, format)
+            tracemalloc.start()
+            await _consume(query, format)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{format:>6}: first rows {first * 1000:7.1f} ms  total {total:6.1f} s  "
+                  f"{size / 2**20:7.1f} MiB  ({args.rows / total:,.0f} rows/s)  peak alloc {peak / 2**20:5.1f} MiB")
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(ProductModel).where(ProductModel.business_id == business_id))
+            await db.execute(delete(Business).where(Business.id == business_id))
+            await db.execute(delete(User).where(User.id == user_id))
+            await db.commit()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--formats", nargs="+", default=["ndjson", "csv", "arrow"])
+    asyncio.run(main(parser.parse_args()))
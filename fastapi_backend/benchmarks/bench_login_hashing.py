@@ -0,0 +1,68 @@
+"""
+Benchmark del hash de contraseñas en el login: verificación en el event loop
+(comportamiento anterior) vs. el pool acotado de app.core.security.
+
+Lanza N logins concurrentes y, en paralelo, una sonda que mide cuánto tarda el
+event loop en atender una petición trivial (lo que sufren los demás requests
+del worker mientras se verifican contraseñas).
+
+    cd fastapi_backend
+    python -m benchmarks.bench_login_hashing --logins 64 --concurrency 16
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.core.config import settings
+from app.core.security import pwd_context, verify_password, verify_password_async
+
+
+async def _probe(stop: asyncio.Event, lags: list, interval: float = 0.005):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def _run(mode: str, hashed: str, logins: int, concurrency: int):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with slots:
+            if mode == "inline":
+                verify_password("secret-password", hashed)
+            else:
+                await verify_password_async("secret-password", hashed)
+
+    stop, lags = asyncio.Event(), []
+    probe = asyncio.create_task(_probe(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+    print(
+        f"{mode:>6}: {logins / elapsed:7.1f} logins/s | event loop lag "
+        f"p50 {statistics.median(lags_ms):7.1f} ms, p99 {p99:7.1f} ms, max {lags_ms[-1]:7.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    hashed = pwd_context.hash("secret-password")
+    print(f"bcrypt rounds={settings.BCRYPT_ROUNDS} logins={args.logins} concurrency={args.concurrency} "
+          f"hash workers={settings.PASSWORD_HASH_WORKERS}")
+    for mode in ("inline", "pool"):
+        asyncio.run(_run(mode, hashed, args.logins, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark de la importación masiva de productos: genera un fichero CSV y otro
+NDJSON de N filas para un negocio temporal y los importa con
+ProductImportService (la primera pasada crea, la segunda actualiza por SKU),
+informando de filas/s. Usa DATABASE_URL y borra sus datos al terminar.
+
+    cd fastapi_backend
+    python -m benchmarks.bench_product_import --rows 100000
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import delete, insert
+
+import app.main  # noqa: F401  registra todos los modelos
+from app.db.session import AsyncSessionLocal, async_engine
+from app.models.business import Business
+from app.models.product import Product, ProductImport
+from app.models.user import User
+from app.services.product_import_service import ProductImportService
+
+
+def _write_files(directory: str, rows: int, prefix: str) -> dict:
+    products = (
+        {"sku": f"{prefix}-{i}", "name": f"Producto {i}", "description": f"Descripción del producto {i}", "price": 1 + i % 1000}
+        for i in range(rows)
+    )
+    paths = {"csv": os.path.join(directory, "products.csv"), "ndjson": os.path.join(directory, "products.ndjson")}
+    with open(paths["csv"], "w", newline="") as csv_file, open(paths["ndjson"], "w") as ndjson_file:
+        writer = csv.DictWriter(csv_file, fieldnames=["sku", "name", "description", "price"])
+        writer.writeheader()
+        for product in products:
+            writer.writerow(product)
+            ndjson_file.write(json.dumps(product) + "\n")
+    return paths
+
+
+async def main(args):
+    user_id, business_id = uuid.uuid4(), uuid.uuid4()
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(User), [{"id": user_id, "email": f"bench-{user_id}@example.com", "hashed_password": "x"}])
+        await db.execute(insert(Business), [{"id": business_id, "name": "bench", "owner_id": user_id}])
+        await db.commit()
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = _write_files(directory, args.rows, f"bench-{business_id}")
+            for format in args.formats:
+                for label in ("insert", "update"):
+                    async with AsyncSessionLocal() as db:
+                        service = ProductImportService(db)
+                        job = await service.create_import(business_id)
+                        start = time.perf_counter()
+                        job = await service.run_import(job.id, paths[format], format)
+                        elapsed = time.perf_counter() - start
+                    print(f"{format:>6} {label}: {job.status}  {args.rows} rows in {elapsed:5.1f} s  "
+                          f"({args.rows / elapsed:,.0f} rows/s)  created {job.created_count}  "
+                          f"updated {job.updated_count}  errors {job.error_count}")
+                async with AsyncSessionLocal() as db:
+                    await db.execute(delete(Product).where(Product.business_id == business_id))
+                    await db.commit()
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Product).where(Product.business_id == business_id))
+            await db.execute(delete(ProductImport).where(ProductImport.business_id == business_id))
+            await db.execute(delete(Business).where(Business.id == business_id))
+            await db.execute(delete(User).where(User.id == user_id))
+            await db.commit()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--formats", nargs="+", default=["csv", "ndjson"])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,89 @@
+"""
+Benchmark de la búsqueda de texto completo sobre mensajes (ChatService.search_messages).
+Genera N mensajes repartidos en conversaciones de muchos usuarios, de las que el
+usuario medido participa en unas pocas, y mide la latencia de varias consultas.
+Usa la base de datos de DATABASE_URL / ASYNC_DATABASE_URL y borra sus datos al terminar.
+
+    cd fastapi_backend
+    python -m benchmarks.bench_search --messages 1000000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlalchemy import delete, insert, text
+
+import app.main  # noqa: F401  registra todos los modelos
+from app.db.session import AsyncSessionLocal, async_engine
+from app.models.chat import Conversation, ConversationParticipant, ConversationType, Message
+from app.models.user import User
+from app.services.chat_service import ChatService
+
+WORDS = (
+    "dolor cabeza fiebre tos garganta receta paracetamol ibuprofeno control presión análisis sangre "
+    "resultado cita mañana tarde gracias doctor síntomas alergia mareo náuseas espalda rodilla dieta"
+).split()
+QUERIES = ("dolor de cabeza", "paracetamol", '"análisis de sangre"', "fiebre -tos", "alergia OR mareo", "xilófono")
+
+
+async def main(args):
+    user_id, peer_id = uuid.uuid4(), uuid.uuid4()
+    conversation_ids = [uuid.uuid4() for _ in range(args.conversations)]
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(User), [
+            {"id": uid, "email": f"bench-{uid}@example.com", "hashed_password": "x"} for uid in (user_id, peer_id)
+        ])
+        await db.execute(insert(Conversation), [
+            {"id": cid, "type": ConversationType.MEDICAL_CONSULTATION} for cid in conversation_ids
+        ])
+        # El usuario medido solo participa en las primeras `--own` conversaciones
+        await db.execute(insert(ConversationParticipant), [
+            {"conversation_id": cid, "user_id": peer_id} for cid in conversation_ids
+        ] + [
+            {"conversation_id": cid, "user_id": user_id} for cid in conversation_ids[:args.own]
+        ])
+        start = time.perf_counter()
+        await db.execute(text("""
+            INSERT INTO pos.messages (id, conversation_id, sender_id, content, created_at)
+            SELECT gen_random_uuid(), (CAST(:conversations AS uuid[]))[1 + g % :n_conversations], :peer,
+                   (SELECT string_agg((CAST(:words AS text[]))[1 + floor(random() * :n_words)::int], ' ')
+                      FROM generate_series(1, 8 + g % 5)),
+                   now() - g * interval '1 second'
+            FROM generate_series(1, :n) g
+        """), {
+            "conversations": conversation_ids, "n_conversations": len(conversation_ids), "peer": peer_id,
+            "words": list(WORDS), "n_words": len(WORDS), "n": args.messages,
+        })
+        await db.commit()
+        await db.execute(text("ANALYZE pos.messages"))
+        print(f"seeded {args.messages} messages in {time.perf_counter() - start:.1f} s")
+
+    try:
+        async with AsyncSessionLocal() as db:
+            service = ChatService(db)
+            for q in QUERIES:
+                timings, hits = [], 0
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    hits = len(await service.search_messages(user_id, q, limit=20))
+                    timings.append((time.perf_counter() - start) * 1000)
+                print(f"{q:>22}: {hits:>3} hits  p50 {statistics.median(timings):7.1f} ms  max {max(timings):7.1f} ms")
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Message).where(Message.conversation_id.in_(conversation_ids)))
+            await db.execute(delete(ConversationParticipant).where(ConversationParticipant.conversation_id.in_(conversation_ids)))
+            await db.execute(delete(Conversation).where(Conversation.id.in_(conversation_ids)))
+            await db.execute(delete(User).where(User.id.in_([user_id, peer_id])))
+            await db.commit()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--conversations", type=int, default=10000)
+    parser.add_argument("--own", type=int, default=20, help="conversaciones en las que participa el usuario medido")
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
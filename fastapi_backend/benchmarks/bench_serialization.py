@@ -0,0 +1,91 @@
+"""
+Microbenchmark de la serialización de listados: N objetos ORM de Product e
+Inventory (en memoria, sin base de datos) serializados como lo hace FastAPI con
+`response_model` (validación from_attributes + dump_json de pydantic), con el
+camino anterior (jsonable_encoder + json.dumps) y con trusted_list_response
+(TRUSTED_ORM_RESPONSES=true). Comprueba además que los tres JSON son iguales.
+
+    cd fastapi_backend
+    python -m benchmarks.bench_serialization --rows 10000
+"""
+import argparse
+import json
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from asyncpg.pgproto.pgproto import UUID as PgUUID
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import app.main  # noqa: F401  registra todos los modelos
+from app.core.config import settings
+from app.core.responses import trusted_list_response
+from app.models.inventory import Inventory as InventoryModel
+from app.models.product import Product as ProductModel
+from app.schemas.inventory import Inventory
+from app.schemas.product import Product
+
+
+def _uuid() -> PgUUID:
+    # Los objetos cargados con asyncpg traen su propia subclase de UUID
+    return PgUUID(uuid.uuid4().bytes)
+
+
+def _products(n: int) -> list:
+    business_id = _uuid()
+    return [
+        ProductModel(
+            id=_uuid(), business_id=business_id, name=f"Producto {i}", description="Descripción de prueba",
+            price=9.99 + i, sku=f"SKU-{i:06d}",
+        )
+        for i in range(n)
+    ]
+
+
+def _inventory(n: int) -> list:
+    now = datetime.now(timezone.utc)
+    return [
+        InventoryModel(
+            id=_uuid(), product_id=_uuid(), location_id=_uuid(), quantity=i % 500,
+            created_at=now - timedelta(seconds=i), updated_at=now if i % 2 else None,
+        )
+        for i in range(n)
+    ]
+
+
+def _timed(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return body, statistics.median(timings)
+
+
+def main(args):
+    settings.TRUSTED_ORM_RESPONSES = True
+    for name, schema, objects in (("Product", Product, _products(args.rows)), ("Inventory", Inventory, _inventory(args.rows))):
+        adapter = TypeAdapter(List[schema])
+        modes = {
+            "response_model": lambda: adapter.dump_json(adapter.validate_python(objects, from_attributes=True)),
+            "jsonable_encoder": lambda: json.dumps(jsonable_encoder(adapter.validate_python(objects, from_attributes=True))).encode(),
+            "trusted orjson": lambda: trusted_list_response(schema, objects).body,
+        }
+        expected = None
+        print(f"{name} x {args.rows}")
+        for mode, fn in modes.items():
+            body, p50 = _timed(fn, args.repeat)
+            if expected is None:
+                expected = json.loads(body)
+            assert json.loads(body) == expected, f"{mode} output differs"
+            print(f"  {mode:>16}: p50 {p50:7.1f} ms  ({len(body) / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=7)
+    main(parser.parse_args())
@@ -0,0 +1,88 @@
+"""
+Benchmark del conteo de stock: crea N productos con inventario en una ubicación
+temporal, genera un CSV de conteo (la mitad de las filas con varianza, un cuarto
+por product_id y el resto por SKU) y lo concilia con InventoryService.apply_stock_count,
+midiendo por separado la lectura/validación del fichero y la transacción. Usa
+DATABASE_URL y borra sus datos al terminar.
+
+    cd fastapi_backend
+    python -m benchmarks.bench_stock_count --rows 100000
+"""
+import argparse
+import asyncio
+import csv
+import os
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import delete, insert, select, text
+
+import app.main  # noqa: F401  registra todos los modelos
+from app.core.bulk import iter_file_rows
+from app.schemas.bulk import validate_rows
+from app.db.session import AsyncSessionLocal, async_engine
+from app.models.business import Business, BusinessLocation
+from app.models.inventory import Inventory
+from app.models.product import Product
+from app.models.user import User
+from app.schemas.inventory import StockCountRow
+from app.services.inventory_service import InventoryService
+
+
+async def main(args):
+    user_id, business_id, location_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(User), [{"id": user_id, "email": f"bench-{user_id}@example.com", "hashed_password": "x"}])
+        await db.execute(insert(Business), [{"id": business_id, "name": "bench", "owner_id": user_id}])
+        await db.execute(insert(BusinessLocation), [{"id": location_id, "business_id": business_id, "name": "bench"}])
+        await db.execute(text("""
+            INSERT INTO pos.products (id, name, price, sku, business_id)
+            SELECT gen_random_uuid(), 'Producto ' || g, 1, 'bench-' || :business || '-' || g, CAST(:business AS uuid)
+            FROM generate_series(1, :n) g
+        """), {"business": str(business_id), "n": args.rows})
+        await db.execute(text("""
+            INSERT INTO pos.inventory (id, product_id, location_id, quantity)
+            SELECT gen_random_uuid(), id, CAST(:location AS uuid), 10 FROM pos.products WHERE business_id = CAST(:business AS uuid)
+        """), {"business": str(business_id), "location": str(location_id)})
+        await db.commit()
+        products = (await db.execute(select(Product.id, Product.sku).where(Product.business_id == business_id))).all()
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "count.csv")
+    with open(path, "w", newline="") as count_file:
+        writer = csv.writer(count_file)
+        writer.writerow(["sku", "product_id", "quantity"])
+        for i, (product_id, sku) in enumerate(products):
+            writer.writerow(["", product_id, 10] if i % 4 == 0 else [sku, "", 10 + i % 2])
+
+    try:
+        for dry_run in (True, False):
+            start = time.perf_counter()
+            counts, errors = await asyncio.to_thread(validate_rows, iter_file_rows(path, "csv"), StockCountRow)
+            parsed = time.perf_counter() - start
+            async with AsyncSessionLocal() as db:
+                variances, row_errors, applied = await InventoryService(db).apply_stock_count(
+                    location_id, business_id, counts, apply=not dry_run,
+                )
+            total = time.perf_counter() - start
+            print(f"{'dry run' if dry_run else 'apply':>7}: {len(counts)} rows  parse {parsed:5.2f} s  "
+                  f"reconcile {total - parsed:5.2f} s  total {total:5.2f} s  ({len(counts) / total:,.0f} rows/s)  "
+                  f"variances {len(variances)}  errors {len(errors) + len(row_errors)}  applied {applied}")
+    finally:
+        os.unlink(path)
+        os.rmdir(directory)
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Inventory).where(Inventory.location_id == location_id))
+            await db.execute(delete(Product).where(Product.business_id == business_id))
+            await db.execute(delete(BusinessLocation).where(BusinessLocation.id == location_id))
+            await db.execute(delete(Business).where(Business.id == business_id))
+            await db.execute(delete(User).where(User.id == user_id))
+            await db.commit()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    asyncio.run(main(parser.parse_args()))
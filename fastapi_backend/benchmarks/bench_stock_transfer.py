@@ -0,0 +1,107 @@
+"""
+Benchmark del completado de transferencias de stock (InventoryService.update_stock_transfer)
+para transferencias de 1, 100 y 10.000 líneas. Usa la base de datos de DATABASE_URL /
+ASYNC_DATABASE_URL, crea sus propios datos y los borra al terminar.
+
+    cd fastapi_backend
+    python -m benchmarks.bench_stock_transfer --sizes 1 100 10000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import delete, event, insert, select
+
+import app.main  # noqa: F401  registra todos los modelos
+from app.db.session import AsyncSessionLocal, async_engine
+from app.models.business import Business, BusinessLocation
+from app.models.inventory import Inventory, StockTransfer, StockTransferItem
+from app.models.product import Product
+from app.models.user import User
+from app.schemas.inventory import StockTransferUpdate
+from app.services.inventory_service import InventoryService
+
+STARTING_STOCK = 50
+TRANSFERRED = 3
+
+statements = 0
+
+def _count_statement(*args):
+    global statements
+    statements += 1
+
+
+async def _bench(size: int) -> None:
+    global statements
+    user_id, business_id = uuid.uuid4(), uuid.uuid4()
+    source_id, target_id = uuid.uuid4(), uuid.uuid4()
+    product_ids = [uuid.uuid4() for _ in range(size)]
+    transfer_id = uuid.uuid4()
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(User).values(id=user_id, email=f"bench-{user_id}@example.com", hashed_password="x"))
+        await db.execute(insert(Business).values(id=business_id, name="bench", owner_id=user_id))
+        await db.execute(insert(BusinessLocation), [
+            {"id": source_id, "business_id": business_id, "name": "source"},
+            {"id": target_id, "business_id": business_id, "name": "target"},
+        ])
+        await db.execute(insert(Product), [
+            {"id": pid, "name": f"p{i}", "price": 1.0, "business_id": business_id}
+            for i, pid in enumerate(product_ids)
+        ])
+        await db.execute(insert(Inventory), [
+            {"id": uuid.uuid4(), "product_id": pid, "location_id": source_id, "quantity": STARTING_STOCK}
+            for pid in product_ids
+        ])
+        # La mitad de los productos ya existe en destino (UPDATE), la otra mitad se crea (INSERT)
+        await db.execute(insert(Inventory), [
+            {"id": uuid.uuid4(), "product_id": pid, "location_id": target_id, "quantity": 1}
+            for pid in product_ids[::2]
+        ])
+        await db.execute(insert(StockTransfer).values(
+            id=transfer_id, business_id=business_id, from_location_id=source_id, to_location_id=target_id,
+        ))
+        await db.execute(insert(StockTransferItem), [
+            {"id": uuid.uuid4(), "transfer_id": transfer_id, "product_id": pid, "quantity": TRANSFERRED}
+            for pid in product_ids
+        ])
+        await db.commit()
+
+    try:
+        async with AsyncSessionLocal() as db:
+            statements = 0
+            start = time.perf_counter()
+            await InventoryService(db).update_stock_transfer(transfer_id, StockTransferUpdate(status="completed"))
+            elapsed = time.perf_counter() - start
+            executed = statements
+
+            moved = await db.scalar(
+                select(Inventory.quantity).where(Inventory.location_id == source_id).limit(1)
+            )
+            target_rows = len((await db.scalars(select(Inventory.id).where(Inventory.location_id == target_id))).all())
+        assert moved == STARTING_STOCK - TRANSFERRED and target_rows == size, (moved, target_rows)
+        print(f"{size:>6} items: {elapsed * 1000:9.1f} ms, {executed:>6} SQL statements")
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(StockTransferItem).where(StockTransferItem.transfer_id == transfer_id))
+            await db.execute(delete(StockTransfer).where(StockTransfer.id == transfer_id))
+            await db.execute(delete(Inventory).where(Inventory.location_id.in_([source_id, target_id])))
+            await db.execute(delete(Product).where(Product.business_id == business_id))
+            await db.execute(delete(BusinessLocation).where(BusinessLocation.business_id == business_id))
+            await db.execute(delete(Business).where(Business.id == business_id))
+            await db.execute(delete(User).where(User.id == user_id))
+            await db.commit()
+
+
+async def main(sizes):
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _count_statement)
+    for size in sizes:
+        await _bench(size)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10000])
+    asyncio.run(main(parser.parse_args().sizes))
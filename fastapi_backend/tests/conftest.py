@@ -19,6 +19,8 @@ TABLES_TO_TRUNCATE = [
     "conversation_participants",
     "conversations",
     "customers",
+    "dashboard_daily_stats",
+    "dashboard_user_stats",
     "inventory",
     "messages",
     "patients",
@@ -1,5 +1,8 @@
 import uuid
 import json
+import time
+
+import pytest
 from datetime import datetime, timedelta
 
 # ================== Auth Helpers ==================
@@ -173,6 +176,87 @@ def test_delete_product(http, auth_headers, admin_user, base_url):
     r = http.get(f"{base_url}/products/{p['id']}", headers=auth_headers)
     assert r.status_code == 404
 
+def test_get_products_cursor_pagination(http, auth_headers, admin_user, base_url):
+    b = create_business(http, auth_headers, base_url, admin_user["id"])
+    created = {create_product(http, auth_headers, base_url, b["id"])["id"] for _ in range(5)}
+    seen, cursor = [], ""
+    while cursor is not None:
+        params = {"business_id": b["id"], "limit": 2, "cursor": cursor}
+        r = http.get(f"{base_url}/products/", headers=auth_headers, params=params)
+        assert r.status_code == 200, r.text
+        page = r.json()
+        assert len(page["items"]) <= 2
+        seen += [p["id"] for p in page["items"]]
+        cursor = page["next_cursor"]
+    assert len(seen) == len(set(seen)) and set(seen) == created
+
+    r = http.get(f"{base_url}/products/", headers=auth_headers, params={"business_id": b["id"], "cursor": "bogus"})
+    assert r.status_code == 400
+    for limit in (0, -1, 100000):
+        params = {"business_id": b["id"], "limit": limit, "cursor": ""}
+        r = http.get(f"{base_url}/products/", headers=auth_headers, params=params)
+        assert r.status_code == 422
+
+def test_create_product_body_formats(http, auth_headers, admin_user, base_url):
+    b = create_business(http, auth_headers, base_url, admin_user["id"])
+    form = {"name": _uniq_name("Form"), "price": "3.5", "business_id": b["id"], "sku": _uniq_sku("FORM")}
+    r = http.post(f"{base_url}/products/", headers=auth_headers, data=form)
+    assert r.status_code == 201, r.text
+    assert r.json()["price"] == 3.5
+
+    r = http.post(f"{base_url}/products/", headers=auth_headers, json={"name": "x", "price": -1, "business_id": b["id"]})
+    assert r.status_code == 422
+    assert r.json()["detail"][0]["loc"] == ["body", "price"]
+
+    r = http.post(f"{base_url}/products/", headers={**auth_headers, "Content-Type": "application/json"}, data="{not json")
+    assert r.status_code == 422
+
+def test_export_products(http, auth_headers, admin_user, base_url):
+    b = create_business(http, auth_headers, base_url, admin_user["id"])
+    created = {create_product(http, auth_headers, base_url, b["id"])["id"] for _ in range(3)}
+
+    r = http.get(f"{base_url}/products/export", headers=auth_headers, params={"business_id": b["id"]})
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert {row["id"] for row in rows} == created
+
+    r = http.get(f"{base_url}/products/export", headers=auth_headers, params={"business_id": b["id"], "format": "csv"})
+    assert r.status_code == 200
+    lines = r.text.splitlines()
+    assert lines[0].split(",") == ["name", "description", "price", "sku", "id", "business_id"]
+    assert len(lines) == 4
+
+def wait_for_import(http, headers, base_url, import_id):
+    for _ in range(50):
+        r = http.get(f"{base_url}/products/imports/{import_id}", headers=headers)
+        assert r.status_code == 200, r.text
+        if r.json()["status"] in ("completed", "failed"):
+            return r.json()
+        time.sleep(0.1)
+    raise AssertionError("import did not finish")
+
+def test_import_products(http, auth_headers, admin_user, base_url):
+    b = create_business(http, auth_headers, base_url, admin_user["id"])
+    sku = _uniq_sku("IMP")
+    body = f"sku,name,description,price\n{sku}-1,Uno,,10\n{sku}-2,Dos,Segundo,20\n{sku}-3,Tres,,-1\n"
+    r = http.post(f"{base_url}/products/import", headers={**auth_headers, "Content-Type": "text/csv"},
+                  params={"business_id": b["id"]}, data=body)
+    assert r.status_code == 202, r.text
+    job = wait_for_import(http, auth_headers, base_url, r.json()["id"])
+    assert job["status"] == "completed", job
+    assert (job["rows_processed"], job["created_count"], job["updated_count"], job["error_count"]) == (3, 2, 0, 1)
+    assert job["errors"][0]["index"] == 2
+
+    lines = json.dumps({"sku": f"{sku}-1", "name": "Uno bis", "price": 11}) + "\nnot json\n"
+    r = http.post(f"{base_url}/products/import", headers={**auth_headers, "Content-Type": "application/x-ndjson"},
+                  params={"business_id": b["id"]}, data=lines)
+    assert r.status_code == 202, r.text
+    job = wait_for_import(http, auth_headers, base_url, r.json()["id"])
+    assert (job["created_count"], job["updated_count"], job["error_count"]) == (0, 1, 1)
+    products = http.get(f"{base_url}/products/", headers=auth_headers, params={"business_id": b["id"]}).json()
+    assert {p["sku"]: p["name"] for p in products}[f"{sku}-1"] == "Uno bis"
+
 # ================== Customers ==================
 def create_customer(http, headers, base_url, business_id, user_id, first_name="John", last_name="Doe", email=None):
     payload = {
@@ -261,6 +345,33 @@ def test_update_inventory_item(http, auth_headers, admin_user, base_url):
     assert r.status_code == 200
     assert r.json()["quantity"] == 150
 
+def test_stock_count_upload(http, auth_headers, admin_user, base_url):
+    b, loc, counted = create_location_and_product(http, auth_headers, base_url, admin_user["id"])
+    new = create_product(http, auth_headers, base_url, b["id"])
+    missing = create_product(http, auth_headers, base_url, b["id"])
+    create_inventory_item(http, auth_headers, base_url, counted["id"], b["id"], loc["id"], quantity=10)
+    create_inventory_item(http, auth_headers, base_url, missing["id"], b["id"], loc["id"], quantity=4)
+    headers = {**auth_headers, "Content-Type": "text/csv"}
+    url = f"{base_url}/inventory/stock-count"
+
+    body = f"sku,product_id,quantity\n{counted['sku']},,7\n,{new['id']},3\nNO-SUCH-SKU,,1\n"
+    r = http.post(url, headers=headers, params={"location_id": loc["id"]}, data=body)
+    assert r.status_code == 200, r.text
+    report = r.json()
+    assert report["applied"] is False
+    assert [e["index"] for e in report["errors"]] == [2]
+
+    body = f"sku,product_id,quantity\n{counted['sku']},,7\n,{new['id']},3\n"
+    r = http.post(url, headers=headers, params={"location_id": loc["id"], "full_count": True}, data=body)
+    assert r.status_code == 200, r.text
+    report = r.json()
+    assert report["applied"] is True
+    assert {v["product_id"]: v["variance"] for v in report["variances"]} == {counted["id"]: -3, new["id"]: 3, missing["id"]: -4}
+    assert report["net_variance"] == -4
+    r = http.get(f"{base_url}/inventory/by_location_product/", headers=auth_headers,
+                 params={"location_id": loc["id"], "product_id": new["id"]})
+    assert r.json()["quantity"] == 3
+
 def test_delete_inventory_item(http, auth_headers, admin_user, base_url):
     b, loc, prod = create_location_and_product(http, auth_headers, base_url, admin_user["id"])
     item = create_inventory_item(http, auth_headers, base_url, prod["id"], b["id"], loc["id"])
@@ -269,6 +380,138 @@ def test_delete_inventory_item(http, auth_headers, admin_user, base_url):
     r = http.get(f"{base_url}/inventory/{item['id']}", headers=auth_headers)
     assert r.status_code == 404
 
+def test_inventory_location_authorization(http, auth_headers, admin_user, base_url):
+    b, loc, prod = create_location_and_product(http, auth_headers, base_url, admin_user["id"])
+    item = create_inventory_item(http, auth_headers, base_url, prod["id"], b["id"], loc["id"])
+    params = {"location_id": loc["id"], "product_id": prod["id"]}
+    r = http.get(f"{base_url}/inventory/by_location_product/", headers=auth_headers, params=params)
+    assert r.status_code == 200
+
+    other = register_user(http, base_url)
+    other_headers = login_user(http, base_url, other["email"])
+    r = http.get(f"{base_url}/inventory/by_location_product/", headers=other_headers, params=params)
+    assert r.status_code == 403
+    r = http.get(f"{base_url}/inventory/{item['id']}", headers=other_headers)
+    assert r.status_code == 403
+
+    # Borrar la ubicación invalida su propiedad cacheada
+    assert http.delete(f"{base_url}/inventory/{item['id']}", headers=auth_headers).status_code == 200
+    assert http.delete(f"{base_url}/businesses/locations/{loc['id']}", headers=auth_headers).status_code == 200
+    r = http.get(f"{base_url}/inventory/by_location_product/", headers=auth_headers, params=params)
+    assert r.status_code == 404
+    assert r.json()["detail"] == "Business location not found"
+
+# ================== Stock transfers ==================
+def create_stock_transfer(http, headers, base_url, business_id, from_location_id, to_location_id, items):
+    payload = {
+        "business_id": business_id,
+        "from_location_id": from_location_id,
+        "to_location_id": to_location_id,
+    }
+    r = http.post(f"{base_url}/inventory/stock-transfers/", headers=headers, json=payload)
+    assert r.status_code == 201, r.text
+    transfer = r.json()
+    for product_id, quantity in items:
+        payload = {"transfer_id": transfer["id"], "product_id": product_id, "quantity": quantity}
+        r = http.post(f"{base_url}/inventory/stock-transfer-items/", headers=headers, json=payload)
+        assert r.status_code == 201, r.text
+    return transfer
+
+def test_complete_stock_transfer(http, auth_headers, admin_user, base_url):
+    b, source, prod = create_location_and_product(http, auth_headers, base_url, admin_user["id"])
+    target = create_location(http, auth_headers, base_url, b["id"])
+    item = create_inventory_item(http, auth_headers, base_url, prod["id"], b["id"], source["id"], quantity=10)
+    transfer = create_stock_transfer(
+        http, auth_headers, base_url, b["id"], source["id"], target["id"], [(prod["id"], 4), (prod["id"], 2)]
+    )
+    r = http.put(f"{base_url}/inventory/stock-transfers/{transfer['id']}", headers=auth_headers, json={"status": "completed"})
+    assert r.status_code == 200, r.text
+    assert r.json()["status"] == "completed"
+
+    r = http.get(f"{base_url}/inventory/{item['id']}", headers=auth_headers)
+    assert r.json()["quantity"] == 4
+    r = http.get(
+        f"{base_url}/inventory/by_location_product/",
+        headers=auth_headers,
+        params={"location_id": target["id"], "product_id": prod["id"]},
+    )
+    assert r.status_code == 200
+    assert r.json()["quantity"] == 6
+
+    # Completarla otra vez no vuelve a mover stock
+    r = http.put(f"{base_url}/inventory/stock-transfers/{transfer['id']}", headers=auth_headers, json={"status": "completed"})
+    assert r.status_code == 200
+    r = http.get(f"{base_url}/inventory/{item['id']}", headers=auth_headers)
+    assert r.json()["quantity"] == 4
+
+def test_complete_stock_transfer_insufficient_stock(http, auth_headers, admin_user, base_url):
+    b, source, prod = create_location_and_product(http, auth_headers, base_url, admin_user["id"])
+    target = create_location(http, auth_headers, base_url, b["id"])
+    item = create_inventory_item(http, auth_headers, base_url, prod["id"], b["id"], source["id"], quantity=3)
+    transfer = create_stock_transfer(http, auth_headers, base_url, b["id"], source["id"], target["id"], [(prod["id"], 5)])
+    r = http.put(f"{base_url}/inventory/stock-transfers/{transfer['id']}", headers=auth_headers, json={"status": "completed"})
+    assert r.status_code == 400
+    r = http.get(f"{base_url}/inventory/{item['id']}", headers=auth_headers)
+    assert r.json()["quantity"] == 3
+
+def test_bulk_create_stock_transfer_items(http, auth_headers, admin_user, base_url):
+    b, source, prod = create_location_and_product(http, auth_headers, base_url, admin_user["id"])
+    target = create_location(http, auth_headers, base_url, b["id"])
+    transfer = create_stock_transfer(http, auth_headers, base_url, b["id"], source["id"], target["id"], [])
+    rows = [
+        {"transfer_id": transfer["id"], "product_id": prod["id"], "quantity": 2},
+        {"transfer_id": transfer["id"], "product_id": prod["id"], "quantity": 0},
+        {"transfer_id": transfer["id"], "product_id": str(uuid.uuid4()), "quantity": 1},
+        {"transfer_id": transfer["id"], "product_id": prod["id"], "quantity": 5},
+    ]
+    r = http.post(f"{base_url}/inventory/stock-transfer-items/bulk", headers=auth_headers, json=rows)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert [c["index"] for c in body["created"]] == [0, 3]
+    assert [e["index"] for e in body["errors"]] == [1, 2]
+
+    ndjson = "\n".join(json.dumps(row) for row in rows[:1]) + "\nnot json\n"
+    headers = {**auth_headers, "Content-Type": "application/x-ndjson"}
+    r = http.post(f"{base_url}/inventory/stock-transfer-items/bulk", headers=headers, data=ndjson)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert [c["index"] for c in body["created"]] == [0]
+    assert [e["index"] for e in body["errors"]] == [1]
+
+    # Una línea gigante se corta con 413 en vez de acumularse en memoria
+    huge = json.dumps({**rows[0], "padding": "x" * (100 * 1024)})
+    r = http.post(f"{base_url}/inventory/stock-transfer-items/bulk", headers=headers, data=huge + "\n")
+    assert r.status_code == 413
+
+def test_stock_transfer_authorization(http, auth_headers, admin_user, base_url):
+    b, source, prod = create_location_and_product(http, auth_headers, base_url, admin_user["id"])
+    target = create_location(http, auth_headers, base_url, b["id"])
+    create_inventory_item(http, auth_headers, base_url, prod["id"], b["id"], source["id"], quantity=10)
+    transfer = create_stock_transfer(http, auth_headers, base_url, b["id"], source["id"], target["id"], [(prod["id"], 1)])
+
+    other = register_user(http, base_url)
+    other_headers = login_user(http, base_url, other["email"])
+    payload = {"business_id": b["id"], "from_location_id": source["id"], "to_location_id": target["id"]}
+    r = http.post(f"{base_url}/inventory/stock-transfers/", headers=other_headers, json=payload)
+    assert r.status_code == 403
+    r = http.put(f"{base_url}/inventory/stock-transfers/{transfer['id']}", headers=other_headers, json={"status": "completed"})
+    assert r.status_code == 403
+    item = {"transfer_id": transfer["id"], "product_id": prod["id"], "quantity": 1}
+    r = http.post(f"{base_url}/inventory/stock-transfer-items/", headers=other_headers, json=item)
+    assert r.status_code == 403
+    r = http.post(f"{base_url}/inventory/stock-transfer-items/bulk", headers=other_headers, json=[item])
+    assert r.status_code == 403
+    r = http.get(f"{base_url}/inventory/stock-transfers/", headers=other_headers)
+    assert r.status_code == 200
+    assert transfer["id"] not in [t["id"] for t in r.json()]
+
+    # Las dos ubicaciones tienen que ser del negocio de la transferencia
+    other_business = create_business(http, auth_headers, base_url, admin_user["id"])
+    foreign = create_location(http, auth_headers, base_url, other_business["id"])
+    payload = {"business_id": b["id"], "from_location_id": source["id"], "to_location_id": foreign["id"]}
+    r = http.post(f"{base_url}/inventory/stock-transfers/", headers=auth_headers, json=payload)
+    assert r.status_code == 400
+
 # ================== Subscriptions (products/prices) ==================
 def create_subscription_product(http, headers, base_url):
     pid = f"prod_{uuid.uuid4().hex[:8]}"
@@ -384,6 +627,72 @@ def test_update_appointment(http, auth_headers, admin_user, base_url):
     assert r.status_code == 200
     assert r.json()["status"] == "completed"
 
+# ================== Dashboard ==================
+def test_dashboard_stats_follow_writes(http, base_url):
+    doctor = register_user(http, base_url, role="doctor")
+    headers = login_user(http, base_url, doctor["email"])
+    r = http.get(f"{base_url}/dashboard/stats", headers=headers)
+    assert r.status_code == 200, r.text
+    assert r.json()["patient_count"] == 0
+    assert r.json()["todays_revenue"] == 0
+
+    p = create_patient(http, headers, base_url, doctor["id"])
+    r = http.post(f"{base_url}/appointments/", headers=headers, json={
+        "patient_id": p["id"], "appointment_datetime": "2024-10-28T09:00:00Z",
+        "status": "pending_payment", "amount": 80,
+    })
+    assert r.status_code == 201, r.text
+    appointment = r.json()
+    assert appointment["paid_at"] is None
+
+    stats = http.get(f"{base_url}/dashboard/stats", headers=headers).json()
+    assert stats["patient_count"] == 1
+    assert stats["todays_new_patients"] == 1
+    assert stats["appointment_counts"]["pending_payment"] == 1
+    assert stats["todays_revenue"] == 0
+
+    # Al confirmarse la cita cuenta como pagada; cancelarla después no descuenta el ingreso
+    r = http.put(f"{base_url}/appointments/{appointment['id']}", headers=headers, json={"status": "scheduled"})
+    assert r.status_code == 200, r.text
+    assert r.json()["paid_at"] is not None
+    r = http.put(f"{base_url}/appointments/{appointment['id']}", headers=headers, json={"status": "cancelled"})
+    assert r.status_code == 200, r.text
+
+    stats = http.get(f"{base_url}/dashboard/stats", headers=headers).json()
+    assert stats["appointment_counts"] == {
+        "pending_payment": 0, "scheduled": 0, "active": 0, "completed": 0, "cancelled": 1,
+    }
+    assert stats["todays_new_appointments"] == 1
+    assert stats["todays_revenue"] == 80
+    assert stats["total_revenue"] == 80
+
+def test_dashboard_revenue_follows_amount_changes(http, base_url):
+    doctor = register_user(http, base_url, role="doctor")
+    headers = login_user(http, base_url, doctor["email"])
+    p = create_patient(http, headers, base_url, doctor["id"])
+    r = http.post(f"{base_url}/appointments/", headers=headers, json={
+        "patient_id": p["id"], "appointment_datetime": "2024-10-28T10:00:00Z",
+        "status": "scheduled", "amount": 100,
+    })
+    assert r.status_code == 201, r.text
+    appointment = r.json()
+    assert appointment["paid_at"] is not None
+
+    # Cambiar el importe de una cita ya pagada aplica la diferencia
+    r = http.put(f"{base_url}/appointments/{appointment['id']}", headers=headers, json={"amount": 150})
+    assert r.status_code == 200, r.text
+    stats = http.get(f"{base_url}/dashboard/stats", headers=headers).json()
+    assert stats["todays_revenue"] == 150
+    assert stats["total_revenue"] == 150
+
+    # Borrarla descuenta el importe actual sin dejar residuo
+    r = http.delete(f"{base_url}/appointments/{appointment['id']}", headers=headers)
+    assert r.status_code == 200, r.text
+    stats = http.get(f"{base_url}/dashboard/stats", headers=headers).json()
+    assert stats["todays_revenue"] == 0
+    assert stats["total_revenue"] == 0
+    assert stats["appointment_counts"]["scheduled"] == 0
+
 # ================== Chat ==================
 def create_conversation(http, headers, base_url, appointment_id, participant_ids: list, conv_type="medical_consultation"):
     payload = {
@@ -402,6 +711,54 @@ def test_get_user_conversations(http, auth_headers, admin_user, base_url):
     assert r.status_code == 200
     assert isinstance(r.json(), list)
 
+def test_get_inbox(http, auth_headers, admin_user, base_url):
+    patient_user = register_user(http, base_url, role="patient")
+    conv = create_conversation(http, auth_headers, base_url, None, [admin_user["id"], patient_user["id"]])
+    r = http.get(f"{base_url}/chat/inbox", headers=auth_headers)
+    assert r.status_code == 200, r.text
+    entry = next(e for e in r.json() if e["id"] == conv["id"])
+    assert {p["id"] for p in entry["participants"]} == {admin_user["id"], patient_user["id"]}
+    assert entry["last_message"] is None
+    assert entry["unread_count"] == 0
+    assert "messages" not in entry
+
+def test_get_or_create_direct_conversation(http, auth_headers, admin_user, base_url):
+    patient_user = register_user(http, base_url, role="patient")
+    payload = {"type": "medical_consultation", "user_id": patient_user["id"], "initial_message": "Hello"}
+    r = http.post(f"{base_url}/chat/conversations/direct", headers=auth_headers, json=payload)
+    assert r.status_code == 201, r.text
+    conv = r.json()
+    assert {p["id"] for p in conv["participants"]} == {admin_user["id"], patient_user["id"]}
+    assert [m["content"] for m in conv["messages"]] == ["Hello"]
+
+    # Retrying returns the same conversation without repeating the first message
+    r = http.post(f"{base_url}/chat/conversations/direct", headers=auth_headers, json=payload)
+    assert r.status_code == 200, r.text
+    assert r.json()["id"] == conv["id"]
+    assert len(r.json()["messages"]) == 1
+
+def test_chat_websocket_receives_messages(http, auth_headers, admin_user, base_url):
+    from websockets.sync.client import connect
+
+    patient_user = register_user(http, base_url, role="patient")
+    patient_headers = login_user(http, base_url, patient_user['email'])
+    conv = create_conversation(http, auth_headers, base_url, None, [admin_user["id"], patient_user["id"]])
+
+    with connect(base_url.replace("http", "ws", 1) + "/chat/ws", additional_headers=patient_headers) as ws:
+        payload = {"conversation_id": conv["id"], "content": "Hello over the socket"}
+        r = http.post(f"{base_url}/chat/conversations/{conv['id']}/messages/", headers=auth_headers, json=payload)
+        assert r.status_code == 201, r.text
+        event = json.loads(ws.recv(timeout=5))
+        assert event["type"] == "message"
+        assert event["id"] == r.json()["id"]
+        assert event["sender_id"] == admin_user["id"]
+
+        ws.send(json.dumps({"type": "typing", "conversation_id": conv["id"]}))
+        ws.send(json.dumps({"type": "read", "conversation_id": conv["id"]}))
+        event = json.loads(ws.recv(timeout=5))
+        assert event["type"] == "read"
+        assert event["user_id"] == patient_user["id"]
+
 def test_send_and_get_messages(http, auth_headers, admin_user, base_url):
     # Create a separate user to act as the patient
     patient_user = register_user(http, base_url, role="patient")
@@ -435,3 +792,107 @@ def test_send_and_get_messages(http, auth_headers, admin_user, base_url):
     assert len(messages) == 2
     assert messages[0]["content"] == "Hello from the doctor"
     assert messages[1]["content"] == "Hello from the patient"
+
+# ================== Search ==================
+def test_search_messages(http, auth_headers, admin_user, base_url):
+    patient_user = register_user(http, base_url, role="patient")
+    conv = create_conversation(http, auth_headers, base_url, None, [admin_user["id"], patient_user["id"]])
+    term = f"zq{uuid.uuid4().hex[:8]}"
+    for content in [f"Resultados del {term} listos", "Mensaje sin relación"]:
+        payload = {"conversation_id": conv["id"], "content": content}
+        r = http.post(f"{base_url}/chat/conversations/{conv['id']}/messages/", headers=auth_headers, json=payload)
+        assert r.status_code == 201, r.text
+
+    r = http.get(f"{base_url}/search/", headers=auth_headers, params={"q": term, "scope": "messages"})
+    assert r.status_code == 200, r.text
+    hits = r.json()
+    assert len(hits) == 1
+    assert hits[0]["type"] == "message"
+    assert hits[0]["conversation_id"] == conv["id"]
+    assert term in hits[0]["snippet"]
+
+    # Other users do not see messages from conversations they are not part of
+    outsider_headers = login_user(http, base_url, register_user(http, base_url)["email"])
+    r = http.get(f"{base_url}/search/", headers=outsider_headers, params={"q": term})
+    assert r.status_code == 200
+    assert r.json() == []
+
+    # El texto del mensaje vuelve escapado: solo las coincidencias llevan etiquetas
+    term = f"zq{uuid.uuid4().hex[:8]}"
+    payload = {"conversation_id": conv["id"], "content": f"{term} <script>alert(1)</script> <img src=x onerror=alert(1)>"}
+    r = http.post(f"{base_url}/chat/conversations/{conv['id']}/messages/", headers=auth_headers, json=payload)
+    assert r.status_code == 201, r.text
+    r = http.get(f"{base_url}/search/", headers=auth_headers, params={"q": term, "scope": "messages"})
+    assert r.status_code == 200, r.text
+    snippet = r.json()[0]["snippet"]
+    assert f"<b>{term}</b>" in snippet
+    assert "<" not in snippet.replace("<b>", "").replace("</b>", "")
+    assert "&lt;img" in snippet
+
+
+def test_similar_documents(http, auth_headers, base_url):
+    r = http.get(f"{base_url}/appointments/documents/similar", headers=auth_headers, params={"q": "dolor de cabeza", "k": 5})
+    assert r.status_code == 200, r.text
+    hits = r.json()
+    assert isinstance(hits, list) and len(hits) <= 5
+    assert all(-1.0 <= hit["score"] <= 1.0 for hit in hits)
+
+    r = http.get(f"{base_url}/appointments/documents/similar", headers=auth_headers, params={"q": "x"})
+    assert r.status_code == 422
+
+# ================== SQL statement budget ==================
+def statement_count(r):
+    """Sentencias SQL de la petición (cabecera del servidor con SQL_STATEMENT_BUDGET > 0)."""
+    assert r.status_code == 200, r.text
+    if "X-SQL-Statements" not in r.headers:
+        pytest.skip("server running without SQL_STATEMENT_BUDGET")
+    return int(r.headers["X-SQL-Statements"])
+
+def test_list_endpoints_statement_count_is_bounded(http, auth_headers, admin_user, base_url):
+    conversations = lambda: http.get(f"{base_url}/chat/conversations/", headers=auth_headers)
+    products = lambda: http.get(f"{base_url}/subscriptions/products", headers=auth_headers)
+    businesses = lambda: http.get(f"{base_url}/businesses/", headers=auth_headers)
+    before = [statement_count(r()) for r in (conversations, products, businesses)]
+
+    for _ in range(3):
+        patient_user = register_user(http, base_url, role="patient")
+        conv = create_conversation(http, auth_headers, base_url, None, [admin_user["id"], patient_user["id"]])
+        for content in ("uno", "dos"):
+            payload = {"conversation_id": conv["id"], "content": content}
+            r = http.post(f"{base_url}/chat/conversations/{conv['id']}/messages/", headers=auth_headers, json=payload)
+            assert r.status_code == 201, r.text
+        sp = create_subscription_product(http, auth_headers, base_url)
+        create_price(http, auth_headers, base_url, sp["id"])
+        create_price(http, auth_headers, base_url, sp["id"])
+        b = create_business(http, auth_headers, base_url, admin_user["id"])
+        create_location(http, auth_headers, base_url, b["id"])
+
+    # Más filas no significan más consultas: las relaciones anidadas se cargan en bloque
+    assert [statement_count(r()) for r in (conversations, products, businesses)] == before
+
+def test_server_timing_reports_sql(http, auth_headers, base_url):
+    r = http.get(f"{base_url}/businesses/", headers=auth_headers)
+    assert r.status_code == 200
+    timing = {m.split(";")[0].strip(): m for m in r.headers["Server-Timing"].split(",")}
+    assert "dur=" in timing["db"] and "statements" in timing["db"]
+    assert "dur=" in timing["app"]
+
+# ================== Metrics ==================
+def test_prometheus_metrics(http, auth_headers, base_url):
+    r = http.get(f"{base_url}/inventory/{uuid.uuid4()}", headers=auth_headers)
+    assert r.status_code == 404
+    metrics_url = base_url.split("/api/")[0] + "/metrics"
+    r = http.get(metrics_url)
+    assert r.status_code == 401
+    other = register_user(http, base_url)
+    r = http.get(metrics_url, headers=login_user(http, base_url, other["email"]))
+    assert r.status_code == 403
+    r = http.get(metrics_url, headers=auth_headers)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    body = r.text
+    # Una serie por plantilla de ruta, nunca por id
+    assert 'http_requests_total{method="GET",route="/api/v1/inventory/{item_id}",status="404"}' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/v1/inventory/{item_id}",le="+Inf"}' in body
+    for name in ("http_requests_in_flight", "db_pool_checked_out", "threadpool_tasks_waiting", "password_hash_pending"):
+        assert f"\n{name} " in body
@@ -124,7 +124,10 @@ CREATE TABLE pos.appointments (
     status appointmentstatus NOT NULL, 
     appointment_datetime TIMESTAMP WITH TIME ZONE NOT NULL, 
     reason TEXT, 
+    notes TEXT, 
     stripe_payment_intent_id VARCHAR, 
+    amount NUMERIC(10, 2), 
+    paid_at TIMESTAMP WITH TIME ZONE, 
     created_at TIMESTAMP WITH TIME ZONE DEFAULT now(), 
     updated_at TIMESTAMP WITH TIME ZONE, 
     PRIMARY KEY (id), 
@@ -185,6 +188,7 @@ CREATE TABLE pos.appointment_documents (
     appointment_id UUID NOT NULL, 
     document_type documenttype NOT NULL, 
     content TEXT NOT NULL, 
+    search_vector TSVECTOR GENERATED ALWAYS AS (to_tsvector('spanish'::regconfig, coalesce(content, ''))) STORED, 
     created_at TIMESTAMP WITH TIME ZONE DEFAULT now(), 
     updated_at TIMESTAMP WITH TIME ZONE, 
     PRIMARY KEY (id), 
@@ -195,6 +199,8 @@ CREATE TABLE pos.conversations (
     id UUID NOT NULL, 
     appointment_id UUID, 
     type conversationtype NOT NULL, 
+    direct_user_low UUID, 
+    direct_user_high UUID, 
     created_at TIMESTAMP WITH TIME ZONE DEFAULT now(), 
     updated_at TIMESTAMP WITH TIME ZONE, 
     PRIMARY KEY (id), 
@@ -209,6 +215,7 @@ CREATE TABLE pos.inventory (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT now(), 
     updated_at TIMESTAMP WITH TIME ZONE, 
     PRIMARY KEY (id), 
+    CONSTRAINT uq_inventory_product_location UNIQUE (product_id, location_id), 
     FOREIGN KEY(location_id) REFERENCES pos.business_locations (id), 
     FOREIGN KEY(product_id) REFERENCES pos.products (id)
 );
@@ -231,6 +238,7 @@ CREATE TABLE pos.stock_transfers (
 CREATE TABLE pos.conversation_participants (
     user_id UUID NOT NULL, 
     conversation_id UUID NOT NULL, 
+    last_read_at TIMESTAMP WITH TIME ZONE, 
     PRIMARY KEY (user_id, conversation_id), 
     FOREIGN KEY(conversation_id) REFERENCES pos.conversations (id), 
     FOREIGN KEY(user_id) REFERENCES pos.users (id)
@@ -243,6 +251,7 @@ CREATE TABLE pos.messages (
     content TEXT NOT NULL, 
     created_at TIMESTAMP WITH TIME ZONE DEFAULT now(), 
     read_at TIMESTAMP WITH TIME ZONE, 
+    search_vector TSVECTOR GENERATED ALWAYS AS (to_tsvector('spanish'::regconfig, coalesce(content, ''))) STORED, 
     PRIMARY KEY (id), 
     FOREIGN KEY(conversation_id) REFERENCES pos.conversations (id), 
     FOREIGN KEY(sender_id) REFERENCES pos.users (id)
@@ -260,6 +269,74 @@ CREATE TABLE pos.stock_transfer_items (
     FOREIGN KEY(transfer_id) REFERENCES pos.stock_transfers (id)
 );
 
+CREATE TABLE pos.product_imports (
+    id UUID NOT NULL, 
+    business_id UUID NOT NULL, 
+    user_id UUID, 
+    status VARCHAR NOT NULL, 
+    rows_processed INTEGER NOT NULL, 
+    created_count INTEGER NOT NULL, 
+    updated_count INTEGER NOT NULL, 
+    error_count INTEGER NOT NULL, 
+    errors JSON NOT NULL, 
+    detail VARCHAR, 
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(), 
+    updated_at TIMESTAMP WITH TIME ZONE, 
+    finished_at TIMESTAMP WITH TIME ZONE, 
+    PRIMARY KEY (id), 
+    FOREIGN KEY(business_id) REFERENCES pos.businesses (id), 
+    FOREIGN KEY(user_id) REFERENCES pos.users (id)
+);
+
+-- Estadísticas precalculadas del dashboard (backfill: python -m app.refresh_dashboard_stats)
+CREATE TABLE pos.dashboard_user_stats (
+    user_id UUID NOT NULL, 
+    patient_count INTEGER DEFAULT 0 NOT NULL, 
+    appointments_pending_payment INTEGER DEFAULT 0 NOT NULL, 
+    appointments_scheduled INTEGER DEFAULT 0 NOT NULL, 
+    appointments_active INTEGER DEFAULT 0 NOT NULL, 
+    appointments_completed INTEGER DEFAULT 0 NOT NULL, 
+    appointments_cancelled INTEGER DEFAULT 0 NOT NULL, 
+    revenue_total NUMERIC(14, 2) DEFAULT 0 NOT NULL, 
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now(), 
+    PRIMARY KEY (user_id)
+);
+
+CREATE TABLE pos.dashboard_daily_stats (
+    user_id UUID NOT NULL, 
+    day DATE NOT NULL, 
+    patients_added INTEGER DEFAULT 0 NOT NULL, 
+    appointments_created INTEGER DEFAULT 0 NOT NULL, 
+    appointment_revenue NUMERIC(14, 2) DEFAULT 0 NOT NULL, 
+    subscription_revenue NUMERIC(14, 2) DEFAULT 0 NOT NULL, 
+    PRIMARY KEY (user_id, day)
+);
+
+-- Paginación por cursor sobre (created_at, id)
+CREATE INDEX ix_patients_created_at_id ON pos.patients (created_at, id);
+CREATE INDEX ix_customers_created_at_id ON pos.customers (created_at, id);
+CREATE INDEX ix_products_business_id_created_at_id ON pos.products (business_id, created_at, id);
+CREATE INDEX ix_inventory_created_at_id ON pos.inventory (created_at, id);
+CREATE INDEX ix_stock_transfers_created_at_id ON pos.stock_transfers (created_at, id);
+CREATE INDEX ix_subscription_products_created_at_id ON pos.subscription_products (created_at, id);
+CREATE INDEX ix_prices_created_at_id ON pos.prices (created_at, id);
+CREATE INDEX ix_subscriptions_user_id_created_at_id ON pos.subscriptions (user_id, created_at, id);
+
+-- Historial de chat paginado
+CREATE INDEX ix_messages_conversation_id_created_at_id ON pos.messages (conversation_id, created_at, id);
+CREATE INDEX ix_messages_unread ON pos.messages (conversation_id) WHERE read_at IS NULL;
+-- Participantes por conversación
+CREATE INDEX ix_conversation_participants_conversation_id ON pos.conversation_participants (conversation_id);
+-- Conversaciones directas idempotentes
+CREATE UNIQUE INDEX uq_conversations_direct ON pos.conversations (type, appointment_id, direct_user_low, direct_user_high) NULLS NOT DISTINCT WHERE direct_user_low IS NOT NULL;
+-- Búsqueda de texto completo
+CREATE INDEX ix_messages_search_vector ON pos.messages USING gin (search_vector);
+CREATE INDEX ix_appointment_documents_search_vector ON pos.appointment_documents USING gin (search_vector);
+-- Embeddings de documentos (pgvector; solo con EMBEDDING_BACKEND=pgvector)
+CREATE EXTENSION IF NOT EXISTS vector;
+ALTER TABLE pos.appointment_documents ADD COLUMN embedding vector(384);
+CREATE INDEX ix_appointment_documents_embedding ON pos.appointment_documents USING hnsw (embedding vector_cosine_ops);
+
 INSERT INTO pos.alembic_version (version_num) VALUES ('ef43ed8bad90') RETURNING pos.alembic_version.version_num;
 
 COMMIT;
\ No newline at end of file